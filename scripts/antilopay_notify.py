@@ -0,0 +1,110 @@
+"""
+Локальный отправитель уведомлений Antilopay для проверки приема callback без сети
+
+1. Сгенерировать тестовую пару ключей (публичный ключ нужно указать боту
+   в ANTILOPAY_CALLBACK_KEY):
+    python scripts/antilopay_notify.py keygen --out callback_key.pem
+
+2. Отправить подписанное уведомление о статусе заказа:
+    python scripts/antilopay_notify.py send --key callback_key.pem \\
+        --url http://127.0.0.1:8080/antilopay/callback \\
+        --order-id <order_id> --status SUCCESS --amount 1000
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import sys
+from datetime import datetime
+
+import aiohttp
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+
+
+def build_notification(order_id: str, status: str, amount: float, fee: float = 0.0,
+                       payment_id: str = None) -> dict:
+    """Тело уведомления в формате Antilopay"""
+    return {
+        "type": "payment",
+        "payment_id": payment_id or f"standin-{order_id}",
+        "order_id": order_id,
+        "ctime": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "amount": round(amount - fee, 2),
+        "original_amount": amount,
+        "fee": fee,
+        "status": status,
+        "currency": "RUB",
+        "pay_method": "CARD_RU",
+        "pay_data": "2200********0000",
+        "customer": {}
+    }
+
+
+def sign(body: bytes, private_key: RSA.RsaKey) -> str:
+    return base64.b64encode(pkcs1_15.new(private_key).sign(SHA256.new(body))).decode()
+
+
+async def send_notification(url: str, notification: dict, private_key: RSA.RsaKey,
+                            session: aiohttp.ClientSession = None) -> tuple:
+    """Отправка подписанного уведомления; возвращает (HTTP статус, тело ответа)"""
+    body = json.dumps(notification, separators=(',', ':'), ensure_ascii=False).encode()
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Apay-Callback': sign(body, private_key)
+    }
+    own_session = session is None
+    session = session or aiohttp.ClientSession()
+    try:
+        async with session.post(url, data=body, headers=headers) as response:
+            return response.status, await response.text()
+    finally:
+        if own_session:
+            await session.close()
+
+
+def keygen(args):
+    key = RSA.generate(2048)
+    with open(args.out, 'wb') as f:
+        f.write(key.export_key('PEM'))
+    public_b64 = base64.b64encode(key.publickey().export_key('DER')).decode()
+    print(f"Приватный ключ записан в {args.out}")
+    print(f"ANTILOPAY_CALLBACK_KEY={public_b64}")
+
+
+def send(args):
+    with open(args.key, 'rb') as f:
+        private_key = RSA.import_key(f.read())
+    notification = build_notification(args.order_id, args.status, args.amount, args.fee, args.payment_id)
+    status, text = asyncio.run(send_notification(args.url, notification, private_key))
+    print(f"HTTP {status}: {text}")
+    return 0 if status == 200 else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_keygen = sub.add_parser('keygen', help='Сгенерировать тестовую пару ключей')
+    p_keygen.add_argument('--out', default='callback_key.pem')
+
+    p_send = sub.add_parser('send', help='Отправить подписанное уведомление')
+    p_send.add_argument('--key', required=True, help='PEM приватного ключа из keygen')
+    p_send.add_argument('--url', default='http://127.0.0.1:8080/antilopay/callback')
+    p_send.add_argument('--order-id', required=True)
+    p_send.add_argument('--payment-id')
+    p_send.add_argument('--status', default='SUCCESS', choices=['SUCCESS', 'FAIL', 'CANCEL', 'EXPIRED', 'PENDING'])
+    p_send.add_argument('--amount', type=float, default=100.0)
+    p_send.add_argument('--fee', type=float, default=0.0)
+
+    args = parser.parse_args()
+    if args.command == 'keygen':
+        keygen(args)
+        return 0
+    return send(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
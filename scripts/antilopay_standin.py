@@ -0,0 +1,356 @@
+"""
+Локальный stand-in Antilopay для нагрузочных и интеграционных проверок без сети
+
+Отвечает на payment/create и payment/check, проверяя подпись X-Apay-Sign
+публичной частью ключа, которым подписывает запросы бот. Поведение задается
+сценарием: задержка ответа, доля ошибок с заданными HTTP-кодами и исход
+каждого заказа (PENDING -> SUCCESS/FAIL/CANCEL через случайное время оплаты,
+EXPIRED - по окончании срока). При переходе в финальный статус stand-in может
+отправить боту подписанное уведомление (как scripts/antilopay_notify.py).
+
+Служебные адреса:
+    POST /_standin/orders/<order_id>  {"status": "SUCCESS"} - перевести заказ вручную
+    GET  /_standin/stats                                    - счетчики запросов
+
+Запуск (ключ из `antilopay_notify.py keygen`; без --key пара генерируется,
+переменные для бота выводятся при старте):
+    python scripts/antilopay_standin.py --port 18090 --key callback_key.pem \\
+        --latency 0.2 --error-rate 0.05 --error-codes 500,429 \\
+        --outcomes SUCCESS=0.8,FAIL=0.1,EXPIRED=0.1 --pay-min 5 --pay-max 60 \\
+        --notify-url http://127.0.0.1:8080/antilopay/callback
+
+Сценарий можно передать файлом JSON с теми же полями, что у Scenario:
+    python scripts/antilopay_standin.py --scenario scenario.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from aiohttp import ClientSession, web
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+
+from antilopay_notify import build_notification, send_notification
+
+FINAL_STATUSES = ('SUCCESS', 'FAIL', 'CANCEL', 'EXPIRED')
+
+
+@dataclass
+class Scenario:
+    """Поведение stand-in"""
+    # Задержка ответа: равномерно в [latency - jitter, latency + jitter] секунд
+    latency: float = 0.05
+    jitter: float = 0.0
+    # Доля запросов, получающих ошибку; HTTP-код выбирается из error_codes
+    error_rate: float = 0.0
+    error_codes: List[int] = field(default_factory=lambda: [500])
+    # Исходы заказов с весами; SUCCESS/FAIL/CANCEL наступают через pay_min..pay_max секунд,
+    # EXPIRED - через expire_after секунд после создания
+    outcomes: Dict[str, float] = field(default_factory=lambda: {'SUCCESS': 0.8, 'FAIL': 0.1, 'EXPIRED': 0.1})
+    pay_min: float = 5.0
+    pay_max: float = 60.0
+    expire_after: float = 600.0
+    fee_share: float = 0.05
+    # Часовой пояс ctime в ответах (как у Antilopay - без указания пояса)
+    ctime_utc_offset: float = 3.0
+
+
+@dataclass
+class StandInOrder:
+    order_id: str
+    payment_id: str
+    amount: float
+    product_name: str
+    created_at: float  # time.perf_counter()
+    created_wall: float  # time.time()
+    outcome: str
+    final_at: float  # time.perf_counter() перехода в финальный статус
+    checks: int = 0
+
+    def status(self, now: float) -> str:
+        return self.outcome if now >= self.final_at else 'PENDING'
+
+
+def parse_outcomes(value: str) -> Dict[str, float]:
+    outcomes = {}
+    for item in value.split(','):
+        status, _, weight = item.partition('=')
+        status = status.strip().upper()
+        if status not in FINAL_STATUSES:
+            raise argparse.ArgumentTypeError(f"Неизвестный статус {status}")
+        outcomes[status] = float(weight or 1)
+    return outcomes
+
+
+class AntilopayStandIn:
+    """
+    aiohttp-приложение, изображающее Antilopay API. Можно запускать отдельно
+    (main) или в процессе нагрузочного скрипта (app/start/stop).
+    """
+
+    def __init__(self, key: RSA.RsaKey, scenario: Scenario = None, secret_id: Optional[str] = None,
+                 project_id: Optional[str] = None, notify_url: Optional[str] = None, seed: int = None):
+        self.key = key
+        self.scenario = scenario or Scenario()
+        self.secret_id = secret_id
+        self.project_id = project_id
+        self.notify_url = notify_url
+        self.orders: Dict[str, StandInOrder] = {}
+        self.stats: Dict[str, int] = {}
+        self._verifier = pkcs1_15.new(key.publickey())
+        self._rng = random.Random(seed)
+        self._session: Optional[ClientSession] = None
+        self._notifications: Dict[str, asyncio.TimerHandle] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/payment/create', self.create)
+        app.router.add_post('/payment/check', self.check)
+        app.router.add_post('/_standin/orders/{order_id}', self.set_status)
+        app.router.add_get('/_standin/stats', self.get_stats)
+        return app
+
+    async def start(self, host: str, port: int):
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self):
+        for handle in self._notifications.values():
+            handle.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+        if self._session is not None:
+            await self._session.close()
+
+    def _count(self, name: str):
+        self.stats[name] = self.stats.get(name, 0) + 1
+
+    async def _receive(self, request: web.Request, endpoint: str):
+        """Тело запроса после задержки, проверки подписи и розыгрыша ошибки; иначе готовый ответ"""
+        self._count(endpoint)
+        body = await request.read()
+        scenario = self.scenario
+        delay = scenario.latency + self._rng.uniform(-scenario.jitter, scenario.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.secret_id is not None and request.headers.get('X-Apay-Secret-Id') != self.secret_id:
+            self._count('bad_secret_id')
+            return web.Response(status=401, text='unknown secret id')
+        try:
+            self._verifier.verify(SHA256.new(body), base64.b64decode(request.headers.get('X-Apay-Sign', '')))
+        except (ValueError, TypeError):
+            self._count('bad_signature')
+            return web.Response(status=401, text='invalid signature')
+
+        if scenario.error_rate and self._rng.random() < scenario.error_rate:
+            code = self._rng.choice(scenario.error_codes)
+            self._count(f'error_{code}')
+            return web.Response(status=code, text=f'injected error {code}')
+
+        data = json.loads(body)
+        if self.project_id is not None and data.get('project_identificator') != self.project_id:
+            self._count('bad_project')
+            return web.json_response({'code': 1, 'error': 'unknown project'})
+        return data
+
+    async def create(self, request: web.Request) -> web.Response:
+        data = await self._receive(request, 'create')
+        if isinstance(data, web.Response):
+            return data
+
+        order_id = str(data['order_id'])
+        order = self.orders.get(order_id)
+        if order is None:
+            # Повтор с тем же номером заказа возвращает уже созданный платеж
+            order = self._new_order(order_id, float(data['amount']), data.get('product_name', ''))
+        return web.json_response({
+            'code': 0,
+            'payment_id': order.payment_id,
+            'payment_url': f'https://standin.invalid/pay/{order.payment_id}'
+        })
+
+    async def check(self, request: web.Request) -> web.Response:
+        data = await self._receive(request, 'check')
+        if isinstance(data, web.Response):
+            return data
+
+        order = self.orders.get(str(data.get('order_id')))
+        if order is None:
+            return web.json_response({'code': 404, 'error': 'order not found'})
+        order.checks += 1
+        return web.json_response({'code': 0, **self._payment(order)})
+
+    async def set_status(self, request: web.Request) -> web.Response:
+        order = self.orders.get(request.match_info['order_id'])
+        status = (await request.json()).get('status', '').upper()
+        if order is None or status not in FINAL_STATUSES:
+            return web.Response(status=404, text='unknown order or status')
+        order.outcome = status
+        order.final_at = time.perf_counter()
+        self._schedule_notification(order, 0.0)
+        return web.json_response(self._payment(order))
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({'orders': len(self.orders), **self.stats})
+
+    def _new_order(self, order_id: str, amount: float, product_name: str) -> StandInOrder:
+        scenario = self.scenario
+        outcome = self._rng.choices(list(scenario.outcomes), weights=list(scenario.outcomes.values()))[0]
+        delay = (scenario.expire_after if outcome == 'EXPIRED'
+                 else self._rng.uniform(scenario.pay_min, scenario.pay_max))
+        now = time.perf_counter()
+        order = StandInOrder(
+            order_id=order_id,
+            payment_id=f'standin-{len(self.orders) + 1}',
+            amount=amount,
+            product_name=product_name,
+            created_at=now,
+            created_wall=time.time(),
+            outcome=outcome,
+            final_at=now + delay
+        )
+        self.orders[order_id] = order
+        self._schedule_notification(order, delay)
+        return order
+
+    def _payment(self, order: StandInOrder) -> dict:
+        status = order.status(time.perf_counter())
+        fee = round(order.amount * self.scenario.fee_share, 2) if status == 'SUCCESS' else 0.0
+        ctime_zone = timezone(timedelta(hours=self.scenario.ctime_utc_offset))
+        return {
+            'payment_id': order.payment_id,
+            'order_id': order.order_id,
+            'status': status,
+            'amount': round(order.amount - fee, 2),
+            'original_amount': order.amount,
+            'fee': fee,
+            'currency': 'RUB',
+            'payment_url': f'https://standin.invalid/pay/{order.payment_id}',
+            'pay_method': 'CARD_RU' if status == 'SUCCESS' else '',
+            'pay_data': '2200********0000' if status == 'SUCCESS' else '',
+            'ctime': datetime.fromtimestamp(order.created_wall, ctime_zone).strftime('%Y-%m-%d %H:%M:%S'),
+            'product_name': order.product_name,
+            'description': '',
+            'customer': {}
+        }
+
+    def _schedule_notification(self, order: StandInOrder, delay: float):
+        if not self.notify_url:
+            return
+        # Ручной перевод заказа заменяет запланированное уведомление
+        previous = self._notifications.pop(order.order_id, None)
+        if previous is not None:
+            previous.cancel()
+        loop = asyncio.get_running_loop()
+        self._notifications[order.order_id] = loop.call_later(
+            delay, lambda: asyncio.ensure_future(self._notify(order))
+        )
+
+    async def _notify(self, order: StandInOrder):
+        if self._session is None:
+            self._session = ClientSession()
+        fee = round(order.amount * self.scenario.fee_share, 2) if order.outcome == 'SUCCESS' else 0.0
+        notification = build_notification(order.order_id, order.outcome, order.amount, fee, order.payment_id)
+        try:
+            status, _ = await send_notification(self.notify_url, notification, self.key, self._session)
+            self._count('notified' if status == 200 else f'notify_http_{status}')
+        except Exception:
+            self._count('notify_failed')
+
+
+def load_key(path: Optional[str]) -> RSA.RsaKey:
+    if path:
+        with open(path, 'rb') as f:
+            return RSA.import_key(f.read())
+    return RSA.generate(2048)
+
+
+def key_env(key: RSA.RsaKey) -> Dict[str, str]:
+    """Переменные окружения бота для работы с этим stand-in"""
+    return {
+        'ANTILOPAY_PRIVATE_KEY': base64.b64encode(key.export_key('DER')).decode(),
+        'ANTILOPAY_CALLBACK_KEY': base64.b64encode(key.publickey().export_key('DER')).decode(),
+    }
+
+
+def scenario_from_args(args) -> Scenario:
+    scenario = Scenario()
+    if args.scenario:
+        with open(args.scenario, encoding='utf-8') as f:
+            scenario = Scenario(**json.load(f))
+    for name in ('latency', 'jitter', 'error_rate', 'pay_min', 'pay_max', 'expire_after', 'ctime_utc_offset'):
+        value = getattr(args, name)
+        if value is not None:
+            setattr(scenario, name, value)
+    if args.error_codes:
+        scenario.error_codes = [int(code) for code in args.error_codes.split(',')]
+    if args.outcomes:
+        scenario.outcomes = args.outcomes
+    return scenario
+
+
+def add_scenario_arguments(parser: argparse.ArgumentParser):
+    """Параметры сценария (общие со скриптом нагрузки)"""
+    parser.add_argument('--scenario', help='JSON со сценарием (поля Scenario)')
+    parser.add_argument('--latency', type=float, help='Задержка ответа, с')
+    parser.add_argument('--jitter', type=float, help='Разброс задержки, с')
+    parser.add_argument('--error-rate', type=float, help='Доля запросов с ошибкой')
+    parser.add_argument('--error-codes', help='HTTP-коды ошибок через запятую (500,429)')
+    parser.add_argument('--outcomes', type=parse_outcomes, help='Исходы с весами: SUCCESS=0.8,FAIL=0.1,EXPIRED=0.1')
+    parser.add_argument('--pay-min', type=float, help='Минимальное время до оплаты/отказа, с')
+    parser.add_argument('--pay-max', type=float, help='Максимальное время до оплаты/отказа, с')
+    parser.add_argument('--expire-after', type=float, help='Через сколько секунд заказ становится EXPIRED')
+    parser.add_argument('--ctime-utc-offset', type=float, help='Часовой пояс ctime, часов')
+
+
+async def serve(args):
+    key = load_key(args.key)
+    standin = AntilopayStandIn(key, scenario_from_args(args), secret_id=args.secret_id,
+                               project_id=args.project_id, notify_url=args.notify_url, seed=args.seed)
+    await standin.start(args.host, args.port)
+
+    print(f"Stand-in Antilopay: http://{args.host}:{args.port}")
+    print(f"Сценарий: {json.dumps(asdict(standin.scenario), ensure_ascii=False)}")
+    print("Переменные окружения бота:")
+    print(f"ANTILOPAY_API_URL=http://{args.host}:{args.port}")
+    for name, value in key_env(key).items():
+        print(f"{name}={value}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await standin.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18090)
+    parser.add_argument('--key', help='PEM приватного ключа (antilopay_notify.py keygen)')
+    parser.add_argument('--secret-id', help='Ожидаемый X-Apay-Secret-Id (по умолчанию не проверяется)')
+    parser.add_argument('--project-id', help='Ожидаемый project_identificator (по умолчанию не проверяется)')
+    parser.add_argument('--notify-url', help='Адрес приема уведомлений бота')
+    parser.add_argument('--seed', type=int)
+    add_scenario_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""
+Перенос уже записанных в Google Sheets продаж в локальный журнал (SalesLedger)
+
+Листы читаются страницами, уже учтенные заказы пропускаются, поэтому
+скрипт можно запускать повторно. Запускать из корня проекта, чтобы
+использовались те же .env и bot.db, что и у бота:
+    python scripts/backfill_ledger.py --page-size 500
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from services.google_sheets import sheets_service  # noqa: E402
+from services.sales_ledger import SalesLedger  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page-size', type=int, default=500, help='Строк за один запрос к таблице')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    ledger = SalesLedger()
+    started = time.perf_counter()
+    try:
+        result = ledger.backfill(sheets_service, page_size=args.page_size)
+        summary = ledger.get_sales_summary()
+    finally:
+        ledger.close()
+
+    for title, added in result.items():
+        print(f"{title}: добавлено {added}")
+    print(f"Итого в журнале: свободные продажи {summary['free_sales_count']} "
+          f"({summary['free_sales_amount']:.2f} ₽), товары {summary['product_sales_count']} "
+          f"({summary['product_sales_amount']:.2f} ₽)")
+    print(f"Время: {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Бенчмарк: задержка обработчиков при большом числе платежных запросов в полете
+
+Поднимает локальный stand-in Antilopay с искусственной задержкой ответа,
+запускает N одновременных create_payment и параллельно измеряет, насколько
+"лёгкий" обработчик (эмуляция нажатия кнопки другим менеджером) опаздывает
+относительно ожидаемого времени.
+
+Сравниваются два режима:
+  blocking - прежняя схема: синхронный requests.post прямо в корутине
+  async    - AntilopayAPI на общей aiohttp-сессии
+
+Режим blocking использует пакет requests, которого нет в requirements.txt
+(бот его больше не использует): для него нужен pip install requests.
+Без requests режим both замеряет только async.
+
+Запуск:
+    python scripts/bench_antilopay_client.py --calls 50 --delay 0.3
+"""
+
+import argparse
+import asyncio
+import base64
+import importlib.util
+import os
+import statistics
+import sys
+import threading
+import time
+
+from aiohttp import web
+from Crypto.PublicKey import RSA
+
+HOST = '127.0.0.1'
+PORT = 18081
+
+os.environ.setdefault('ANTILOPAY_API_URL', f'http://{HOST}:{PORT}')
+os.environ.setdefault('ANTILOPAY_SECRET_ID', 'bench-secret')
+os.environ.setdefault('ANTILOPAY_PROJECT_ID', 'bench-project')
+os.environ.setdefault(
+    'ANTILOPAY_PRIVATE_KEY',
+    base64.b64encode(RSA.generate(2048).export_key('DER')).decode()
+)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from services.antilopay import AntilopayAPI  # noqa: E402
+
+
+def start_stub_server(delay: float) -> threading.Thread:
+    """
+    Локальный stand-in payment/create с задержкой ответа.
+    Работает в отдельном потоке со своим event loop, чтобы блокирующий
+    режим бенчмарка не останавливал и сам сервер.
+    """
+    ready = threading.Event()
+
+    async def create(request: web.Request) -> web.Response:
+        await request.read()
+        await asyncio.sleep(delay)
+        return web.json_response({
+            "code": 0,
+            "payment_id": "bench-payment",
+            "payment_url": "https://example.invalid/pay"
+        })
+
+    async def serve():
+        app = web.Application()
+        app.router.add_post('/payment/create', create)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, HOST, PORT).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    thread = threading.Thread(target=lambda: asyncio.run(serve()), daemon=True)
+    thread.start()
+    ready.wait()
+    return thread
+
+
+def blocking_create(api: AntilopayAPI):
+    """Прежняя реализация: синхронный HTTP-вызов прямо в корутине"""
+    import json
+    import requests
+
+    payload = json.dumps({"amount": 100.0}, separators=(',', ':'))
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Apay-Secret-Id': api.secret_id,
+        'X-Apay-Sign': api._generate_signature(payload),
+        'X-Apay-Sign-Version': '1'
+    }
+    requests.post(f"{api.api_url}/payment/create", data=payload, headers=headers, timeout=30)
+
+
+async def probe_handler_latency(stop: asyncio.Event, samples: list, period: float = 0.01):
+    """Эмуляция обработчика: каждые period секунд фиксируем опоздание запуска"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + period
+        await asyncio.sleep(period)
+        samples.append(max(0.0, loop.time() - expected) * 1000)
+
+
+async def run(mode: str, calls: int, delay: float) -> dict:
+    api = AntilopayAPI()
+    stop = asyncio.Event()
+    samples = []
+    probe = asyncio.create_task(probe_handler_latency(stop, samples))
+
+    async def one_call():
+        if mode == 'blocking':
+            blocking_create(api)
+        else:
+            await api.create_payment(100.0, 'bench', 'bench@example.com', 'bench')
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(calls)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    await api.close()
+
+    samples = samples or [elapsed * 1000]
+    samples.sort()
+    return {
+        'mode': mode,
+        'wall_s': elapsed,
+        'p50_ms': statistics.median(samples),
+        'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'max_ms': samples[-1],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=50, help='Число одновременных create_payment')
+    parser.add_argument('--delay', type=float, default=0.3, help='Задержка ответа stand-in сервера, с')
+    parser.add_argument('--mode', choices=['blocking', 'async', 'both'], default='both')
+    args = parser.parse_args()
+
+    modes = ['blocking', 'async'] if args.mode == 'both' else [args.mode]
+    if 'blocking' in modes and importlib.util.find_spec('requests') is None:
+        if args.mode == 'blocking':
+            parser.error("для режима blocking нужен пакет requests: pip install requests")
+        print("requests не установлен (pip install requests) - режим blocking пропущен")
+        modes.remove('blocking')
+
+    start_stub_server(args.delay)
+    print(f"calls={args.calls} delay={args.delay}s")
+    print(f"{'mode':<10}{'wall, s':>10}{'lag p50, ms':>14}{'lag p99, ms':>14}{'lag max, ms':>14}")
+    for mode in modes:
+        r = await run(mode, args.calls, args.delay)
+        print(f"{r['mode']:<10}{r['wall_s']:>10.2f}{r['p50_ms']:>14.1f}{r['p99_ms']:>14.1f}{r['max_ms']:>14.1f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
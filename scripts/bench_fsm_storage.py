@@ -0,0 +1,76 @@
+"""
+Бенчмарк FSM-хранилищ: задержка цикла update_data + get_data
+
+Повторяет шаг мастера продажи (запись одного поля и чтение всех данных)
+для MemoryStorage, PersistentStorage поверх InMemoryBackend и поверх SQLite.
+Для SQLite используется временный файл.
+
+Запуск:
+    python scripts/bench_fsm_storage.py --count 5000 --chats 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from aiogram.fsm.storage.base import StorageKey  # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage  # noqa: E402
+
+from services.fsm_storage import InMemoryBackend, PersistentStorage, SQLiteBackend  # noqa: E402
+
+BOT_ID = 1
+
+
+async def run(storage, count: int, chats: int) -> list:
+    keys = [StorageKey(bot_id=BOT_ID, chat_id=chat, user_id=chat) for chat in range(chats)]
+    for key in keys:
+        await storage.set_state(key, "FreeSaleStates:waiting_for_amount")
+        await storage.set_data(key, {
+            "bot_message_id": 1000,
+            "service_name": "Подписка PS Plus Deluxe 12 месяцев",
+            "client_login": "client@example.com",
+            "comment": "Без комментария",
+        })
+
+    latencies = []
+    for i in range(count):
+        key = keys[i % chats]
+        started = time.perf_counter()
+        await storage.update_data(key, {"bot_message_id": i, "amount": 1000.0 + i})
+        await storage.get_data(key)
+        latencies.append(time.perf_counter() - started)
+    await storage.close()
+    return latencies
+
+
+def report(name: str, latencies: list):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<28} mean {statistics.mean(latencies) * 1e6:8.1f} мкс   "
+          f"p50 {latencies[len(latencies) // 2] * 1e6:8.1f} мкс   p99 {p99 * 1e6:8.1f} мкс")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=5000)
+    parser.add_argument('--chats', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storages = [
+            ("MemoryStorage", MemoryStorage()),
+            ("Persistent + InMemory", PersistentStorage(InMemoryBackend())),
+            ("Persistent + SQLite", PersistentStorage(SQLiteBackend(os.path.join(tmp, 'fsm.db')))),
+        ]
+        for name, storage in storages:
+            report(name, await run(storage, args.count, args.chats))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Бенчмарк каталога игр: время поиска по префиксу и с опечатками,
+полная загрузка и инкрементальная перезагрузка
+
+Без --file каталог составляется из случайных названий. p99 каждого вида
+поиска сравнивается с --target-ms (1 мс); при превышении скрипт завершается
+с кодом 1.
+
+Запуск:
+    python scripts/bench_game_catalog.py --games 5000
+    python scripts/bench_game_catalog.py --file games.txt
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from services.game_catalog import GameIndex  # noqa: E402
+
+WORDS = [
+    'Grand', 'Theft', 'Auto', 'Spider', 'Man', 'Horizon', 'Forbidden', 'West', 'God', 'War',
+    'Ragnarok', 'Last', 'Us', 'Part', 'Gran', 'Turismo', 'Elden', 'Ring', 'Call', 'Duty',
+    'Modern', 'Warfare', 'Red', 'Dead', 'Redemption', 'Cyberpunk', 'Ghost', 'Tsushima', 'Mortal',
+    'Kombat', 'Resident', 'Evil', 'Village', 'Final', 'Fantasy', 'Rebirth', 'Hogwarts', 'Legacy',
+    'Stellar', 'Blade', 'Death', 'Stranding', 'Uncharted', 'Legacy', 'Thieves', 'Ratchet', 'Clank'
+]
+
+
+SYLLABLES = [consonant + vowel for consonant in 'bcdfghklmnprstvz' for vowel in 'aeiou']
+
+
+def synthetic_names(count: int, rng: random.Random) -> list:
+    # Реальные каталоги разнообразнее по словам, чем WORDS: добавляем выдуманные слова
+    vocabulary = WORDS + [
+        ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).capitalize() for _ in range(count)
+    ]
+    names = set()
+    while len(names) < count:
+        title = ' '.join(rng.sample(vocabulary, rng.randint(2, 4)))
+        names.add(f"{title} {rng.randint(1, 9)}" if rng.random() < 0.3 else title)
+    return sorted(names)
+
+
+def typo(name: str, rng: random.Random) -> str:
+    index = rng.randrange(len(name))
+    return name[:index] + name[index + 1:]
+
+
+def measure(index: GameIndex, queries: list) -> list:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(name: str, timings: list, target: float) -> bool:
+    """Печать замеров; True, если p99 укладывается в target секунд"""
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    ok = p99 <= target
+    print(f"{name:<24} median {statistics.median(timings) * 1e6:7.1f} мкс   "
+          f"p99 {p99 * 1e6:7.1f} мкс   max {timings[-1] * 1e6:7.1f} мкс   {'OK' if ok else 'ПРЕВЫШЕНО'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=5000)
+    parser.add_argument('--file', help='Файл с названиями игр (по одному в строке)')
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--target-ms', type=float, default=1.0, help='Допустимый p99 поиска, мс')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            names = [line.strip() for line in f if line.strip()]
+    else:
+        names = synthetic_names(args.games, rng)
+
+    index = GameIndex()
+    started = time.perf_counter()
+    index.update(names)
+    print(f"Загрузка {len(index)} игр: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    samples = [rng.choice(names) for _ in range(args.queries)]
+    target = args.target_ms / 1000
+    results = [
+        report('префикс 3 символа', measure(index, [name[:3] for name in samples]), target),
+        report('префикс слова', measure(index, [name.split()[-1][:4] for name in samples]), target),
+        report('полное название', measure(index, samples), target),
+        report('опечатка', measure(index, [typo(name, rng) for name in samples]), target),
+    ]
+
+    # Перезагрузка с 1% измененных названий
+    changed = names[len(names) // 100:] + [f"New Game {i}" for i in range(len(names) // 100)]
+    started = time.perf_counter()
+    added, removed = index.update(changed)
+    print(f"Инкрементальная перезагрузка (+{added}, -{removed}): {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    if not all(results):
+        print(f"p99 поиска выше {args.target_ms} мс")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Микро-бенчмарк клавиатур мастеров продаж
+
+Для каждого шага мастера сравнивает сборку разметки через InlineKeyboardBuilder
+(как до кэширования) с получением ее из кэша keyboards.py, в обоих случаях
+вместе с сериализацией reply_markup так, как ее делает сессия бота.
+
+Запуск:
+    python scripts/bench_keyboards.py --count 20000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from aiogram import Bot  # noqa: E402
+
+import keyboards  # noqa: E402
+
+BOT_TOKEN = '123456:FAKE-TOKEN'
+
+# Шаги мастеров: (название, функция клавиатуры, аргументы)
+WIZARD_STEPS = [
+    ('главное меню', keyboards.get_main_menu_keyboard, ()),
+    ('назад/отмена', keyboards.get_cancel_and_back_keyboard, ('back_to_game_name',)),
+    ('выбор консоли', keyboards.get_console_keyboard_with_back, ()),
+    ('выбор позиции', keyboards.get_position_keyboard, ('PS5',)),
+    ('способ оплаты', keyboards.get_payment_method_keyboard, ()),
+    ('подтверждение', keyboards.get_final_confirmation_keyboard, ()),
+]
+
+
+def per_call_us(func, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=20000)
+    args = parser.parse_args()
+
+    bot = Bot(BOT_TOKEN)
+    session = bot.session
+
+    def serialize(markup):
+        return session.prepare_value(markup, bot=bot, files={})
+
+    print(f"{'шаг':<16} {'сборка':>10} {'кэш':>10} {'сборка+JSON':>13} {'кэш+JSON':>10}")
+    totals = [0.0, 0.0, 0.0, 0.0]
+    for name, keyboard, kb_args in WIZARD_STEPS:
+        build = keyboard.__wrapped__
+        assert serialize(build(*kb_args)) == serialize(keyboard(*kb_args))
+        timings = [
+            per_call_us(lambda: build(*kb_args), args.count),
+            per_call_us(lambda: keyboard(*kb_args), args.count),
+            per_call_us(lambda: serialize(build(*kb_args)), args.count),
+            per_call_us(lambda: serialize(keyboard(*kb_args)), args.count),
+        ]
+        totals = [total + timing for total, timing in zip(totals, timings)]
+        print(f"{name:<16} {timings[0]:8.1f} мкс {timings[1]:6.2f} мкс {timings[2]:9.1f} мкс {timings[3]:6.1f} мкс")
+    print(f"{'весь мастер':<16} {totals[0]:8.1f} мкс {totals[1]:6.2f} мкс {totals[2]:9.1f} мкс {totals[3]:6.1f} мкс")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Микро-бенчмарк записи метрик на горячем пути
+
+Показывает стоимость одного Histogram.observe / Counter.inc с метками
+и время формирования ответа /metrics для заданного числа серий.
+
+Запуск:
+    python scripts/bench_metrics.py --count 200000 --series 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from metrics import MetricsRegistry  # noqa: E402
+
+
+def per_call_ns(func, count: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return (time.perf_counter() - started) / count * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=200000)
+    parser.add_argument('--series', type=int, default=50, help='Число разных значений метки')
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram('bench_duration_seconds', 'bench', ('handler',))
+    counter = registry.counter('bench_total', 'bench', ('endpoint', 'code'))
+    labels = [f'handler_{i}' for i in range(args.series)]
+    series = args.series
+
+    baseline = per_call_ns(lambda i: labels[i % series], args.count)
+    observe = per_call_ns(lambda i: histogram.observe(0.001 * (i % 1000), labels[i % series]), args.count)
+    inc = per_call_ns(lambda i: counter.inc(labels[i % series], 0), args.count)
+    clock = per_call_ns(lambda i: time.perf_counter(), args.count)
+
+    started = time.perf_counter()
+    text = registry.render()
+    render_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Histogram.observe  {observe - baseline:8.0f} нс")
+    print(f"Counter.inc        {inc - baseline:8.0f} нс")
+    print(f"time.perf_counter  {clock - baseline:8.0f} нс (два вызова на замер обработчика)")
+    print(f"render /metrics    {render_ms:8.2f} мс ({len(text.splitlines())} строк)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Микро-бенчмарк подписи запросов Antilopay
+
+Сравнивает число подписей в секунду:
+  before  - прежняя схема: base64-декодирование и RSA.importKey на каждую подпись
+  after   - AntilopaySigner: ключ разобран один раз, pkcs1_15 переиспользуется
+  pool    - AntilopaySigner.sign_async: пачка подписей через пул crypto
+            (дополнительно показывает задержку event loop во время пачки)
+
+Запуск:
+    python scripts/bench_signer.py --count 300
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import time
+
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+
+PRIVATE_KEY = base64.b64encode(RSA.generate(2048).export_key('DER')).decode()
+os.environ.setdefault('ANTILOPAY_PRIVATE_KEY', PRIVATE_KEY)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from services.antilopay import AntilopaySigner  # noqa: E402
+
+PAYLOAD = '{"project_identificator":"bench","order_id":"00000000-0000-0000-0000-000000000000"}'
+
+
+def sign_before(payload: str) -> str:
+    """Прежняя реализация _generate_signature"""
+    rsa_key = RSA.importKey(base64.b64decode(PRIVATE_KEY))
+    hash_obj = SHA256.new(bytes(payload, 'UTF-8'))
+    return base64.b64encode(pkcs1_15.new(rsa_key).sign(hash_obj)).decode('utf-8')
+
+
+def measure(fn, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        fn(PAYLOAD)
+    return count / (time.perf_counter() - started)
+
+
+async def measure_pool(signer: AntilopaySigner, count: int):
+    """Пачка подписей через пул и максимальная задержка loop за это время"""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    worst_lag = 0.0
+
+    async def probe():
+        nonlocal worst_lag
+        while not stop.is_set():
+            expected = loop.time() + 0.005
+            await asyncio.sleep(0.005)
+            worst_lag = max(worst_lag, loop.time() - expected)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(signer.sign_async(PAYLOAD) for _ in range(count)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return count / elapsed, worst_lag * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=300, help='Число подписей в каждом режиме')
+    args = parser.parse_args()
+
+    signer = AntilopaySigner(PRIVATE_KEY)
+    signer.load()
+    assert signer.sign(PAYLOAD) == sign_before(PAYLOAD)
+
+    before = measure(sign_before, args.count)
+    after = measure(signer.sign, args.count)
+    pool, lag_ms = asyncio.run(measure_pool(signer, args.count))
+    asyncio.run(signer.executor.close())
+
+    print(f"{'mode':<8}{'sign/s':>10}")
+    print(f"{'before':<8}{before:>10.0f}")
+    print(f"{'after':<8}{after:>10.0f}   x{after / before:.1f}")
+    print(f"{'pool':<8}{pool:>10.0f}   loop lag max {lag_ms:.1f} ms ({signer.executor.lanes['crypto'].max_workers} threads)")
+
+
+if __name__ == '__main__':
+    main()
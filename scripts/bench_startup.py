@@ -0,0 +1,114 @@
+"""
+Бенчмарк запуска бота: время импорта bot.py и время до ответа на первое обновление
+
+import   - `import bot` в отдельном процессе (по умолчанию 5 запусков),
+           плюс проверка, что тяжелые библиотеки интеграций не загружены
+first    - запуск `python bot.py` против локального стенда Telegram
+           (scripts/fake_telegram.py): время от старта процесса до ответа на /start
+
+Запуск:
+    python scripts/bench_startup.py --runs 5
+    python scripts/bench_startup.py --runs 3 --no-prewarm
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_telegram import BOT_TOKEN, FakeTelegramAPI, text_update  # noqa: E402
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+# Библиотеки, которые не должны загружаться при импорте бота
+HEAVY_MODULES = ('gspread', 'google.auth', 'Crypto', 'googleapiclient', 'requests')
+
+IMPORT_PROBE = (
+    "import sys, time\n"
+    "started = time.perf_counter()\n"
+    "import bot\n"
+    "print(time.perf_counter() - started)\n"
+    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+)
+
+
+def measure_import(runs: int):
+    timings, loaded = [], ''
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE], cwd=SRC_DIR, capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        timings.append(float(output[0]))
+        loaded = output[1] if len(output) > 1 else ''
+    return timings, loaded
+
+
+async def measure_first_update(env: dict, port: int, timeout: float) -> float:
+    api = FakeTelegramAPI()
+    runner = web.AppRunner(api.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    chat_id = 42
+    api.push_update({'update_id': 1, **text_update(chat_id, '/start')})
+
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, 'bot.py', cwd=SRC_DIR, env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        replied = await asyncio.wait_for(api.replies(chat_id).get(), timeout)
+        return replied - started
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(process.wait(), 10)
+        except asyncio.TimeoutError:
+            process.kill()
+        await runner.cleanup()
+
+
+def report(name: str, timings: list):
+    print(f"{name:<22} median {statistics.median(timings) * 1000:7.0f} мс   "
+          f"min {min(timings) * 1000:7.0f} мс   max {max(timings) * 1000:7.0f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8091, help='Порт локального стенда Telegram')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--no-prewarm', action='store_true', help='Запуск с PREWARM_ENABLED=false')
+    args = parser.parse_args()
+
+    timings, loaded = measure_import(args.runs)
+    report('import bot', timings)
+    print(f"{'тяжелые библиотеки':<22} {loaded or 'не загружены'}")
+
+    first = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(args.runs):
+            env = {
+                **os.environ,
+                'BOT_TOKEN': BOT_TOKEN,
+                'BOT_RUN_MODE': 'polling',
+                'TELEGRAM_API_URL': f'http://127.0.0.1:{args.port}',
+                'DATABASE_FILE': os.path.join(tmp, f'bench_{run}.db'),
+                'PREWARM_ENABLED': 'false' if args.no_prewarm else 'true',
+                'METRICS_ENABLED': 'false',
+                'ANTILOPAY_WEBHOOK_ENABLED': 'false',
+            }
+            first.append(asyncio.run(measure_first_update(env, args.port, args.timeout)))
+    report('до первого ответа', first)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+Локальный стенд Telegram для замера сквозной задержки обработчиков без сети
+
+Стенд поднимает фальшивый Bot API (отвечает на sendMessage, editMessageText,
+deleteMessage, answerCallbackQuery, getUpdates и т.д.) и отправляет боту
+записанные обновления. Каждый чат проходит свой сценарий последовательно,
+как живой менеджер: следующее обновление уходит только после того,
+как бот ответил на предыдущее (sendMessage/editMessageText в этот чат).
+Задержка - время от отправки обновления до этого ответа.
+
+Режимы:
+  webhook  - обновления отправляются POST-запросом на webhook бота
+  polling  - обновления отдаются боту через getUpdates
+
+По умолчанию бот (роутеры из src/handlers) запускается в этом же процессе:
+    python scripts/fake_telegram.py --mode webhook --chats 20
+    python scripts/fake_telegram.py --mode polling --chats 20
+
+Проверка отдельно запущенного бота (BOT_RUN_MODE=webhook,
+TELEGRAM_API_URL=http://127.0.0.1:8081, TELEGRAM_WEBHOOK_SECRET=secret):
+    python scripts/fake_telegram.py --target http://127.0.0.1:8080/telegram/webhook \\
+        --secret secret --api-port 8081
+
+Свои обновления можно передать файлом JSONL (по одному Update на строку):
+    python scripts/fake_telegram.py --updates recorded.jsonl
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import ClientSession, web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+BOT_TOKEN = '123456:FAKE-TOKEN'
+BOT_ID = 123456
+# Методы, которые считаются видимым ответом пользователю
+REPLY_METHODS = {'sendMessage', 'editMessageText'}
+
+
+class FakeTelegramAPI:
+    """Фальшивый Bot API: отвечает на вызовы бота и отмечает ответы в чаты"""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self._message_ids = itertools.count(1000)
+        self._replies: Dict[int, asyncio.Queue] = {}
+        self._updates: List[dict] = []
+        self._updates_event = asyncio.Event()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        return app
+
+    def replies(self, chat_id: int) -> asyncio.Queue:
+        return self._replies.setdefault(chat_id, asyncio.Queue())
+
+    def push_update(self, update: dict):
+        self._updates.append(update)
+        self._updates_event.set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = dict(await request.post())
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        if method == 'getUpdates':
+            return web.json_response({'ok': True, 'result': await self._get_updates(params)})
+
+        chat_id = int(params['chat_id']) if 'chat_id' in params else None
+        if method in REPLY_METHODS and chat_id is not None:
+            self.replies(chat_id).put_nowait(time.perf_counter())
+
+        if method == 'getMe':
+            result = {'id': BOT_ID, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+        elif method in REPLY_METHODS:
+            result = {
+                'message_id': int(params.get('message_id') or next(self._message_ids)),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Fake'},
+                'text': params.get('text', '')
+            }
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def _get_updates(self, params: dict) -> List[dict]:
+        offset = int(params.get('offset', 0))
+        self._updates = [u for u in self._updates if u['update_id'] >= offset]
+        if not self._updates:
+            self._updates_event.clear()
+            try:
+                await asyncio.wait_for(self._updates_event.wait(), float(params.get('timeout', 10)))
+            except asyncio.TimeoutError:
+                return []
+        return list(self._updates)
+
+
+def _user(chat_id: int) -> dict:
+    return {'id': chat_id, 'is_bot': False, 'first_name': f'Manager{chat_id}', 'username': f'manager{chat_id}'}
+
+
+def text_update(chat_id: int, text: str) -> dict:
+    message = {
+        'message_id': 1, 'date': int(time.time()), 'text': text,
+        'chat': {'id': chat_id, 'type': 'private'}, 'from': _user(chat_id)
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'message': message}
+
+
+def callback_update(chat_id: int, data: str, message_id: int = 1000) -> dict:
+    return {
+        'callback_query': {
+            'id': f'{chat_id}-{data}', 'from': _user(chat_id), 'chat_instance': str(chat_id), 'data': data,
+            'message': {
+                'message_id': message_id, 'date': int(time.time()), 'text': '...',
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Fake'}
+            }
+        }
+    }
+
+
+def default_scenario(chat_id: int) -> List[dict]:
+    """Мастер свободной продажи до экрана подтверждения и возврат в меню"""
+    return [
+        text_update(chat_id, '/start'),
+        callback_update(chat_id, 'free_sale'),
+        text_update(chat_id, 'Подписка PS Plus'),
+        text_update(chat_id, 'client@example.com'),
+        text_update(chat_id, 'Лид из чата'),
+        text_update(chat_id, '1500'),
+        callback_update(chat_id, 'cancel'),
+    ]
+
+
+def update_chat_id(update: dict) -> int:
+    if 'message' in update:
+        return update['message']['chat']['id']
+    return update['callback_query']['message']['chat']['id']
+
+
+def load_scenarios(args) -> Dict[int, List[dict]]:
+    if not args.updates:
+        return {chat_id: default_scenario(chat_id) for chat_id in range(1, args.chats + 1)}
+    scenarios: Dict[int, List[dict]] = {}
+    with open(args.updates, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                update = json.loads(line)
+                update.pop('update_id', None)
+                scenarios.setdefault(update_chat_id(update), []).append(update)
+    return scenarios
+
+
+async def run_chat(api: FakeTelegramAPI, deliver, updates: List[dict], update_ids, timeout: float) -> List[float]:
+    latencies = []
+    for update in updates:
+        chat_id = update_chat_id(update)
+        replies = api.replies(chat_id)
+        while not replies.empty():
+            replies.get_nowait()
+        started = time.perf_counter()
+        await deliver({'update_id': next(update_ids), **update})
+        try:
+            replied = await asyncio.wait_for(replies.get(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Чат {chat_id}: нет ответа за {timeout} с")
+            continue
+        latencies.append(replied - started)
+    return latencies
+
+
+def build_dispatcher():
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram import Dispatcher
+    from handlers import common, free_sale, our_product
+    from middlewares import ChatEventIsolation
+
+    dp = Dispatcher(storage=MemoryStorage(), events_isolation=ChatEventIsolation())
+    dp.include_router(common.router)
+    dp.include_router(free_sale.router)
+    dp.include_router(our_product.router)
+    return dp
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['webhook', 'polling'], default='webhook')
+    parser.add_argument('--chats', type=int, default=10, help='Число одновременных чатов в сценарии по умолчанию')
+    parser.add_argument('--updates', help='JSONL с записанными обновлениями')
+    parser.add_argument('--target', help='Webhook URL отдельно запущенного бота')
+    parser.add_argument('--secret', default='fake-secret', help='Секрет webhook')
+    parser.add_argument('--api-port', type=int, default=8081)
+    parser.add_argument('--bot-port', type=int, default=8082, help='Порт webhook бота в этом процессе')
+    parser.add_argument('--timeout', type=float, default=5.0)
+    parser.add_argument('--outbound', action='store_true',
+                        help='Пропускать запросы бота через OutboundScheduler (лимиты Telegram)')
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI()
+    runners = []
+    api_runner = web.AppRunner(api.app(), access_log=None)
+    await api_runner.setup()
+    await web.TCPSite(api_runner, '127.0.0.1', args.api_port).start()
+    runners.append(api_runner)
+
+    bot = None
+    polling_task: Optional[asyncio.Task] = None
+    target = args.target
+    if target is None:
+        from aiogram import Bot
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+        from web_server import setup_telegram_webhook
+
+        bot = Bot(BOT_TOKEN, session=AiohttpSession(
+            api=TelegramAPIServer.from_base(f'http://127.0.0.1:{args.api_port}')
+        ))
+        if args.outbound:
+            from services.telegram_outbound import OutboundScheduler
+            OutboundScheduler().setup(bot)
+        dp = build_dispatcher()
+        if args.mode == 'webhook':
+            bot_app = web.Application()
+            setup_telegram_webhook(bot_app, dp, bot, path='/telegram/webhook', secret_token=args.secret)
+            bot_runner = web.AppRunner(bot_app, access_log=None)
+            await bot_runner.setup()
+            await web.TCPSite(bot_runner, '127.0.0.1', args.bot_port).start()
+            runners.insert(0, bot_runner)
+            target = f'http://127.0.0.1:{args.bot_port}/telegram/webhook'
+        else:
+            polling_task = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=10))
+
+    async with ClientSession() as session:
+        async def post_update(update: dict):
+            async with session.post(target, json=update,
+                                    headers={'X-Telegram-Bot-Api-Secret-Token': args.secret}) as response:
+                if response.status != 200:
+                    print(f"Webhook ответил {response.status}")
+
+        async def queue_update(update: dict):
+            api.push_update(update)
+
+        deliver = queue_update if polling_task else post_update
+        update_ids = itertools.count(1)
+        scenarios = load_scenarios(args)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            run_chat(api, deliver, updates, update_ids, args.timeout) for updates in scenarios.values()
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(itertools.chain.from_iterable(results))
+    mode = 'external webhook' if args.target else args.mode
+    print(f"Режим: {mode}, чатов: {len(scenarios)}, обновлений с ответом: {len(latencies)} за {elapsed:.2f} с")
+    if latencies:
+        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+        print(f"Задержка ответа: mean {statistics.mean(latencies) * 1000:.1f} мс, "
+              f"p50 {latencies[len(latencies) // 2] * 1000:.1f} мс, p99 {p99 * 1000:.1f} мс")
+    print(f"Вызовы Bot API: {dict(sorted(api.calls.items()))}")
+
+    if polling_task:
+        await dp.stop_polling()
+        await asyncio.gather(polling_task, return_exceptions=True)
+    for runner in runners:
+        await runner.cleanup()
+    if bot is not None:
+        await bot.session.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,290 @@
+"""
+Нагрузка на конвейер платежей: создание -> отслеживание -> запись продажи
+
+В одном процессе поднимаются stand-in Antilopay (scripts/antilopay_standin.py),
+фальшивый Bot API (scripts/fake_telegram.py) и таблица в памяти с задержкой
+записи. Со стороны бота работают настоящие компоненты: AntilopayAPI с подписью
+запросов, PaymentScheduler, PaymentTracker, SalesOutbox с пакетной записью,
+SalesLedger и PaymentStore (во временной базе). Мастер продажи в Telegram
+не участвует - его задержку измеряет scripts/fake_telegram.py.
+
+Заказы создаются с частотой --rate в секунду; исход и время оплаты каждого
+разыгрывает stand-in. Для каждого заказа измеряется:
+  создание     - вызов create_payment (подпись и запрос)
+  обнаружение  - от финального статуса в stand-in до сообщения менеджеру
+  запись       - от оплаты в stand-in до строки в таблице (только SUCCESS)
+Интервалы опроса по умолчанию уменьшены, чтобы прогон занимал минуту-две.
+
+Запуск:
+    python scripts/load_payments.py --orders 1000 --rate 50
+    python scripts/load_payments.py --orders 1000 --rate 50 --notify
+    python scripts/load_payments.py --latency 0.3 --error-rate 0.05 --error-codes 500,429
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from antilopay_standin import AntilopayStandIn, add_scenario_arguments, key_env, load_key, scenario_from_args  # noqa: E402
+from fake_telegram import BOT_TOKEN, FakeTelegramAPI  # noqa: E402
+
+HOST = '127.0.0.1'
+SECRET_ID = 'load-secret'
+PROJECT_ID = 'load-project'
+WEBHOOK_PATH = '/antilopay/callback'
+
+
+class MemorySheets:
+    """Таблица в памяти: запись пакета занимает latency секунд, время записи запоминается по заказу"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.recorded: Dict[str, float] = {}
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def free_sale_row(**kwargs) -> list:
+        from services.google_sheets import GoogleSheetsService
+        return GoogleSheetsService.free_sale_row(**kwargs)
+
+    @staticmethod
+    def product_sale_row(**kwargs) -> list:
+        from services.google_sheets import GoogleSheetsService
+        return GoogleSheetsService.product_sale_row(**kwargs)
+
+    def _append_rows(self, title: str, headers: list, rows: List[list]) -> bool:
+        time.sleep(self.latency)
+        now = time.perf_counter()
+        with self._lock:
+            self.batches += 1
+            for row in rows:
+                # Номер заказа - последняя колонка строки продажи
+                self.recorded.setdefault(str(row[-1]), now)
+        return True
+
+    def order_exists(self, title: str, order_id: str, column: int) -> bool:
+        with self._lock:
+            return order_id in self.recorded
+
+
+def percentile(values: List[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def report(name: str, values: List[float]):
+    if not values:
+        print(f"{name:<14} нет данных")
+        return
+    print(f"{name:<14} n={len(values):<6} p50 {percentile(values, 0.5) * 1000:8.1f} мс   "
+          f"p99 {percentile(values, 0.99) * 1000:8.1f} мс   max {max(values) * 1000:8.1f} мс")
+
+
+def setup_environment(args, key) -> str:
+    """Настройки бота до импорта config: stand-in, ключи и временная база"""
+    db_file = os.path.join(tempfile.mkdtemp(prefix='load_payments_'), 'bot.db')
+    os.environ.update({
+        'BOT_TOKEN': BOT_TOKEN,
+        'ANTILOPAY_API_URL': f'http://{HOST}:{args.standin_port}',
+        'ANTILOPAY_SECRET_ID': SECRET_ID,
+        'ANTILOPAY_PROJECT_ID': PROJECT_ID,
+        'DATABASE_FILE': db_file,
+        **key_env(key)
+    })
+    return db_file
+
+
+async def run(args):
+    key = load_key(args.key)
+    db_file = setup_environment(args, key)
+
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    from models import FreeSaleData
+    from services.antilopay import antilopay_api
+    from services.antilopay_webhook import AntilopayWebhook
+    from services.executor import integration_executor
+    from services.google_sheets import SheetsWriteQueue
+    from services.payment_scheduler import PaymentScheduler
+    from services.payment_store import PaymentStore
+    from services.payment_tracker import PaymentTracker
+    from services.polling_policy import AdaptivePollingPolicy, FixedIntervalPolicy
+    from services.sales_ledger import SalesLedger
+    from services.sales_outbox import SalesOutbox
+
+    notify_url = f'http://{HOST}:{args.webhook_port}{WEBHOOK_PATH}' if args.notify else None
+    standin = AntilopayStandIn(key, scenario_from_args(args), secret_id=SECRET_ID, project_id=PROJECT_ID,
+                               notify_url=notify_url, seed=args.seed)
+    await standin.start(HOST, args.standin_port)
+
+    telegram = FakeTelegramAPI()
+    runners = [web.AppRunner(telegram.app(), access_log=None)]
+    await runners[0].setup()
+    await web.TCPSite(runners[0], HOST, args.telegram_port).start()
+    bot = Bot(BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(f'http://{HOST}:{args.telegram_port}')))
+    if args.outbound:
+        from services.telegram_outbound import OutboundScheduler
+        OutboundScheduler().setup(bot)
+
+    sheets = MemorySheets(args.sheets_latency)
+    write_queue = SheetsWriteQueue(sheets)
+    store = PaymentStore(db_file)
+    outbox = SalesOutbox(db_file, service=sheets, queue=write_queue)
+    ledger = SalesLedger(db_file)
+    if args.notify:
+        # Как в bot.py: при уведомлениях опрос - только редкая подстраховка
+        policy = FixedIntervalPolicy(args.fallback_interval)
+    else:
+        policy = AdaptivePollingPolicy(args.dense_interval, args.dense_window, args.sparse_interval, args.max_interval)
+    scheduler = PaymentScheduler(PaymentTracker(bot, outbox, ledger), store=store, policy=policy,
+                                 tracking_window=args.window)
+    if args.notify:
+        webhook_app = web.Application()
+        AntilopayWebhook(scheduler).setup(webhook_app, WEBHOOK_PATH)
+        runners.append(web.AppRunner(webhook_app, access_log=None))
+        await runners[-1].setup()
+        await web.TCPSite(runners[-1], HOST, args.webhook_port).start()
+    scheduler.start()
+    outbox.start()
+
+    orders: Dict[str, int] = {}
+    create_latencies: List[float] = []
+    create_errors = 0
+
+    async def place_order(number: int):
+        nonlocal create_errors
+        chat_id = number + 1
+        sale = FreeSaleData(service_name='Подписка PS Plus', client_login=f'client{number}@example.com',
+                            comment='нагрузка', amount=1000 + number % 500, user_id=chat_id,
+                            username=f'manager{chat_id}')
+        started = time.perf_counter()
+        result = await antilopay_api.create_payment(sale.amount, sale.service_name, sale.client_login, sale.comment)
+        create_latencies.append(time.perf_counter() - started)
+        if not result.get('success'):
+            create_errors += 1
+            return
+        orders[result['order_id']] = chat_id
+        scheduler.register(result['order_id'], result['payment_id'], sale, chat_id, 'Карта', sale.username)
+
+    print(f"Заказов: {args.orders}, {args.rate:g}/с, режим: {'уведомления' if args.notify else 'опрос'} "
+          f"({policy.name}), stand-in: задержка {standin.scenario.latency:g} с, "
+          f"ошибок {standin.scenario.error_rate:.0%}")
+    started = time.perf_counter()
+    placing = []
+    for number in range(args.orders):
+        placing.append(asyncio.create_task(place_order(number)))
+        await asyncio.sleep(1 / args.rate)
+    await asyncio.gather(*placing)
+    created_in = time.perf_counter() - started
+
+    # Ждем завершения отслеживания всех заказов и записи продаж
+    deadline = time.perf_counter() + args.window + args.timeout
+    while time.perf_counter() < deadline:
+        stats = scheduler.stats()
+        if not stats['queue_depth'] and not stats['in_flight'] and not write_queue.pending_rows \
+                and not outbox.stats()['pending']:
+            break
+        await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - started
+
+    detection, recording, completed_at = [], [], []
+    outcomes: Dict[str, int] = {}
+    for order_id, chat_id in orders.items():
+        order = standin.orders[order_id]
+        replies = telegram.replies(chat_id)
+        if replies.empty():
+            outcomes['без ответа'] = outcomes.get('без ответа', 0) + 1
+            continue
+        notified = replies.get_nowait()
+        completed_at.append(notified)
+        status = store.get_status(order_id)
+        outcomes[status] = outcomes.get(status, 0) + 1
+        if status == order.outcome:
+            detection.append(notified - order.final_at)
+        if status == 'SUCCESS' and order_id in sheets.recorded:
+            recording.append(sheets.recorded[order_id] - order.final_at)
+
+    print(f"\nСоздано {len(orders)} заказов за {created_in:.1f} с ({len(orders) / created_in:.1f}/с), "
+          f"ошибок создания: {create_errors}")
+    if completed_at:
+        span = max(completed_at) - started
+        print(f"Завершено {len(completed_at)} за {span:.1f} с: {len(completed_at) / span:.1f} заказов/с")
+    print(f"Итоги: {dict(sorted(outcomes.items()))}")
+    report('создание', create_latencies)
+    report('обнаружение', detection)
+    report('запись', recording)
+
+    checks = [standin.orders[order_id].checks for order_id in orders]
+    print(f"\nЗапросов payment/check: {sum(checks)} ({sum(checks) / max(len(checks), 1):.1f} на заказ, "
+          f"{sum(checks) / elapsed:.1f}/с)")
+    print(f"Stand-in: {dict(sorted(standin.stats.items()))}")
+    print(f"Пакетов записи в таблицу: {sheets.batches}, строк: {len(sheets.recorded)}")
+    print(f"Отставание проверок: макс. {scheduler.stats()['max_poll_lag'] * 1000:.0f} мс")
+    print(f"Вызовы Bot API: {dict(sorted(telegram.calls.items()))}")
+    print(f"Прогон: {elapsed:.1f} с")
+
+    await scheduler.stop()
+    await outbox.stop()
+    await write_queue.close()
+    await antilopay_api.close()
+    await standin.stop()
+    for runner in runners:
+        await runner.cleanup()
+    await bot.session.close()
+    outbox.close()
+    ledger.close()
+    store.close()
+    await integration_executor.close()
+
+    bad = standin.stats.get('bad_signature', 0) + standin.stats.get('bad_secret_id', 0)
+    if bad or outcomes.get('без ответа'):
+        print("\n❌ Неверные подписи или заказы без итогового сообщения")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=50, help='Новых заказов в секунду')
+    parser.add_argument('--notify', action='store_true', help='Stand-in присылает уведомления, опрос - подстраховка')
+    parser.add_argument('--window', type=float, default=60, help='Срок отслеживания платежа, с')
+    parser.add_argument('--dense-interval', type=float, default=1.0)
+    parser.add_argument('--dense-window', type=float, default=10.0)
+    parser.add_argument('--sparse-interval', type=float, default=2.0)
+    parser.add_argument('--max-interval', type=float, default=8.0)
+    parser.add_argument('--fallback-interval', type=float, default=20.0, help='Интервал опроса при --notify, с')
+    parser.add_argument('--sheets-latency', type=float, default=0.3, help='Время пакетной записи в таблицу, с')
+    parser.add_argument('--outbound', action='store_true',
+                        help='Пропускать запросы бота через OutboundScheduler (лимиты Telegram)')
+    parser.add_argument('--timeout', type=float, default=30, help='Ожидание после срока отслеживания, с')
+    parser.add_argument('--key', help='PEM ключа (по умолчанию генерируется)')
+    parser.add_argument('--standin-port', type=int, default=18090)
+    parser.add_argument('--telegram-port', type=int, default=18091)
+    parser.add_argument('--webhook-port', type=int, default=18092)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true', help='Журнал бота уровня INFO')
+    add_scenario_arguments(parser)
+    parser.set_defaults(pay_min=1.0, pay_max=20.0, expire_after=40.0, latency=0.05)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == '__main__':
+    main()
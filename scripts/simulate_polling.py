@@ -0,0 +1,117 @@
+"""
+Моделирование политик опроса статуса платежа: число запросов payment/check
+на заказ и задержка, с которой бот узнает об оплате
+
+Время оплаты клиентом разыгрывается случайно: доля --pay-share клиентов
+платит (медиана --pay-median секунд после создания, логнормальное
+распределение), остальные не платят до окончания срока. Запросы с ошибкой
+(--error-rate) не сообщают статус. Политики сравниваются на одних и тех же заказах.
+
+Запуск:
+    python scripts/simulate_polling.py --orders 10000
+    python scripts/simulate_polling.py --dense-interval 10 --max-interval 180
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config import PAYMENT_CHECK_INTERVAL, PAYMENT_FALLBACK_CHECK_INTERVAL, PAYMENT_TRACKING_WINDOW  # noqa: E402
+from models import PendingPayment  # noqa: E402
+from services.polling_policy import (  # noqa: E402
+    EXPIRY_GRACE,
+    AdaptivePollingPolicy,
+    FixedIntervalPolicy,
+    PollingPolicy
+)
+
+
+def simulate(policy: PollingPolicy, paid_at, error_rate: float, rng: random.Random):
+    """Один заказ: (число запросов, задержка обнаружения оплаты или None, опоздание последней проверки)"""
+    pending = PendingPayment(
+        order_id='', payment_id='', sale_data=None, chat_id=0, payment_display='', user_telegram_login=None,
+        deadline=PAYMENT_TRACKING_WINDOW + EXPIRY_GRACE, created_at=0.0
+    )
+    now = min(policy.first_check(pending, 0.0), pending.deadline)
+    calls = 0
+    while True:
+        calls += 1
+        status = None if rng.random() < error_rate else 'PENDING'
+        if status and paid_at is not None and paid_at <= now:
+            return calls, now - paid_at, None
+        if now >= pending.deadline:
+            return calls, None, now - PAYMENT_TRACKING_WINDOW
+        now = min(policy.next_check(pending, now, status), pending.deadline)
+
+
+def percentile(values, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def report(name: str, results):
+    calls = [result[0] for result in results]
+    delays = [result[1] for result in results if result[1] is not None]
+    paid_calls = [result[0] for result in results if result[1] is not None]
+    unpaid_calls = [result[0] for result in results if result[1] is None]
+    print(f"\n{name}")
+    print(f"  запросов на заказ: в среднем {statistics.mean(calls):.1f}"
+          f" (оплаченный {statistics.mean(paid_calls) if paid_calls else 0:.1f},"
+          f" неоплаченный {statistics.mean(unpaid_calls) if unpaid_calls else 0:.1f})")
+    if delays:
+        print(f"  оплата замечена через: медиана {statistics.median(delays):.1f} с, "
+              f"p95 {percentile(delays, 0.95):.1f} с, макс. {max(delays):.1f} с")
+    expiry = [result[2] for result in results if result[2] is not None]
+    if expiry:
+        print(f"  последняя проверка после окончания срока: {statistics.mean(expiry):.1f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--pay-share', type=float, default=0.7, help='Доля оплаченных заказов')
+    parser.add_argument('--pay-median', type=float, default=60, help='Медиана времени оплаты, с')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='Доля запросов с ошибкой')
+    parser.add_argument('--dense-interval', type=float)
+    parser.add_argument('--dense-window', type=float)
+    parser.add_argument('--sparse-interval', type=float)
+    parser.add_argument('--max-interval', type=float)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    paid_at = []
+    for _ in range(args.orders):
+        moment = rng.lognormvariate(0, 0.9) * args.pay_median if rng.random() < args.pay_share else None
+        # Оплата после окончания срока не проходит
+        paid_at.append(moment if moment is not None and moment < PAYMENT_TRACKING_WINDOW else None)
+
+    adaptive_args = {
+        name: value for name, value in (
+            ('dense_interval', args.dense_interval), ('dense_window', args.dense_window),
+            ('sparse_interval', args.sparse_interval), ('max_interval', args.max_interval)
+        ) if value is not None
+    }
+    adaptive = AdaptivePollingPolicy(**adaptive_args)
+    policies = [
+        (f"fixed, каждые {PAYMENT_CHECK_INTERVAL:.0f} с", FixedIntervalPolicy(PAYMENT_CHECK_INTERVAL)),
+        (f"fixed, каждые {PAYMENT_FALLBACK_CHECK_INTERVAL:.0f} с (подстраховка уведомлений)",
+         FixedIntervalPolicy(PAYMENT_FALLBACK_CHECK_INTERVAL)),
+        (f"adaptive: {adaptive.dense_interval:.0f} с первые {adaptive.dense_window:.0f} с, "
+         f"затем {adaptive.sparse_interval:.0f}-{adaptive.max_interval:.0f} с", adaptive),
+    ]
+
+    paid = sum(moment is not None for moment in paid_at)
+    print(f"Заказов: {args.orders}, оплачено: {paid}, срок оплаты {PAYMENT_TRACKING_WINDOW:.0f} с, "
+          f"ошибок запросов: {args.error_rate:.0%}")
+    for name, policy in policies:
+        policy_rng = random.Random(args.seed)
+        report(name, [simulate(policy, moment, args.error_rate, policy_rng) for moment in paid_at])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Нагрузочная проверка очередей обновлений по чатам (ChatEventIsolation)
+
+Много чатов одновременно присылают вперемешку сообщения и нажатия кнопок,
+как при обработке обновлений задачами в режиме polling. Обработчик читает
+данные FSM, ждет (запрос к Telegram) и записывает их обратно, добавляя номер
+обновления. Хранилище FSM с задержкой изображает SQLite/Redis.
+
+Проверяется, что в каждом чате ни одно обновление не потеряно и обработаны
+они в порядке прихода, что разные чаты обрабатываются параллельно и что
+после прогона не остается очередей. Для сравнения тот же прогон выполняется
+без изоляции (как aiogram по умолчанию).
+
+Запуск:
+    python scripts/stress_chat_serialization.py --chats 500 --updates 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+os.environ.setdefault('BOT_TOKEN', '123456:FAKE-TOKEN')
+
+from aiogram import Bot, Dispatcher, Router  # noqa: E402
+from aiogram.fsm.context import FSMContext  # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage  # noqa: E402
+from aiogram.types import CallbackQuery, Message, Update  # noqa: E402
+
+from fake_telegram import BOT_TOKEN, callback_update, text_update  # noqa: E402
+from middlewares import ChatEventIsolation  # noqa: E402
+
+
+class SlowStorage(MemoryStorage):
+    """MemoryStorage с задержкой каждого обращения"""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    async def get_state(self, key):
+        await asyncio.sleep(self.delay)
+        return await super().get_state(key)
+
+    async def set_state(self, key, state=None):
+        await asyncio.sleep(self.delay)
+        await super().set_state(key, state)
+
+    async def get_data(self, key):
+        await asyncio.sleep(self.delay)
+        return await super().get_data(key)
+
+    async def set_data(self, key, data):
+        await asyncio.sleep(self.delay)
+        await super().set_data(key, data)
+
+
+def build_router(api_delay: float, rng: random.Random) -> Router:
+    router = Router()
+
+    async def record(update_id: int, state: FSMContext):
+        # Как шаг мастера: прочитать данные, отправить запрос в Telegram, записать данные
+        data = await state.get_data()
+        await asyncio.sleep(api_delay * rng.uniform(0.5, 1.5))
+        data['seen'] = [*data.get('seen', []), update_id]
+        await state.set_data(data)
+
+    @router.message()
+    async def on_message(message: Message, state: FSMContext):
+        await record(int(message.text), state)
+
+    @router.callback_query()
+    async def on_callback(callback: CallbackQuery, state: FSMContext):
+        await record(int(callback.data), state)
+
+    return router
+
+
+async def run(isolation: ChatEventIsolation, args) -> dict:
+    rng = random.Random(args.seed)
+    storage = SlowStorage(args.storage_delay)
+    dp = Dispatcher(storage=storage, events_isolation=isolation)
+    dp.include_router(build_router(args.api_delay, rng))
+    bot = Bot(BOT_TOKEN)
+
+    # Обновления приходят вперемешку по чатам, внутри чата - по порядку
+    sent = {chat_id: [] for chat_id in range(1, args.chats + 1)}
+    updates = []
+    update_id = 0
+    for _ in range(args.updates):
+        for chat_id in sent:
+            update_id += 1
+            sent[chat_id].append(update_id)
+            raw = text_update(chat_id, str(update_id)) if rng.random() < 0.5 else callback_update(chat_id, str(update_id))
+            updates.append(Update.model_validate({'update_id': update_id, **raw}, context={'bot': bot}))
+
+    started = time.perf_counter()
+    # Как polling с handle_as_tasks: каждое обновление - отдельная задача
+    await asyncio.gather(*(asyncio.create_task(dp.feed_update(bot, update)) for update in updates))
+    elapsed = time.perf_counter() - started
+
+    lost = reordered = 0
+    for chat_id, ids in sent.items():
+        key = dp.fsm.get_context(bot, chat_id, chat_id).key
+        seen = (await MemoryStorage.get_data(storage, key)).get('seen', [])
+        lost += len(ids) - len(seen)
+        reordered += seen != ids[:len(seen)]
+    await bot.session.close()
+    return {
+        'elapsed': elapsed,
+        'lost': lost,
+        'reordered': reordered,
+        'stats': isolation.stats() if isolation is not None else None
+    }
+
+
+def report(name: str, result: dict, total: int):
+    print(f"\n{name}")
+    print(f"  время: {result['elapsed']:.2f} с, {total / result['elapsed']:.0f} обновлений/с")
+    print(f"  потеряно обновлений: {result['lost']} из {total}")
+    print(f"  чатов с нарушенным порядком: {result['reordered']}")
+    if result['stats'] is not None:
+        stats = result['stats']
+        print(f"  ждали предыдущее: {stats['serialized']}, макс. очередь: {stats['max_depth']}, "
+              f"очередей после прогона: {stats['chats']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=500)
+    parser.add_argument('--updates', type=int, default=10, help='Обновлений на чат')
+    parser.add_argument('--storage-delay', type=float, default=0.002, help='Задержка хранилища FSM, с')
+    parser.add_argument('--api-delay', type=float, default=0.02, help='Задержка запроса к Telegram, с')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    total = args.chats * args.updates
+    # Нижняя граница при последовательной обработке чата: обновления одно за другим
+    per_update = 4 * args.storage_delay + args.api_delay
+    print(f"{args.chats} чатов x {args.updates} обновлений; "
+          f"последовательно в чате не быстрее {args.updates * per_update:.2f} с")
+
+    report("Без изоляции (aiogram по умолчанию)", await run(None, args), total)
+    isolated = await run(ChatEventIsolation(), args)
+    report("ChatEventIsolation", isolated, total)
+
+    stats = isolated['stats']
+    if isolated['lost'] or isolated['reordered'] or stats['chats']:
+        print("\n❌ Обновления одного чата пересеклись или очереди не освобождены")
+        sys.exit(1)
+    print("\n✅ Обновления каждого чата обработаны по порядку, очереди освобождены")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -2,10 +2,81 @@ import asyncio
 import logging
 import sys
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
 
-from config import BOT_TOKEN
-from handlers import common, free_sale, our_product
+from config import (
+    BOT_TOKEN,
+    CHAT_SERIALIZATION_ENABLED,
+    ANTILOPAY_WEBHOOK_ENABLED,
+    ANTILOPAY_WEBHOOK_PATH,
+    PAYMENT_FALLBACK_CHECK_INTERVAL,
+    LOOP_MONITOR_ENABLED,
+    PREWARM_ENABLED,
+    METRICS_ENABLED,
+    METRICS_PATH,
+    BOT_RUN_MODE,
+    TELEGRAM_API_URL,
+    TELEGRAM_WEBHOOK_URL,
+    TELEGRAM_WEBHOOK_PATH
+)
+from handlers import admin, common, free_sale, our_product
+from services.antilopay import antilopay_api
+from services.antilopay_webhook import AntilopayWebhook
+from services.google_sheets import sheets_write_queue
+from services.payment_store import PaymentStore
+from services.sales_outbox import SalesOutbox
+from services.sales_ledger import SalesLedger
+from services.fsm_storage import create_fsm_storage
+from services.telegram_outbound import OutboundScheduler
+from services.executor import integration_executor
+from services.game_catalog import game_catalog
+from services.price_list import price_list
+from services.payment_tracker import PaymentTracker
+from services.payment_scheduler import PaymentScheduler
+from services.polling_policy import FixedIntervalPolicy
+from services.reconciliation import Reconciler
+from web_server import start_web_server, setup_telegram_webhook
+from loop_monitor import LoopLagMonitor
+from metrics import registry
+from middlewares import ChatEventIsolation, HandlerMetricsMiddleware
+from prewarm import start_prewarm
+
+
+def register_runtime_metrics(payment_scheduler: PaymentScheduler, payment_store: PaymentStore,
+                             sales_outbox: SalesOutbox, outbound_scheduler: OutboundScheduler,
+                             loop_monitor: LoopLagMonitor = None, chat_isolation: ChatEventIsolation = None):
+    """Метрики состояния компонентов, вычисляемые при каждом запросе /metrics"""
+    registry.callback('payments_tracked', 'Платежи в очереди проверок',
+                      lambda: payment_scheduler.stats()['queue_depth'])
+    registry.callback('payments_checking', 'Платежи, проверяемые прямо сейчас',
+                      lambda: payment_scheduler.stats()['in_flight'])
+    registry.callback('payments_by_status', 'Заказы в локальной базе по статусам',
+                      lambda: {(status,): count for status, count in payment_store.count_by_status().items()},
+                      ('status',))
+    registry.callback('sales_outbox_pending', 'Оплаченные продажи, не записанные в таблицу',
+                      lambda: sales_outbox.stats()['pending'])
+    registry.callback('telegram_outbound_waiting', 'Запросы к Telegram, ожидающие общего лимита',
+                      lambda: outbound_scheduler.stats()['waiting'])
+    registry.callback('telegram_retry_after_total', 'Ответы RetryAfter от Telegram',
+                      lambda: outbound_scheduler.stats()['retry_after'], kind='counter')
+    for key, name, documentation, kind in (
+        ('queue_depth', 'integration_lane_queue_depth', 'Вызовы в очереди пула интеграции', 'gauge'),
+        ('in_flight', 'integration_lane_in_flight', 'Выполняемые вызовы пула интеграции', 'gauge'),
+        ('completed', 'integration_lane_completed_total', 'Выполненные вызовы пула интеграции', 'counter'),
+        ('max_wait', 'integration_lane_max_wait_seconds', 'Наибольшее ожидание в очереди пула', 'gauge'),
+    ):
+        registry.callback(name, documentation,
+                          lambda key=key: {(lane,): stats[key] for lane, stats in integration_executor.stats().items()},
+                          ('lane',), kind)
+    if loop_monitor is not None:
+        registry.callback('event_loop_lag_seconds', 'Задержка event loop', loop_monitor.histogram, kind='histogram')
+    if chat_isolation is not None:
+        registry.callback('chat_queues_active', 'Чаты с обновлениями в обработке',
+                          lambda: chat_isolation.stats()['chats'])
+        registry.callback('chat_queue_waiting', 'Обновления, ожидающие своей очереди в чате',
+                          lambda: chat_isolation.stats()['waiting'])
 
 
 async def main():
@@ -21,13 +92,78 @@ async def main():
     if not BOT_TOKEN:
         logging.error("BOT_TOKEN не найден в переменных окружения!")
         return
+    if BOT_RUN_MODE not in ("polling", "webhook"):
+        logging.error(f"Неизвестный BOT_RUN_MODE: {BOT_RUN_MODE} (ожидается polling или webhook)")
+        return
+    if BOT_RUN_MODE == "webhook" and not TELEGRAM_WEBHOOK_URL:
+        logging.error("Для BOT_RUN_MODE=webhook нужен TELEGRAM_WEBHOOK_URL")
+        return
+    
+    # Замер задержки event loop со стеком блокирующего вызова
+    loop_monitor = LoopLagMonitor() if LOOP_MONITOR_ENABLED else None
+    if loop_monitor is not None:
+        loop_monitor.start()
     
     # Создание бота и диспетчера
-    bot = Bot(token=BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+    bot = Bot(token=BOT_TOKEN, session=session)
+    # Все исходящие запросы проходят через общий планировщик с лимитами Telegram
+    outbound_scheduler = OutboundScheduler()
+    outbound_scheduler.setup(bot)
+    # Состояния мастеров продаж переживают перезапуск бота
+    storage = create_fsm_storage()
+    # Обновления одного чата - по очереди: ввод текста и нажатие кнопки не перезаписывают данные FSM друг друга
+    chat_isolation = ChatEventIsolation() if CHAT_SERIALIZATION_ENABLED else None
+    dp = Dispatcher(storage=storage, events_isolation=chat_isolation)
+    
+    # Единый планировщик проверок статуса платежей (доступен обработчикам по имени).
+    # Незавершенные платежи восстанавливаются из локальной базы после перезапуска,
+    # при включенных уведомлениях Antilopay опрос статуса - только редкая подстраховка
+    payment_store = PaymentStore()
+    sales_outbox = SalesOutbox()
+    sales_ledger = SalesLedger()
+    payment_scheduler = PaymentScheduler(
+        PaymentTracker(bot, sales_outbox, sales_ledger),
+        store=payment_store,
+        # Последняя проверка при любой политике выполняется в срок оплаты
+        policy=FixedIntervalPolicy(PAYMENT_FALLBACK_CHECK_INTERVAL) if ANTILOPAY_WEBHOOK_ENABLED else None
+    )
+    payment_scheduler.restore()
+    # Сверка с Antilopay заказов, отслеживание которых уже завершено
+    reconciler = Reconciler(payment_scheduler, payment_store, sales_outbox, bot)
+    dp["payment_scheduler"] = payment_scheduler
+    dp["sales_outbox"] = sales_outbox
+    dp["sales_ledger"] = sales_ledger
+    dp["integration_executor"] = integration_executor
+    dp["loop_monitor"] = loop_monitor
+    dp["game_catalog"] = game_catalog
+    dp["price_list"] = price_list
+    dp["chat_isolation"] = chat_isolation
+    dp["reconciler"] = reconciler
+    
+    # Встроенный HTTP-сервер для уведомлений Antilopay, webhook Telegram и метрик
+    web_app = web.Application()
+    if METRICS_ENABLED:
+        register_runtime_metrics(payment_scheduler, payment_store, sales_outbox, outbound_scheduler, loop_monitor,
+                                 chat_isolation)
+        registry.setup(web_app, METRICS_PATH)
+    if ANTILOPAY_WEBHOOK_ENABLED:
+        AntilopayWebhook(payment_scheduler).setup(web_app, ANTILOPAY_WEBHOOK_PATH)
+    if BOT_RUN_MODE == "webhook":
+        webhook_secret = setup_telegram_webhook(web_app, dp, bot)
+    web_runner = None
+    
+    # Ключи Antilopay и клиент Google Sheets загружаются в фоне после запуска
+    if PREWARM_ENABLED:
+        dp.startup.register(start_prewarm)
+    
+    # Время выполнения обработчиков (наследуется всеми роутерами)
+    handler_metrics = HandlerMetricsMiddleware()
+    dp.message.middleware(handler_metrics)
+    dp.callback_query.middleware(handler_metrics)
     
     # Подключение роутеров
+    dp.include_router(admin.router)
     dp.include_router(common.router)
     dp.include_router(free_sale.router)
     dp.include_router(our_product.router)
@@ -35,10 +171,47 @@ async def main():
     # Запуск бота
     logging.info("Бот запускается...")
     try:
-        await dp.start_polling(bot)
+        payment_scheduler.start()
+        sales_outbox.start()
+        reconciler.start()
+        game_catalog.start()
+        # Первая загрузка цен в фоне; дальше обновляются при обращении раз в PRICE_LIST_TTL
+        price_list.refresh()
+        if web_app.router.routes():
+            web_runner = await start_web_server(web_app)
+        if BOT_RUN_MODE == "webhook":
+            await bot.set_webhook(
+                url=TELEGRAM_WEBHOOK_URL.rstrip("/") + TELEGRAM_WEBHOOK_PATH,
+                secret_token=webhook_secret,
+                allowed_updates=dp.resolve_used_update_types()
+            )
+            logging.info("Бот принимает обновления через webhook")
+            # Обновления обрабатывает HTTP-сервер, основная задача только ждет остановки
+            await asyncio.Event().wait()
+        else:
+            # Оставшийся после режима webhook адрес мешает getUpdates
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     except Exception as e:
         logging.error(f"Ошибка при запуске бота: {e}")
     finally:
+        if web_runner is not None:
+            await web_runner.cleanup()
+        await reconciler.stop()
+        await payment_scheduler.stop()
+        await sales_outbox.stop()
+        await game_catalog.stop()
+        await price_list.stop()
+        await sheets_write_queue.close()
+        sales_outbox.close()
+        sales_ledger.close()
+        payment_store.close()
+        await storage.close()
+        await antilopay_api.close()
+        # Пулы останавливаются последними: до этого в них дописываются строки таблицы
+        await integration_executor.close()
+        if loop_monitor is not None:
+            await loop_monitor.stop()
         await bot.session.close()
 
 
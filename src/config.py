@@ -12,13 +12,122 @@ ANTILOPAY_SECRET_ID = os.getenv('ANTILOPAY_SECRET_ID')
 ANTILOPAY_PRIVATE_KEY = os.getenv('ANTILOPAY_PRIVATE_KEY')
 ANTILOPAY_PROJECT_ID = os.getenv('ANTILOPAY_PROJECT_ID')
 
+# Параметры HTTP-сессии Antilopay
+ANTILOPAY_CONNECTION_LIMIT = int(os.getenv('ANTILOPAY_CONNECTION_LIMIT', '20'))
+ANTILOPAY_KEEPALIVE_TIMEOUT = float(os.getenv('ANTILOPAY_KEEPALIVE_TIMEOUT', '60'))
+ANTILOPAY_CREATE_TIMEOUT = float(os.getenv('ANTILOPAY_CREATE_TIMEOUT', '30'))
+ANTILOPAY_CHECK_TIMEOUT = float(os.getenv('ANTILOPAY_CHECK_TIMEOUT', '10'))
+
+# Локальная база данных (SQLite)
+DATABASE_FILE = os.getenv('DATABASE_FILE', 'bot.db')
+
+# Загрузка библиотек интеграций и авторизация в фоне сразу после запуска
+PREWARM_ENABLED = os.getenv('PREWARM_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Контроль задержки event loop (включается явно)
+LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+LOOP_LAG_THRESHOLD = float(os.getenv('LOOP_LAG_THRESHOLD', '0.5'))  # секунд до записи стека
+LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', '0.1'))  # секунд между замерами
+
+# Потоки для блокирующих вызовов интеграций (по пулу на вид интеграции)
+EXECUTOR_LANES = {
+    'sheets': int(os.getenv('EXECUTOR_SHEETS_WORKERS', '2')),
+    'crypto': int(os.getenv('EXECUTOR_CRYPTO_WORKERS', '2')),
+}
+
+# Хранилище состояний диалогов (FSM): sqlite, redis или memory
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite').lower()
+FSM_STORAGE_TTL = int(os.getenv('FSM_STORAGE_TTL', '86400'))  # секунд без действий до удаления сессии
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# Обновления одного чата обрабатываются по очереди (разные чаты - параллельно)
+CHAT_SERIALIZATION_ENABLED = os.getenv('CHAT_SERIALIZATION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Отслеживание платежей
+PAYMENT_CHECK_INTERVAL = float(os.getenv('PAYMENT_CHECK_INTERVAL', '30'))  # секунд
+PAYMENT_CHECK_ATTEMPTS = int(os.getenv('PAYMENT_CHECK_ATTEMPTS', '20'))
+PAYMENT_POLL_CONCURRENCY = int(os.getenv('PAYMENT_POLL_CONCURRENCY', '10'))
+PAYMENT_TRACKING_WINDOW = PAYMENT_CHECK_INTERVAL * PAYMENT_CHECK_ATTEMPTS  # 10 минут по умолчанию
+# Расписание проверок статуса: adaptive - часто сразу после создания, затем все реже
+# (после каждого PENDING), последняя проверка - в момент окончания срока оплаты;
+# fixed - каждые PAYMENT_CHECK_INTERVAL секунд
+PAYMENT_POLL_POLICY = os.getenv('PAYMENT_POLL_POLICY', 'adaptive').lower()
+PAYMENT_POLL_DENSE_INTERVAL = float(os.getenv('PAYMENT_POLL_DENSE_INTERVAL', '15'))  # секунд
+PAYMENT_POLL_DENSE_WINDOW = float(os.getenv('PAYMENT_POLL_DENSE_WINDOW', '90'))  # секунд после создания
+PAYMENT_POLL_SPARSE_INTERVAL = float(os.getenv('PAYMENT_POLL_SPARSE_INTERVAL', '30'))  # секунд
+PAYMENT_POLL_MAX_INTERVAL = float(os.getenv('PAYMENT_POLL_MAX_INTERVAL', '120'))  # секунд
+# Часовой пояс времени создания платежа (ctime) в ответах Antilopay, если он не указан
+ANTILOPAY_CTIME_UTC_OFFSET = float(os.getenv('ANTILOPAY_CTIME_UTC_OFFSET', '3'))  # часов
+# Сколько секунд повторное нажатие "Получить ссылку" в той же сессии мастера возвращает уже созданный платеж
+PAYMENT_IDEMPOTENCY_TTL = float(os.getenv('PAYMENT_IDEMPOTENCY_TTL', '600'))
+
+# Сверка статусов заказов с Antilopay: заказы за последние RECONCILE_WINDOW_HOURS часов
+# перепроверяются раз в RECONCILE_INTERVAL секунд (0 - только командой /reconcile)
+RECONCILE_INTERVAL = float(os.getenv('RECONCILE_INTERVAL', '0'))
+RECONCILE_WINDOW_HOURS = float(os.getenv('RECONCILE_WINDOW_HOURS', '48'))
+RECONCILE_CONCURRENCY = int(os.getenv('RECONCILE_CONCURRENCY', '4'))
+RECONCILE_RATE = float(os.getenv('RECONCILE_RATE', '5'))  # запросов статуса в секунду
+
+# Уведомления Antilopay о статусе платежа (callback)
+ANTILOPAY_WEBHOOK_ENABLED = os.getenv('ANTILOPAY_WEBHOOK_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+ANTILOPAY_WEBHOOK_PATH = os.getenv('ANTILOPAY_WEBHOOK_PATH', '/antilopay/callback')
+ANTILOPAY_CALLBACK_KEY = os.getenv('ANTILOPAY_CALLBACK_KEY')  # публичный ключ проекта (Base64)
+# При включенных уведомлениях опрос статуса остается только редкой подстраховкой
+PAYMENT_FALLBACK_CHECK_INTERVAL = float(os.getenv('PAYMENT_FALLBACK_CHECK_INTERVAL', '120'))
+
+# Встроенный HTTP-сервер (уведомления Antilopay, webhook Telegram, метрики)
+WEB_SERVER_HOST = os.getenv('WEB_SERVER_HOST', '0.0.0.0')
+WEB_SERVER_PORT = int(os.getenv('WEB_SERVER_PORT', '8080'))
+
+# Метрики в формате Prometheus на встроенном HTTP-сервере
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+METRICS_PATH = os.getenv('METRICS_PATH', '/metrics')
+
+# Получение обновлений Telegram: polling или webhook (через встроенный HTTP-сервер)
+BOT_RUN_MODE = os.getenv('BOT_RUN_MODE', 'polling').lower()
+TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL', '')  # публичный адрес, например https://bot.example.com
+TELEGRAM_WEBHOOK_PATH = os.getenv('TELEGRAM_WEBHOOK_PATH', '/telegram/webhook')
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
+# Альтернативный адрес Bot API (локальный Bot API сервер или тестовый стенд)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')
+
+# Ограничение частоты исходящих запросов к Telegram
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))  # сообщений в секунду на бота
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))  # сообщений в секунду на чат
+TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', '3'))  # сообщений подряд в один чат
+TELEGRAM_RETRY_AFTER_ATTEMPTS = int(os.getenv('TELEGRAM_RETRY_AFTER_ATTEMPTS', '3'))
+
 # Google Sheets настройки
 GOOGLE_CREDENTIALS_FILE = os.getenv('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
 GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID')
+# Пакетная запись строк: по размеру пакета или по времени с первой строки
+SHEETS_BATCH_SIZE = int(os.getenv('SHEETS_BATCH_SIZE', '20'))
+SHEETS_FLUSH_INTERVAL = float(os.getenv('SHEETS_FLUSH_INTERVAL', '2'))
+# Повторная запись продаж, не попавших в таблицу (экспоненциальная задержка)
+OUTBOX_RETRY_BASE_DELAY = float(os.getenv('OUTBOX_RETRY_BASE_DELAY', '30'))
+OUTBOX_RETRY_MAX_DELAY = float(os.getenv('OUTBOX_RETRY_MAX_DELAY', '3600'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '10'))
+
+# Каталог игр для подсказок в мастере продажи товара: файл (по игре в строке)
+# и/или лист таблицы (названия в первом столбце); без источников подсказок нет
+GAME_CATALOG_FILE = os.getenv('GAME_CATALOG_FILE', '')
+GAME_CATALOG_SHEET = os.getenv('GAME_CATALOG_SHEET', '')
+GAME_CATALOG_RELOAD_INTERVAL = float(os.getenv('GAME_CATALOG_RELOAD_INTERVAL', '300'))  # секунд
+GAME_CATALOG_SUGGESTIONS = int(os.getenv('GAME_CATALOG_SUGGESTIONS', '5'))
+# Поиск по каталогу через inline-режим (включите inline mode у бота в @BotFather)
+GAME_CATALOG_INLINE = os.getenv('GAME_CATALOG_INLINE', 'false').lower() in ('1', 'true', 'yes')
+
+# Прайс-лист для подсказки суммы в мастере продажи товара: файл CSV и/или лист
+# таблицы со столбцами игра, консоль, позиция, цена; без источников сумма вводится вручную
+PRICE_LIST_FILE = os.getenv('PRICE_LIST_FILE', '')
+PRICE_LIST_SHEET = os.getenv('PRICE_LIST_SHEET', '')
+PRICE_LIST_TTL = float(os.getenv('PRICE_LIST_TTL', '600'))  # секунд до фонового обновления
 
 # Менеджер чат ID
 MANAGER_CHAT_ID = os.getenv('MANAGER_CHAT_ID')
 
+# Telegram ID администраторов (через запятую) для служебных команд
+ADMIN_IDS = [int(x) for x in os.getenv('ADMIN_IDS', '').split(',') if x.strip()]
+
 # Игровые консоли и позиции
 CONSOLES = {
     'PS4': ['П2', 'П3', 'П3.1'],
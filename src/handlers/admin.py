@@ -0,0 +1,242 @@
+import html
+
+from aiogram import Router, F
+from aiogram.types import Message
+from aiogram.filters import Command, CommandObject
+from datetime import datetime, timedelta
+from typing import Optional
+
+from config import ADMIN_IDS
+from services.payment_scheduler import PaymentScheduler
+from services.sales_outbox import SalesOutbox
+from services.sales_ledger import SalesLedger
+from services.executor import IntegrationExecutor
+from services.game_catalog import GameCatalog
+from services.price_list import PriceList
+from services.reconciliation import Reconciler
+from loop_monitor import LoopLagMonitor
+from middlewares import ChatEventIsolation
+
+router = Router()
+
+# Служебные команды доступны только администраторам из ADMIN_IDS
+router.message.filter(F.from_user.id.in_(ADMIN_IDS))
+
+
+@router.message(Command("pending"))
+async def pending_payments(message: Message, payment_scheduler: PaymentScheduler):
+    """Список платежей, ожидающих оплаты, и состояние очереди проверок"""
+    stats = payment_scheduler.stats()
+
+    lines = [
+        "⏳ <b>Ожидающие платежи</b>",
+        "━━━━━━━━━━━━━━━━",
+        f"📥 <b>В очереди:</b> {stats['queue_depth']}",
+        f"🔄 <b>Проверяется сейчас:</b> {stats['in_flight']}",
+        f"🐢 <b>Отставание проверок:</b> {stats['last_poll_lag']:.2f} с "
+        f"(макс. {stats['max_poll_lag']:.2f} с)",
+    ]
+
+    for pending in payment_scheduler.list_pending()[:20]:
+        next_check = datetime.fromtimestamp(pending.next_check_at).strftime('%H:%M:%S')
+        lines.append(
+            f"\n🆔 <code>{pending.order_id}</code>\n"
+            f"💰 {pending.sale_data.amount:.2f} ₽, попыток: {pending.attempts}, "
+            f"след. проверка: {next_check}"
+        )
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("cancel_payment"))
+async def cancel_payment(message: Message, command: CommandObject,
+                         payment_scheduler: PaymentScheduler):
+    """Снять платеж с отслеживания: /cancel_payment <order_id>"""
+    order_id = (command.args or "").strip()
+    if not order_id:
+        await message.answer("Использование: /cancel_payment <order_id>")
+        return
+
+    if payment_scheduler.cancel(order_id):
+        await message.answer(f"🚫 Отслеживание заказа <code>{order_id}</code> отменено", parse_mode="HTML")
+    else:
+        await message.answer(f"❓ Заказ <code>{order_id}</code> не найден в очереди", parse_mode="HTML")
+
+
+@router.message(Command("outbox"))
+async def outbox_backlog(message: Message, sales_outbox: SalesOutbox):
+    """Оплаченные продажи, еще не записанные в таблицу"""
+    stats = sales_outbox.stats()
+
+    lines = [
+        "📤 <b>Очередь записи в таблицу</b>",
+        "━━━━━━━━━━━━━━━━",
+        f"⏳ <b>Ожидают записи:</b> {stats['pending']}",
+        f"☑️ <b>Записано:</b> {stats['delivered']}",
+    ]
+    if stats['pending']:
+        lines.append(f"🕰 <b>Самая старая:</b> {stats['oldest_pending_age'] / 60:.0f} мин назад")
+
+    for entry in sales_outbox.list_pending():
+        next_attempt = datetime.fromtimestamp(entry['next_attempt_at']).strftime('%H:%M:%S')
+        lines.append(
+            f"\n🆔 <code>{entry['order_id']}</code> ({entry['sheet']})\n"
+            f"🔁 попыток: {entry['attempts']}, след. попытка: {next_attempt}\n"
+            f"❗ {html.escape(entry['last_error'] or '-')}"
+        )
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("summary"))
+async def sales_summary(message: Message, command: CommandObject, sales_ledger: SalesLedger):
+    """Сводка продаж из локального журнала: /summary [дней]"""
+    args = (command.args or "").strip()
+    days = int(args) if args.isdigit() and int(args) > 0 else 1
+    date_from = (datetime.now() - timedelta(days=days - 1)).date()
+
+    lines = [
+        f"📊 <b>Продажи за {days} дн.</b>",
+        "━━━━━━━━━━━━━━━━",
+    ]
+    titles = {'free_sale': "🛍 Свободные продажи", 'our_product': "🎮 Продажи товаров"}
+    for item in sales_ledger.summary(date_from=date_from, group_by=('sale_type',)):
+        lines.append(
+            f"{titles.get(item['sale_type'], item['sale_type'])}: "
+            f"{item['count']} шт., {item['amount']:.2f} ₽"
+        )
+
+    managers = sales_ledger.summary(date_from=date_from, group_by=('manager',))
+    if managers:
+        lines.append("\n👥 <b>По менеджерам:</b>")
+        for item in managers:
+            lines.append(f"@{item['manager'] or '-'}: {item['count']} шт., {item['amount']:.2f} ₽")
+    else:
+        lines.append("Продаж нет")
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("lanes"))
+async def executor_lanes(message: Message, integration_executor: IntegrationExecutor):
+    """Загрузка пулов потоков интеграций"""
+    lines = [
+        "🧵 <b>Пулы интеграций</b>",
+        "━━━━━━━━━━━━━━━━",
+    ]
+    for name, stats in integration_executor.stats().items():
+        lines.append(
+            f"\n<b>{name}</b> ({stats['workers']} потоков)\n"
+            f"📥 в очереди: {stats['queue_depth']}, выполняется: {stats['in_flight']}\n"
+            f"☑️ выполнено: {stats['completed']}, ошибок: {stats['failed']}\n"
+            f"⏱ ожидание: сред. {stats['avg_wait'] * 1000:.0f} мс, макс. {stats['max_wait'] * 1000:.0f} мс"
+        )
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("loop"))
+async def loop_lag(message: Message, loop_monitor: Optional[LoopLagMonitor]):
+    """Задержка event loop (при LOOP_MONITOR_ENABLED)"""
+    if loop_monitor is None:
+        await message.answer("Контроль задержки выключен (LOOP_MONITOR_ENABLED)")
+        return
+
+    stats = loop_monitor.stats()
+    lines = [
+        "🐢 <b>Задержка event loop</b>",
+        "━━━━━━━━━━━━━━━━",
+        f"📏 <b>Замеров:</b> {stats['count']}",
+        f"⏱ <b>Средняя:</b> {stats['avg_lag'] * 1000:.1f} мс, <b>макс.:</b> {stats['max_lag'] * 1000:.0f} мс",
+        f"🧊 <b>Остановок дольше {loop_monitor.threshold} с:</b> {stats['stalls']}",
+    ]
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("chats"))
+async def chat_queues(message: Message, chat_isolation: Optional[ChatEventIsolation]):
+    """Очереди обновлений по чатам (при CHAT_SERIALIZATION_ENABLED)"""
+    if chat_isolation is None:
+        await message.answer("Очереди по чатам выключены (CHAT_SERIALIZATION_ENABLED)")
+        return
+
+    stats = chat_isolation.stats()
+    lines = [
+        "🚦 <b>Очереди обновлений по чатам</b>",
+        "━━━━━━━━━━━━━━━━",
+        f"💬 <b>Чатов в обработке:</b> {stats['chats']}",
+        f"📥 <b>Ожидают очереди:</b> {stats['waiting']}",
+        f"🔁 <b>Обновлений ждало предыдущее:</b> {stats['serialized']}, <b>макс. очередь:</b> {stats['max_depth']}",
+    ]
+    for chat_id, depth in chat_isolation.depths()[:5]:
+        lines.append(f"• <code>{chat_id}</code>: {depth}")
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("catalog"))
+async def catalog_status(message: Message, command: CommandObject, game_catalog: GameCatalog):
+    """Каталог игр для подсказок: /catalog [reload]"""
+    if not game_catalog.enabled:
+        await message.answer("Каталог игр не настроен (GAME_CATALOG_FILE / GAME_CATALOG_SHEET)")
+        return
+
+    if (command.args or "").strip() == "reload":
+        try:
+            added, removed = await game_catalog.reload(force=True)
+        except Exception as e:
+            await message.answer(f"❌ Не удалось перезагрузить каталог: {e}")
+            return
+        await message.answer(f"🔄 Каталог перезагружен: +{added}, -{removed}")
+
+    stats = game_catalog.stats()
+    loaded_at = datetime.fromtimestamp(stats['loaded_at']).strftime('%d.%m %H:%M:%S') if stats['loaded_at'] else '-'
+    lines = [
+        "🎮 <b>Каталог игр</b>",
+        "━━━━━━━━━━━━━━━━",
+        f"📚 <b>Игр:</b> {stats['games']}",
+        f"🕰 <b>Загружен:</b> {loaded_at} за {stats['last_reload_duration'] * 1000:.0f} мс",
+    ]
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("prices"))
+async def prices_status(message: Message, command: CommandObject, price_list: PriceList):
+    """Прайс-лист для подсказки суммы: /prices [reload]"""
+    if not price_list.enabled:
+        await message.answer("Прайс-лист не настроен (PRICE_LIST_FILE / PRICE_LIST_SHEET)")
+        return
+
+    if (command.args or "").strip() == "reload":
+        try:
+            count = await price_list.reload()
+        except Exception as e:
+            await message.answer(f"❌ Не удалось перезагрузить прайс-лист: {e}")
+            return
+        await message.answer(f"🔄 Прайс-лист перезагружен: {count} цен")
+
+    loaded_at = datetime.fromtimestamp(price_list.loaded_at).strftime('%d.%m %H:%M:%S') if price_list.loaded_at else '-'
+    lines = [
+        "💰 <b>Прайс-лист</b>",
+        "━━━━━━━━━━━━━━━━",
+        f"🏷 <b>Цен:</b> {len(price_list)}",
+        f"🕰 <b>Загружен:</b> {loaded_at}, обновление раз в {price_list.ttl:.0f} с",
+        f"⏭ <b>Пропущено строк:</b> {price_list.skipped_rows}",
+    ]
+    if price_list.last_error:
+        lines.append(f"❗ <b>Последняя ошибка:</b> {html.escape(price_list.last_error)}")
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("reconcile"))
+async def reconcile_orders(message: Message, command: CommandObject, reconciler: Reconciler):
+    """Сверка статусов заказов с Antilopay: /reconcile [часов]"""
+    args = (command.args or "").strip()
+    window_hours = float(args) if args.isdigit() and int(args) > 0 else reconciler.window_hours
+
+    if not reconciler.launch(message.chat.id, window_hours):
+        await message.answer("⏳ Сверка уже выполняется, отчет придет по ее завершении")
+        return
+    await message.answer(
+        f"🔎 Сверка заказов за {window_hours:g} ч запущена "
+        f"(не больше {reconciler.rate:g} запросов в секунду), отчет придет сюда"
+    )
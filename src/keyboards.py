@@ -1,8 +1,26 @@
+"""
+Inline-клавиатуры мастеров продаж.
+
+Клавиатуры зависят только от CONSOLES (задается в config и не меняется
+во время работы) и аргументов, поэтому каждая собирается один раз и дальше
+возвращается из кэша. Полученную разметку нельзя изменять: один и тот же
+объект уходит во все чаты.
+"""
+
+import functools
+from typing import Callable, Optional, Sequence
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from config import CONSOLES
 
 
+def _cached(func: Callable) -> Callable:
+    """Кэш клавиатуры по аргументам (ограничен для клавиатур с аргументами)"""
+    return functools.lru_cache(maxsize=64)(func)
+
+
+@_cached
 def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     """Главное меню выбора типа продажи"""
     builder = InlineKeyboardBuilder()
@@ -14,6 +32,7 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
 def get_console_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура выбора консоли"""
     builder = InlineKeyboardBuilder()
@@ -24,6 +43,7 @@ def get_console_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
 def get_console_keyboard_with_back() -> InlineKeyboardMarkup:
     """Клавиатура выбора консоли с кнопкой назад"""
     builder = InlineKeyboardBuilder()
@@ -45,6 +65,7 @@ def get_console_keyboard_with_back() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
 def get_position_keyboard(console: str) -> InlineKeyboardMarkup:
     """Клавиатура выбора позиции для консоли"""
     builder = InlineKeyboardBuilder()
@@ -59,6 +80,7 @@ def get_position_keyboard(console: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
 def get_confirmation_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура подтверждения данных"""
     builder = InlineKeyboardBuilder()
@@ -71,6 +93,7 @@ def get_confirmation_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
 def get_back_to_main_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура возврата в главное меню"""
     builder = InlineKeyboardBuilder()
@@ -78,6 +101,7 @@ def get_back_to_main_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
 def get_cancel_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура отмены операции"""
     builder = InlineKeyboardBuilder()
@@ -85,6 +109,7 @@ def get_cancel_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
 def get_cancel_and_back_keyboard(back_callback: str) -> InlineKeyboardMarkup:
     """Клавиатура с кнопками назад и отменить"""
     builder = InlineKeyboardBuilder()
@@ -96,6 +121,22 @@ def get_cancel_and_back_keyboard(back_callback: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
+def get_amount_keyboard(back_callback: str, price: Optional[float] = None) -> InlineKeyboardMarkup:
+    """Клавиатура шага суммы: цена из прайс-листа одной кнопкой (preset_<цена>), назад и отменить"""
+    if price is None:
+        return get_cancel_and_back_keyboard(back_callback)
+    builder = InlineKeyboardBuilder()
+    builder.add(
+        InlineKeyboardButton(text=f"💰 {price:.2f} ₽", callback_data=f"preset_{price:.2f}"),
+        InlineKeyboardButton(text="🔙 Назад", callback_data=back_callback),
+        InlineKeyboardButton(text="❌ Отменить", callback_data="cancel")
+    )
+    builder.adjust(1, 2)
+    return builder.as_markup()
+
+
+@_cached
 def get_free_sale_confirmation_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура подтверждения свободной продажи с отменой"""
     builder = InlineKeyboardBuilder()
@@ -108,6 +149,7 @@ def get_free_sale_confirmation_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
 def get_payment_method_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура выбора способа оплаты для свободной продажи"""
     builder = InlineKeyboardBuilder()
@@ -122,6 +164,7 @@ def get_payment_method_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
 def get_final_confirmation_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура финального подтверждения с получением ссылки на оплату"""
     builder = InlineKeyboardBuilder()
@@ -134,8 +177,26 @@ def get_final_confirmation_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@_cached
 def get_back_to_main_after_sale_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура возврата в главное меню после успешной продажи (сохраняет сообщение)"""
     builder = InlineKeyboardBuilder()
     builder.add(InlineKeyboardButton(text="🔙 В главное меню", callback_data="back_to_main_after_sale"))
-    return builder.as_markup() 
\ No newline at end of file
+    return builder.as_markup()
+
+
+def get_suggestion_keyboard(options: Sequence[str], typed: str, inline_search: bool = False) -> InlineKeyboardMarkup:
+    """
+    Варианты из каталога для введенного текста: suggest_<номер варианта>,
+    suggest_0 - оставить как ввели. Зависит от ввода, поэтому не кэшируется
+    """
+    builder = InlineKeyboardBuilder()
+    for index, option in enumerate(options, 1):
+        builder.add(InlineKeyboardButton(text=option, callback_data=f"suggest_{index}"))
+    shown = typed if len(typed) <= 40 else typed[:39] + "…"
+    builder.add(InlineKeyboardButton(text=f"✏️ Оставить «{shown}»", callback_data="suggest_0"))
+    if inline_search:
+        builder.add(InlineKeyboardButton(text="🔎 Искать в каталоге", switch_inline_query_current_chat=typed))
+    builder.add(InlineKeyboardButton(text="❌ Отменить", callback_data="cancel"))
+    builder.adjust(1)
+    return builder.as_markup()
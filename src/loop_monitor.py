@@ -0,0 +1,111 @@
+"""
+Контроль задержки event loop с записью стека блокирующего вызова
+"""
+
+import asyncio
+import bisect
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional
+
+from config import LOOP_LAG_THRESHOLD, LOOP_MONITOR_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограммы задержки, секунд
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LoopLagMonitor:
+    """
+    Задача в event loop просыпается каждые interval секунд и записывает,
+    насколько позже срока она проснулась. Отдельный поток следит за этими
+    отметками: если loop не отвечает дольше threshold секунд, в лог пишется
+    текущий стек потока loop - то место, где он заблокирован.
+    """
+
+    def __init__(self, threshold: float = LOOP_LAG_THRESHOLD, interval: float = LOOP_MONITOR_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.bucket_counts: List[int] = [0] * (len(LAG_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Запуск из работающего event loop"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run(), name='loop-lag-monitor')
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        logger.info(f"Контроль задержки event loop включен (порог {self.threshold} с)")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.interval * 2)
+            self._watchdog = None
+
+    def observe(self, lag: float):
+        self.bucket_counts[bisect.bisect_left(LAG_BUCKETS, lag)] += 1
+        self.count += 1
+        self.total += lag
+        self.max_lag = max(self.max_lag, lag)
+
+    def histogram(self) -> Dict[str, Any]:
+        """Накопительная гистограмма задержек (как у Prometheus)"""
+        cumulative, buckets = 0, []
+        for bound, count in zip(LAG_BUCKETS + (float('inf'),), self.bucket_counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return {'buckets': buckets, 'count': self.count, 'sum': self.total}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'avg_lag': self.total / self.count if self.count else 0.0,
+            'max_lag': self.max_lag,
+            'stalls': self.stalls
+        }
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(now - expected, 0.0)
+            self.observe(lag)
+            if lag >= self.threshold:
+                logger.warning(f"Event loop был заблокирован на {lag:.2f} с")
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval / 2):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat
+            # Один стек на каждую остановку loop
+            if stalled < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else 'стек недоступен'
+            logger.warning(f"Event loop не отвечает {stalled:.2f} с, текущий стек:\n{stack}")
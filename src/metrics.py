@@ -0,0 +1,185 @@
+"""
+Метрики процесса в текстовом формате Prometheus
+"""
+
+import bisect
+import math
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from aiohttp import web
+
+# Границы корзин по умолчанию, секунд
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Sequence[str], labels: Sequence, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    """
+    Счетчик с метками. Обновляется из потока event loop,
+    поэтому обходится без блокировок: одна операция со словарем
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Histogram(Metric):
+    """Гистограмма с метками; observe - один bisect и три сложения"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Для каждого набора меток: счетчики корзин (+Inf последней), сумма, количество
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def snapshot(self, *labels) -> dict:
+        counts, total, count = self._series.get(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        cumulative, buckets = 0, []
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            buckets.append((bound, cumulative))
+        return {'buckets': buckets, 'count': count, 'sum': total}
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels in list(self._series):
+            lines.extend(_histogram_samples(self.name, self.labelnames, labels, self.snapshot(*labels)))
+        return lines
+
+
+def _le(bound: float) -> str:
+    return f'le="{_format_value(bound)}"'
+
+
+def _histogram_samples(name: str, labelnames: Sequence[str], labels: Sequence, snapshot: dict) -> List[str]:
+    lines = [
+        f"{name}_bucket{_format_labels(labelnames, labels, _le(bound))} {count}"
+        for bound, count in snapshot['buckets']
+    ]
+    lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(snapshot['sum'])}")
+    lines.append(f"{name}_count{_format_labels(labelnames, labels)} {snapshot['count']}")
+    return lines
+
+
+class CallbackMetric(Metric):
+    """
+    Значение, которое вычисляется в момент запроса метрик (размер очереди,
+    число платежей по статусам). func возвращает число или словарь
+    {кортеж меток: число}; для kind='histogram' - результат Histogram.snapshot
+    """
+
+    def __init__(self, name: str, documentation: str, func: Callable, labelnames: Sequence[str] = (),
+                 kind: str = 'gauge'):
+        super().__init__(name, documentation, labelnames)
+        self.func = func
+        self.kind = kind
+
+    def samples(self) -> List[str]:
+        value = self.func()
+        if self.kind == 'histogram':
+            return _histogram_samples(self.name, self.labelnames, (), value) if value else []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(sample)}"
+            for labels, sample in value.items()
+        ]
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса и обработчик GET /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, func: Callable[[], Union[float, Dict[Tuple, float], dict]],
+                 labelnames: Sequence[str] = (), kind: str = 'gauge') -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, func, labelnames, kind))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.render().encode(),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+    def setup(self, app: web.Application, path: str):
+        """Регистрация маршрута в aiohttp-приложении"""
+        app.router.add_get(path, self.handle)
+
+
+# Общий реестр процесса
+registry = MetricsRegistry()
@@ -0,0 +1,117 @@
+"""
+Middleware и изоляция событий диспетчера aiogram
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+from aiogram.types import TelegramObject
+
+from metrics import registry
+
+HANDLER_DURATION = registry.histogram(
+    'bot_handler_duration_seconds', 'Время выполнения обработчиков', ('handler',)
+)
+HANDLER_ERRORS = registry.counter(
+    'bot_handler_errors_total', 'Исключения в обработчиках', ('handler',)
+)
+CHAT_QUEUE_WAIT = registry.histogram(
+    'chat_queue_wait_seconds', 'Ожидание обновления в очереди своего чата'
+)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Время выполнения каждого обработчика (метка - модуль.функция).
+    Подключается как inner middleware, поэтому видит выбранный обработчик
+    """
+
+    def __init__(self):
+        self._names: Dict[Callable, str] = {}
+
+    def _handler_name(self, data: Dict[str, Any]) -> str:
+        handler = data.get('handler')
+        callback = getattr(handler, 'callback', None)
+        name = self._names.get(callback)
+        if name is None:
+            # Обработчики мастеров продаж - методы SaleWizard, метка по имени мастера
+            owner = getattr(getattr(callback, '__self__', None), 'name', None)
+            module = owner or getattr(callback, '__module__', '') or ''
+            name = self._names[callback] = f"{module.rsplit('.', 1)[-1]}.{getattr(callback, '__name__', 'unknown')}"
+        return name
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(self._handler_name(data))
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, self._handler_name(data))
+
+
+class _ChatQueue:
+    __slots__ = ('lock', 'depth')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Обновления чата: выполняемое и ожидающие
+        self.depth = 0
+
+
+class ChatEventIsolation(BaseEventIsolation):
+    """
+    Последовательная обработка обновлений одного чата при параллельной
+    обработке разных чатов. Передается диспетчеру как events_isolation:
+    FSMContextMiddleware берет блокировку чата до чтения состояния, поэтому
+    обработчик видит состояние и данные FSM после предыдущего обновления.
+    Блокировки asyncio.Lock пропускают ожидающих в порядке прихода;
+    очередь чата удаляется, как только в ней не осталось обновлений.
+    """
+
+    def __init__(self):
+        self._queues: Dict[Tuple[int, int], _ChatQueue] = {}
+        self.max_depth = 0
+        self.serialized = 0
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        chat = (key.bot_id, key.chat_id)
+        queue = self._queues.get(chat)
+        if queue is None:
+            queue = self._queues[chat] = _ChatQueue()
+        queue.depth += 1
+        if queue.depth > 1:
+            self.serialized += 1
+            self.max_depth = max(self.max_depth, queue.depth)
+        started = time.perf_counter()
+        try:
+            async with queue.lock:
+                CHAT_QUEUE_WAIT.observe(time.perf_counter() - started)
+                yield
+        finally:
+            queue.depth -= 1
+            if not queue.depth:
+                del self._queues[chat]
+
+    async def close(self) -> None:
+        self._queues.clear()
+
+    def depths(self) -> List[Tuple[int, int]]:
+        """(chat_id, обновлений в очереди) для чатов с ожидающими, от самых длинных очередей"""
+        busy = [(chat_id, queue.depth) for (_, chat_id), queue in self._queues.items() if queue.depth > 1]
+        return sorted(busy, key=lambda item: -item[1])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'chats': len(self._queues),
+            'waiting': sum(queue.depth - 1 for queue in self._queues.values()),
+            'max_depth': self.max_depth,
+            'serialized': self.serialized
+        }
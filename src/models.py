@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Optional, Union
+from dataclasses import dataclass, asdict
+from typing import Optional, Union, Dict, Any, Tuple
 from datetime import datetime
 
 
@@ -45,6 +45,49 @@ class OurProductData:
             raise ValueError("Сумма должна быть больше нуля")
 
 
+@dataclass
+class PendingPayment:
+    """Платеж, ожидающий подтверждения оплаты"""
+    order_id: str
+    payment_id: str
+    sale_data: Union[FreeSaleData, OurProductData]
+    chat_id: int
+    payment_display: str
+    user_telegram_login: Optional[str]
+    deadline: float  # Unix time окончания отслеживания
+    attempts: int = 0
+    next_check_at: float = 0.0  # Unix time следующей проверки статуса
+    created_at: float = 0.0  # Unix time создания платежа
+    backoff_step: int = 0  # Ответов PENDING подряд после частых проверок (для политики опроса)
+
+
+# Тип продажи для сериализации данных продажи
+SALE_TYPES = {
+    'free_sale': FreeSaleData,
+    'our_product': OurProductData
+}
+
+
+def serialize_sale_data(sale_data: Union[FreeSaleData, OurProductData]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Преобразование данных продажи в (тип продажи, словарь) для хранения
+    """
+    sale_type = 'free_sale' if isinstance(sale_data, FreeSaleData) else 'our_product'
+    data = asdict(sale_data)
+    data['created_at'] = sale_data.created_at.isoformat()
+    return sale_type, data
+
+
+def deserialize_sale_data(sale_type: str, data: Dict[str, Any]) -> Union[FreeSaleData, OurProductData]:
+    """
+    Восстановление данных продажи из словаря
+    """
+    data = dict(data)
+    if data.get('created_at'):
+        data['created_at'] = datetime.fromisoformat(data['created_at'])
+    return SALE_TYPES[sale_type](**data)
+
+
 def validate_amount(amount_str: str) -> float:
     """
     Валидация и преобразование строки суммы в число
@@ -0,0 +1,44 @@
+"""
+Фоновый прогрев интеграций после запуска бота
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from config import ANTILOPAY_WEBHOOK_ENABLED
+from services.antilopay import antilopay_signer, antilopay_callback_verifier
+from services.executor import integration_executor
+from services.google_sheets import sheets_service
+
+logger = logging.getLogger(__name__)
+
+_prewarm_task: Optional[asyncio.Task] = None
+
+
+async def prewarm_integrations():
+    """
+    Загрузка pycryptodome, gspread и google-auth, разбор ключей и авторизация
+    в Google Sheets в пулах интеграций, пока бот уже принимает обновления
+    """
+    started = time.perf_counter()
+    steps = {
+        'ключ подписи Antilopay': integration_executor.run('crypto', antilopay_signer.load),
+        'Google Sheets': integration_executor.run('sheets', sheets_service.prewarm),
+    }
+    if ANTILOPAY_WEBHOOK_ENABLED:
+        steps['ключ уведомлений Antilopay'] = integration_executor.run('crypto', antilopay_callback_verifier.load)
+
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.error(f"Прогрев не удался ({name}): {result}")
+    logger.info(f"Прогрев интеграций завершен за {time.perf_counter() - started:.2f} с")
+
+
+async def start_prewarm():
+    """Обработчик запуска диспетчера: прогрев идет в фоне и не задерживает прием обновлений"""
+    global _prewarm_task
+    if _prewarm_task is None:
+        _prewarm_task = asyncio.create_task(prewarm_integrations(), name='prewarm')
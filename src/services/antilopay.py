@@ -2,60 +2,186 @@
 Модуль для работы с Antilopay API
 """
 
+import asyncio
 import json
 import base64
 import hashlib
+import threading
+import time
 import uuid
-import requests
+import aiohttp
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
-from Crypto.Hash import SHA256
-from Crypto.PublicKey import RSA
-from Crypto.Signature import pkcs1_15
 
 from config import (
     ANTILOPAY_API_URL, 
     ANTILOPAY_PROJECT_ID, 
     ANTILOPAY_SECRET_ID, 
-    ANTILOPAY_PRIVATE_KEY
+    ANTILOPAY_PRIVATE_KEY,
+    ANTILOPAY_CONNECTION_LIMIT,
+    ANTILOPAY_KEEPALIVE_TIMEOUT,
+    ANTILOPAY_CREATE_TIMEOUT,
+    ANTILOPAY_CHECK_TIMEOUT,
+    ANTILOPAY_CALLBACK_KEY
 )
 
+from metrics import registry
+from services.executor import IntegrationExecutor, integration_executor
+
 logger = logging.getLogger(__name__)
 
+REQUEST_DURATION = registry.histogram(
+    'antilopay_request_duration_seconds', 'Время запросов к Antilopay API', ('endpoint',)
+)
+# code - поле code ответа Antilopay (0 - успех), HTTP-статус или 504/500 при таймауте и сетевой ошибке
+REQUEST_RESULTS = registry.counter(
+    'antilopay_requests_total', 'Запросы к Antilopay API по коду ответа', ('endpoint', 'code')
+)
 
-class AntilopayAPI:
-    """Класс для работы с Antilopay API"""
+
+class AntilopaySigner:
+    """
+    Подпись запросов SHA256WithRSA.
+    Ключ разбирается один раз, подпись выполняется в пуле crypto,
+    чтобы RSA-операции не занимали поток event loop.
+    """
     
-    def __init__(self):
-        self.api_url = ANTILOPAY_API_URL.rstrip('/')
-        self.project_id = ANTILOPAY_PROJECT_ID
-        self.secret_id = ANTILOPAY_SECRET_ID
-        self.private_key = ANTILOPAY_PRIVATE_KEY
+    def __init__(self, private_key: str, executor: IntegrationExecutor = integration_executor):
+        self.private_key = private_key
+        self.executor = executor
+        self._signer = None
+        self._lock = threading.Lock()
+    
+    def load(self):
+        """
+        Разбор приватного ключа (вызывается при старте бота).
+        Повторные вызовы используют уже разобранный ключ.
+        """
+        if self._signer is not None:
+            return self._signer
         
-    def _generate_signature(self, payload: str) -> str:
+        with self._lock:
+            if self._signer is None:
+                # pycryptodome импортируется при первой подписи или фоновом прогреве
+                from Crypto.PublicKey import RSA
+                from Crypto.Signature import pkcs1_15
+                
+                # Декодируем приватный ключ из Base64
+                rsa_key = RSA.importKey(base64.b64decode(self.private_key))
+                self._signer = pkcs1_15.new(rsa_key)
+                logger.info("Приватный ключ Antilopay загружен")
+        return self._signer
+    
+    def sign(self, payload: str) -> str:
         """
         Генерация RSA подписи SHA256WithRSA согласно документации
         """
         try:
-            # Декодируем приватный ключ из Base64
-            rsa_key = RSA.importKey(base64.b64decode(self.private_key))
+            signer = self.load()
+            from Crypto.Hash import SHA256
             
             # Создаем хеш SHA256 от payload
-            payload_bytes = bytes(payload, 'UTF-8')
-            hash_obj = SHA256.new(payload_bytes)
+            hash_obj = SHA256.new(bytes(payload, 'UTF-8'))
             
-            # Создаем подпись
-            signature = pkcs1_15.new(rsa_key).sign(hash_obj)
-            
-            # Кодируем в Base64
-            return base64.b64encode(signature).decode('utf-8')
+            # Создаем подпись и кодируем в Base64
+            return base64.b64encode(signer.sign(hash_obj)).decode('utf-8')
             
         except Exception as e:
             logger.error(f"Ошибка генерации подписи: {e}")
             raise
     
-    def _make_request(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def sign_async(self, payload: str) -> str:
+        """Подпись в пуле crypto, не блокируя event loop"""
+        return await self.executor.run('crypto', self.sign, payload)
+
+
+class AntilopayCallbackVerifier:
+    """
+    Проверка подписи уведомлений Antilopay (заголовок X-Apay-Callback)
+    публичным ключом проекта. Ключ разбирается один раз.
+    """
+    
+    def __init__(self, public_key: str, executor: IntegrationExecutor = integration_executor):
+        self.public_key = public_key
+        self.executor = executor
+        self._verifier = None
+    
+    def load(self):
+        """Разбор публичного ключа; повторные вызовы используют кэш"""
+        if self._verifier is None:
+            from Crypto.PublicKey import RSA
+            from Crypto.Signature import pkcs1_15
+            
+            rsa_key = RSA.importKey(base64.b64decode(self.public_key))
+            self._verifier = pkcs1_15.new(rsa_key)
+        return self._verifier
+    
+    def verify(self, body: bytes, signature: str) -> bool:
+        """Проверка подписи SHA256WithRSA тела уведомления"""
+        if not signature:
+            return False
+        try:
+            from Crypto.Hash import SHA256
+            
+            self.load().verify(SHA256.new(body), base64.b64decode(signature))
+            return True
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Неверная подпись уведомления Antilopay: {e}")
+            return False
+    
+    async def verify_async(self, body: bytes, signature: str) -> bool:
+        """Проверка подписи в пуле crypto"""
+        return await self.executor.run('crypto', self.verify, body, signature)
+
+
+class AntilopayAPI:
+    """Класс для работы с Antilopay API"""
+    
+    def __init__(self, signer: Optional[AntilopaySigner] = None):
+        self.api_url = ANTILOPAY_API_URL.rstrip('/')
+        self.project_id = ANTILOPAY_PROJECT_ID
+        self.secret_id = ANTILOPAY_SECRET_ID
+        self.signer = signer or antilopay_signer
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Долгоживущая HTTP-сессия с keep-alive и ограничением числа соединений.
+        Создается лениво, так как требует запущенного event loop.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=ANTILOPAY_CONNECTION_LIMIT,
+                keepalive_timeout=ANTILOPAY_KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+    
+    async def close(self):
+        """Закрытие HTTP-сессии (вызывается при остановке бота)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        
+    def _generate_signature(self, payload: str) -> str:
+        """
+        Генерация RSA подписи SHA256WithRSA согласно документации
+        """
+        return self.signer.sign(payload)
+    
+    async def _make_request(self, endpoint: str, data: Dict[str, Any],
+                            timeout: float = ANTILOPAY_CREATE_TIMEOUT) -> Dict[str, Any]:
+        """
+        Выполнение запроса к API с подписью и учетом времени и кода ответа
+        """
+        started = time.perf_counter()
+        response = await self._send_request(endpoint, data, timeout)
+        REQUEST_DURATION.observe(time.perf_counter() - started, endpoint)
+        REQUEST_RESULTS.inc(endpoint, response.get("code", "none"))
+        return response
+    
+    async def _send_request(self, endpoint: str, data: Dict[str, Any], timeout: float) -> Dict[str, Any]:
         """
         Выполнение запроса к API с подписью
         """
@@ -63,8 +189,8 @@ class AntilopayAPI:
             # Формируем JSON payload без пробелов и переносов
             payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
             
-            # Генерируем подпись
-            signature = self._generate_signature(payload)
+            # Генерируем подпись вне event loop
+            signature = await self.signer.sign_async(payload)
             
             # Формируем заголовки
             headers = {
@@ -78,33 +204,37 @@ class AntilopayAPI:
             url = f"{self.api_url}/{endpoint}"
             logger.info(f"Отправка запроса к {url}")
             
-            response = requests.post(
-                url, 
-                data=payload.encode('utf-8'), 
+            session = self._get_session()
+            async with session.post(
+                url,
+                data=payload.encode('utf-8'),
                 headers=headers,
-                timeout=30
-            )
-            
-            logger.info(f"Ответ API: {response.status_code}")
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error(f"HTTP ошибка: {response.status_code}, {response.text}")
-                return {
-                    "code": response.status_code,
-                    "error": f"HTTP {response.status_code}: {response.text}"
-                }
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                logger.info(f"Ответ API: {response.status}")
+                
+                if response.status == 200:
+                    return await response.json(content_type=None)
+                else:
+                    text = await response.text()
+                    logger.error(f"HTTP ошибка: {response.status}, {text}")
+                    return {
+                        "code": response.status,
+                        "error": f"HTTP {response.status}: {text}"
+                    }
                 
-        except requests.exceptions.RequestException as e:
+        except asyncio.TimeoutError:
+            logger.error(f"Таймаут запроса к {endpoint} ({timeout} с)")
+            return {"code": 504, "error": f"Таймаут запроса ({timeout} с)"}
+        except aiohttp.ClientError as e:
             logger.error(f"Ошибка запроса: {e}")
             return {"code": 500, "error": f"Ошибка сети: {str(e)}"}
         except Exception as e:
             logger.error(f"Неожиданная ошибка: {e}")
             return {"code": 500, "error": f"Внутренняя ошибка: {str(e)}"}
     
-    def create_payment(self, amount: float, product_name: str, client_login: str,
-                      description: str, prefer_methods: list = None) -> Dict[str, Any]:
+    async def create_payment(self, amount: float, product_name: str, client_login: str,
+                           description: str, prefer_methods: list = None) -> Dict[str, Any]:
         """
         Создание платежа согласно ТЗ и документации Antilopay
         
@@ -137,7 +267,9 @@ class AntilopayAPI:
             logger.info(f"Создание платежа: {order_id}, сумма: {amount} ₽, методы: {prefer_methods}")
             
             # Выполняем запрос
-            response = self._make_request("payment/create", payment_data)
+            response = await self._make_request(
+                "payment/create", payment_data, timeout=ANTILOPAY_CREATE_TIMEOUT
+            )
             
             if response.get("code") == 0:
                 logger.info(f"Платеж создан успешно: {response.get('payment_id')}")
@@ -163,7 +295,7 @@ class AntilopayAPI:
                 "error": f"Внутренняя ошибка: {str(e)}"
             }
     
-    def check_payment_status(self, order_id: str) -> Dict[str, Any]:
+    async def check_payment_status(self, order_id: str) -> Dict[str, Any]:
         """
         Проверка статуса платежа
         """
@@ -175,7 +307,9 @@ class AntilopayAPI:
             
             logger.info(f"Проверка статуса платежа: {order_id}")
             
-            response = self._make_request("payment/check", check_data)
+            response = await self._make_request(
+                "payment/check", check_data, timeout=ANTILOPAY_CHECK_TIMEOUT
+            )
             
             if response.get("code") == 0:
                 return {
@@ -208,4 +342,10 @@ class AntilopayAPI:
             return {
                 "success": False,
                 "error": f"Внутренняя ошибка: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+
+# Общие подписчик и клиент для обработчиков и трекера платежей (один на процесс)
+antilopay_signer = AntilopaySigner(ANTILOPAY_PRIVATE_KEY)
+antilopay_callback_verifier = AntilopayCallbackVerifier(ANTILOPAY_CALLBACK_KEY)
+antilopay_api = AntilopayAPI()
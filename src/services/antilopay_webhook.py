@@ -0,0 +1,52 @@
+"""
+Прием уведомлений Antilopay о статусе платежей
+"""
+
+import json
+import logging
+from aiohttp import web
+
+from services.antilopay import AntilopayCallbackVerifier, antilopay_callback_verifier
+from services.payment_scheduler import PaymentScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class AntilopayWebhook:
+    """
+    HTTP-обработчик уведомлений Antilopay.
+    Проверяет подпись и передает финальный статус в PaymentScheduler,
+    который завершает отслеживание платежа без ожидания очередного опроса.
+    """
+
+    def __init__(self, scheduler: PaymentScheduler,
+                 verifier: AntilopayCallbackVerifier = antilopay_callback_verifier):
+        self.scheduler = scheduler
+        self.verifier = verifier
+
+    def setup(self, app: web.Application, path: str):
+        """Регистрация маршрута в aiohttp-приложении"""
+        app.router.add_post(path, self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+
+        if not await self.verifier.verify_async(body, request.headers.get('X-Apay-Callback', '')):
+            return web.Response(status=401, text='invalid signature')
+
+        try:
+            notification = json.loads(body)
+            order_id = notification['order_id']
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Некорректное уведомление Antilopay: {body[:200]!r}")
+            return web.Response(status=400, text='bad request')
+
+        status = notification.get('status')
+        logger.info(f"Уведомление Antilopay: заказ {order_id}, статус {status}")
+
+        if not self.scheduler.resolve(order_id, notification):
+            # Заказ уже обработан, не отслеживается или статус не финальный
+            logger.info(f"Уведомление по заказу {order_id} ({status}) не требует обработки")
+
+        # Подтверждаем получение сразу: обработка идет в фоне
+        return web.Response(text='OK')
@@ -0,0 +1,117 @@
+"""
+Пулы потоков для блокирующих вызовов интеграций
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config import EXECUTOR_LANES
+
+logger = logging.getLogger(__name__)
+
+
+class Lane:
+    """Именованный ограниченный пул потоков со счетчиками очереди и ожидания"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f'lane-{self.name}')
+        return self._pool
+
+    def _call(self, submitted_at: float, func: Callable, args: tuple, kwargs: dict) -> Any:
+        wait = time.monotonic() - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        ok = False
+        try:
+            result = func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self.failed += not ok
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.queued += 1
+        try:
+            future = loop.run_in_executor(
+                self._get_pool(), functools.partial(self._call, time.monotonic(), func, args, kwargs)
+            )
+        except RuntimeError:
+            with self._lock:
+                self.queued -= 1
+            raise
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queue_depth': self.queued,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'avg_wait': self.total_wait / self.completed if self.completed else 0.0,
+                'max_wait': self.max_wait
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+class IntegrationExecutor:
+    """
+    Блокирующие вызовы (gspread, RSA) выполняются в отдельных пулах по видам
+    интеграций, поэтому медленная таблица не занимает ни event loop,
+    ни потоки, нужные для подписи платежей.
+    """
+
+    def __init__(self, lanes: Dict[str, int] = EXECUTOR_LANES):
+        self.lanes = {name: Lane(name, workers) for name, workers in lanes.items()}
+        self._closed = False
+
+    async def run(self, lane: str, func: Callable, *args, **kwargs) -> Any:
+        """Выполнить func(*args, **kwargs) в пуле lane и дождаться результата"""
+        if self._closed:
+            raise RuntimeError("Пулы интеграций остановлены")
+        return await self.lanes[lane].run(func, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    async def close(self):
+        """Дождаться выполняемых вызовов и остановить пулы; задачи из очереди отменяются"""
+        self._closed = True
+        for lane in self.lanes.values():
+            await asyncio.to_thread(lane.shutdown)
+        logger.info("Пулы интеграций остановлены")
+
+
+# Общие пулы для всего процесса
+integration_executor = IntegrationExecutor()
@@ -0,0 +1,249 @@
+"""
+Постоянное хранилище FSM для aiogram вместо MemoryStorage
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Protocol, Union
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from config import DATABASE_FILE, FSM_STORAGE, FSM_STORAGE_TTL, REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+
+class KeyValueBackend(Protocol):
+    """
+    Подмножество интерфейса redis.asyncio.Redis, которое нужно хранилищу,
+    и set_many - запись нескольких ключей одним запросом (состояние и данные
+    шага мастера). SQLite, Redis и память реализуют один и тот же интерфейс.
+    """
+
+    async def get(self, name: str) -> Optional[bytes]: ...
+
+    async def set(self, name: str, value: bytes, ex: Optional[int] = None) -> Any: ...
+
+    async def set_many(self, items: Dict[str, bytes], ex: Optional[int] = None) -> Any: ...
+
+    async def delete(self, *names: str) -> Any: ...
+
+
+class SQLiteBackend:
+    """
+    Ключ-значение в SQLite со сроком жизни записей.
+    Просроченные записи не возвращаются и периодически удаляются при записи.
+    Файл в режиме WAL можно использовать из нескольких процессов бота.
+    """
+
+    def __init__(self, db_file: str = DATABASE_FILE, purge_interval: float = 300):
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS fsm_storage (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_fsm_storage_expires ON fsm_storage (expires_at);
+        """)
+
+    async def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM fsm_storage WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (name, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    async def set(self, name: str, value: bytes, ex: Optional[int] = None) -> bool:
+        return await self.set_many({name: value}, ex=ex)
+
+    async def set_many(self, items: Dict[str, bytes], ex: Optional[int] = None) -> bool:
+        """Запись нескольких ключей одной транзакцией"""
+        now = time.time()
+        expires_at = now + ex if ex else None
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO fsm_storage (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                    [(name, value, expires_at) for name, value in items.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if now - self._last_purge >= self.purge_interval:
+                self._last_purge = now
+                self._purge_expired(now)
+        return True
+
+    async def delete(self, *names: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                f"DELETE FROM fsm_storage WHERE key IN ({', '.join('?' * len(names))})", names
+            ).rowcount
+
+    def purge_expired(self) -> int:
+        """Удалить просроченные сессии; возвращает число удаленных записей"""
+        with self._lock:
+            return self._purge_expired(time.time())
+
+    def _purge_expired(self, now: float) -> int:
+        removed = self._conn.execute(
+            "DELETE FROM fsm_storage WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        ).rowcount
+        if removed:
+            logger.info(f"Удалено просроченных FSM-сессий: {removed}")
+        return removed
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class InMemoryBackend:
+    """
+    Локальная замена Redis для тестов и разработки: тот же интерфейс и TTL,
+    но данные живут только в памяти процесса
+    """
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+
+    async def get(self, name: str) -> Optional[bytes]:
+        item = self._data.get(name)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[name]
+            return None
+        return value
+
+    async def set(self, name: str, value: bytes, ex: Optional[int] = None) -> bool:
+        self._data[name] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    async def set_many(self, items: Dict[str, bytes], ex: Optional[int] = None) -> bool:
+        for name, value in items.items():
+            await self.set(name, value, ex=ex)
+        return True
+
+    async def delete(self, *names: str) -> int:
+        return sum(self._data.pop(name, None) is not None for name in names)
+
+    async def close(self):
+        self._data.clear()
+
+
+class RedisBackend:
+    """Клиент redis.asyncio; set_many отправляет все ключи одной транзакцией MULTI/EXEC"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, name: str) -> Optional[bytes]:
+        return await self.client.get(name)
+
+    async def set(self, name: str, value: bytes, ex: Optional[int] = None) -> Any:
+        return await self.client.set(name, value, ex=ex)
+
+    async def set_many(self, items: Dict[str, bytes], ex: Optional[int] = None) -> Any:
+        async with self.client.pipeline(transaction=True) as pipe:
+            for name, value in items.items():
+                pipe.set(name, value, ex=ex)
+            return await pipe.execute()
+
+    async def delete(self, *names: str) -> Any:
+        return await self.client.delete(*names)
+
+    async def close(self):
+        close = getattr(self.client, "aclose", None) or self.client.close
+        await close()
+
+
+class PersistentStorage(BaseStorage):
+    """
+    FSM-хранилище поверх ключ-значение бэкенда (SQLite, Redis или память).
+    Состояние и данные хранятся под отдельными ключами в компактном JSON,
+    каждая запись продлевает срок жизни сессии на ttl секунд,
+    поэтому брошенные мастера продаж удаляются сами. Переход мастера на
+    следующий шаг записывает оба ключа одним запросом (set_state_and_data).
+    """
+
+    def __init__(self, backend: KeyValueBackend, ttl: Optional[int] = FSM_STORAGE_TTL,
+                 key_builder: Optional[KeyBuilder] = None):
+        self.backend = backend
+        self.ttl = ttl or None
+        self.key_builder = key_builder or DefaultKeyBuilder()
+
+    @staticmethod
+    def _dumps(data: Dict[str, Any]) -> bytes:
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        name = self.key_builder.build(key, "state")
+        if state is None:
+            await self.backend.delete(name)
+            return
+        value = state.state if isinstance(state, State) else state
+        await self.backend.set(name, value.encode(), ex=self.ttl)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        value = await self.backend.get(self.key_builder.build(key, "state"))
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        name = self.key_builder.build(key, "data")
+        if not data:
+            await self.backend.delete(name)
+            return
+        await self.backend.set(name, self._dumps(data), ex=self.ttl)
+
+    async def set_state_and_data(self, key: StorageKey, state: StateType, data: Dict[str, Any]) -> None:
+        """Состояние и данные одним запросом к бэкенду вместо двух"""
+        if state is None or not data:
+            await self.set_state(key, state)
+            await self.set_data(key, data)
+            return
+        value = state.state if isinstance(state, State) else state
+        await self.backend.set_many({
+            self.key_builder.build(key, "state"): value.encode(),
+            self.key_builder.build(key, "data"): self._dumps(data)
+        }, ex=self.ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self.backend.get(self.key_builder.build(key, "data"))
+        return json.loads(value) if value else {}
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def create_fsm_storage(kind: str = FSM_STORAGE) -> Union[PersistentStorage, BaseStorage]:
+    """Хранилище FSM по настройке FSM_STORAGE: sqlite, redis или memory"""
+    if kind == "memory":
+        from aiogram.fsm.storage.memory import MemoryStorage
+        return MemoryStorage()
+
+    if kind == "redis":
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            raise RuntimeError("Для FSM_STORAGE=redis установите пакет redis") from None
+        return PersistentStorage(RedisBackend(Redis.from_url(REDIS_URL)))
+
+    if kind != "sqlite":
+        raise ValueError(f"Неизвестный тип FSM-хранилища: {kind}")
+    return PersistentStorage(SQLiteBackend())
@@ -0,0 +1,371 @@
+"""
+Каталог игр в памяти: поиск по префиксу (trie) и нечеткий поиск по триграммам
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import Counter
+from itertools import chain
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from config import (
+    GAME_CATALOG_FILE,
+    GAME_CATALOG_SHEET,
+    GAME_CATALOG_RELOAD_INTERVAL,
+    GAME_CATALOG_SUGGESTIONS
+)
+from services.executor import IntegrationExecutor, integration_executor
+from services.google_sheets import GoogleSheetsService, sheets_service
+
+logger = logging.getLogger(__name__)
+
+# Доля триграмм запроса, которая должна найтись в названии для нечеткого совпадения
+FUZZY_THRESHOLD = 0.5
+# Сколько лучших совпадений по префиксу запоминается в узле trie
+TOP_CACHE_SIZE = 20
+# Глубина trie: дальше узлы почти всегда принадлежат одному названию
+TRIE_DEPTH = 8
+# Сколько изменений применяется к текущему индексу на месте; больше - новый индекс в потоке
+REBUILD_THRESHOLD = 500
+# Сколько кандидатов нечеткого поиска (с наибольшим числом редких триграмм) сравнивается целиком
+FUZZY_CANDIDATES = 64
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize(name: str) -> str:
+    """Ключ поиска: нижний регистр без диакритики (ё -> е, ö -> o), знаки препинания -> пробелы"""
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(_NON_WORD.sub(' ', stripped).split())
+
+
+def trigrams(key: str) -> FrozenSet[str]:
+    padded = f"  {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class _TrieNode:
+    __slots__ = ('children', 'ids', 'top', 'top_version')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        # Игры, у которых название, одно из слов или аббревиатура начинается с пути до узла
+        self.ids: Set[int] = set()
+        self.top: List[int] = []
+        self.top_version = -1
+
+
+class GameIndex:
+    """
+    Индексы каталога. Каждое название попадает в trie целиком, с начала
+    каждого слова ("man" находит "Spider Man") и аббревиатурой ("gta"),
+    а в индекс триграмм - для поиска с опечатками. Глубина trie ограничена
+    TRIE_DEPTH: более длинные запросы доуточняются сравнением строк.
+    """
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._names: Dict[int, str] = {}
+        self._keys: Dict[int, str] = {}
+        self._ids: Dict[str, int] = {}
+        self._trigram_sets: Dict[int, FrozenSet[str]] = {}
+        self._next_id = 0
+        # Меняется при каждом изменении индекса и сбрасывает запомненные в узлах совпадения
+        self._version = 0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def trigram_count(self) -> int:
+        return len(self._trigrams)
+
+    @staticmethod
+    def _paths(key: str) -> Set[str]:
+        """Строки, по префиксам которых находится название: с каждого слова и аббревиатура"""
+        words = key.split(' ')
+        paths = {' '.join(words[i:]) for i in range(len(words))}
+        if len(words) > 1:
+            paths.add(''.join(word[0] for word in words))
+        return paths
+
+    def _add(self, key: str, name: str):
+        game_id = self._next_id
+        self._next_id += 1
+        self._names[game_id] = name
+        self._keys[game_id] = key
+        self._ids[key] = game_id
+        for path in self._paths(key):
+            node = self._root
+            for char in path[:TRIE_DEPTH]:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _TrieNode()
+                child.ids.add(game_id)
+                node = child
+        key_trigrams = self._trigram_sets[game_id] = trigrams(key)
+        for trigram in key_trigrams:
+            self._trigrams.setdefault(trigram, set()).add(game_id)
+
+    def _remove(self, key: str):
+        game_id = self._ids.pop(key)
+        del self._names[game_id]
+        del self._keys[game_id]
+        for path in self._paths(key):
+            self._remove_path(self._root, path[:TRIE_DEPTH], game_id)
+        for trigram in self._trigram_sets.pop(game_id):
+            postings = self._trigrams[trigram]
+            postings.discard(game_id)
+            if not postings:
+                del self._trigrams[trigram]
+
+    def _remove_path(self, node: _TrieNode, path: str, game_id: int):
+        if not path:
+            return
+        child = node.children.get(path[0])
+        if child is None:
+            return
+        child.ids.discard(game_id)
+        self._remove_path(child, path[1:], game_id)
+        if not child.ids:
+            del node.children[path[0]]
+
+    def diff(self, names: Iterable[str]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Сравнение списка names с индексом без его изменения:
+        (ключ -> название для всех names, ключи удаленных названий)
+        """
+        wanted: Dict[str, str] = {}
+        for name in names:
+            name = ' '.join(str(name).split())
+            key = normalize(name)
+            if key and key not in wanted:
+                wanted[key] = name
+        return wanted, [key for key in self._ids if key not in wanted]
+
+    def apply(self, wanted: Dict[str, str], removed: List[str]) -> Tuple[int, int]:
+        """Применить результат diff; возвращает (добавлено, удалено)"""
+        for key in removed:
+            self._remove(key)
+        added = 0
+        for key, name in wanted.items():
+            game_id = self._ids.get(key)
+            if game_id is None:
+                self._add(key, name)
+                added += 1
+            else:
+                # Изменилось только написание (регистр, пунктуация)
+                self._names[game_id] = name
+        self._version += 1
+        return added, len(removed)
+
+    def update(self, names: Iterable[str]) -> Tuple[int, int]:
+        """Привести индекс к списку names; возвращает (добавлено, удалено)"""
+        return self.apply(*self.diff(names))
+
+    def search(self, query: str, limit: int = GAME_CATALOG_SUGGESTIONS) -> List[str]:
+        """
+        До limit названий: точное совпадение, затем совпадения по префиксу
+        (сначала с начала названия, затем более короткие). Если по префиксу
+        ничего нет, ищутся похожие названия по триграммам (опечатки)
+        """
+        key = normalize(query)
+        if not key or not self._names:
+            return []
+
+        node = self._root
+        for char in key[:TRIE_DEPTH]:
+            node = node.children.get(char)
+            if node is None:
+                return [self._names[game_id] for game_id in self._fuzzy(key, limit)]
+
+        if len(key) > TRIE_DEPTH:
+            found = self._deep(node, key, limit)
+            if not found:
+                return [self._names[game_id] for game_id in self._fuzzy(key, limit)]
+        else:
+            found = self._top(node, key, limit)
+        exact = self._ids.get(key)
+        if exact is not None and exact in found:
+            found.remove(exact)
+            found.insert(0, exact)
+        return [self._names[game_id] for game_id in found[:limit]]
+
+    def _rank(self, key: str):
+        def rank(game_id: int):
+            game_key = self._keys[game_id]
+            return not game_key.startswith(key), len(game_key), game_key
+        return rank
+
+    def _top(self, node: _TrieNode, key: str, limit: int) -> List[int]:
+        """Лучшие совпадения узла; запоминаются в узле до следующего изменения индекса"""
+        if limit > TOP_CACHE_SIZE:
+            return heapq.nsmallest(limit, node.ids, key=self._rank(key))
+        if node.top_version != self._version:
+            node.top = heapq.nsmallest(TOP_CACHE_SIZE, node.ids, key=self._rank(key))
+            node.top_version = self._version
+        return node.top[:limit]
+
+    def _deep(self, node: _TrieNode, key: str, limit: int) -> List[int]:
+        """Запрос длиннее TRIE_DEPTH: кандидаты узла на последнем уровне, проверенные целиком"""
+        matches = [
+            game_id for game_id in node.ids
+            if any(path.startswith(key) for path in self._paths(self._keys[game_id]))
+        ]
+        return heapq.nsmallest(limit, matches, key=self._rank(key))
+
+    def _fuzzy(self, key: str, limit: int) -> List[int]:
+        query = trigrams(key)
+        need = max(1, math.ceil(FUZZY_THRESHOLD * len(query)))
+        # Название с need общими триграммами обязательно встречается среди
+        # len(query) - need + 1 самых редких триграмм запроса
+        postings = sorted((self._trigrams.get(trigram, ()) for trigram in query), key=len)
+        hits = Counter(chain.from_iterable(postings[:len(query) - need + 1]))
+        # Целиком сравниваются только названия, совпавшие по наибольшему числу редких триграмм
+        candidates = [game_id for game_id, _ in hits.most_common(FUZZY_CANDIDATES)]
+
+        scored = []
+        for game_id in candidates:
+            common = len(query & self._trigram_sets[game_id])
+            if common >= need:
+                scored.append((common / len(query), -len(self._keys[game_id]), game_id))
+        return [game_id for _, _, game_id in heapq.nlargest(limit, scored)]
+
+
+class GameCatalog:
+    """
+    Названия игр для подсказок в мастере продажи товара. Перезагрузка
+    сравнивает новый список с текущим и меняет индекс только для добавленных
+    и удаленных названий; при больших изменениях (первая загрузка) новый
+    индекс строится в потоке и подменяет текущий, не блокируя event loop.
+    Перезагрузки (фоновая и /catalog reload) выполняются по одной: сравнение
+    в потоке и изменение индекса не должны пересекаться.
+    """
+
+    def __init__(self, file_path: str = GAME_CATALOG_FILE, sheet_title: str = GAME_CATALOG_SHEET,
+                 reload_interval: float = GAME_CATALOG_RELOAD_INTERVAL,
+                 executor: IntegrationExecutor = integration_executor,
+                 service: GoogleSheetsService = sheets_service):
+        self.file_path = file_path
+        self.sheet_title = sheet_title
+        self.reload_interval = reload_interval
+        self.executor = executor
+        self.service = service
+        self.index = GameIndex()
+        self._file_mtime: Optional[float] = None
+        self._file_names: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self._reload_lock = asyncio.Lock()
+        self.loaded_at = 0.0
+        self.last_reload_duration = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.sheet_title)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def search(self, query: str, limit: int = GAME_CATALOG_SUGGESTIONS) -> List[str]:
+        return self.index.search(query, limit)
+
+    async def update(self, names: List[str]) -> Tuple[int, int]:
+        """Привести каталог к списку names; возвращает (добавлено, удалено)"""
+        async with self._reload_lock:
+            return await self._update(names)
+
+    async def _update(self, names: List[str]) -> Tuple[int, int]:
+        wanted, removed = await asyncio.to_thread(self.index.diff, names)
+        added = len(wanted) - (len(self.index) - len(removed))
+        if added + len(removed) <= REBUILD_THRESHOLD:
+            return self.index.apply(wanted, removed)
+
+        index = GameIndex()
+        await asyncio.to_thread(index.apply, wanted, [])
+        self.index = index
+        return added, len(removed)
+
+    # Загрузка
+
+    def _read_file(self) -> Optional[List[str]]:
+        """Названия из файла (по одному в строке) или None, если файл не менялся"""
+        mtime = os.stat(self.file_path).st_mtime
+        if mtime == self._file_mtime:
+            return None
+        with open(self.file_path, encoding='utf-8') as f:
+            names = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        self._file_mtime = mtime
+        return names
+
+    def _read_sheet(self) -> List[str]:
+        """Названия из первого столбца листа sheet_title (без заголовка)"""
+        return [row[0] for _, row in self.service.iter_rows(self.sheet_title) if row and str(row[0]).strip()]
+
+    async def reload(self, force: bool = False) -> Tuple[int, int]:
+        """Перечитать источники; неизменившийся файл пропускается, если не force"""
+        async with self._reload_lock:
+            return await self._reload(force)
+
+    async def _reload(self, force: bool) -> Tuple[int, int]:
+        started = time.perf_counter()
+        if force:
+            self._file_mtime = None
+
+        changed = False
+        if self.file_path:
+            names = await self.executor.run('sheets', self._read_file)
+            if names is not None:
+                self._file_names = names
+                changed = True
+        sheet_names: List[str] = []
+        if self.sheet_title:
+            sheet_names = await self.executor.run('sheets', self._read_sheet)
+            changed = True
+        if not changed:
+            return 0, 0
+
+        added, removed = await self._update(self._file_names + sheet_names)
+        self.loaded_at = time.time()
+        self.last_reload_duration = time.perf_counter() - started
+        if added or removed:
+            logger.info(f"Каталог игр обновлен: +{added}, -{removed}, всего {len(self)}")
+        return added, removed
+
+    def start(self):
+        """Загрузка каталога и фоновая перезагрузка раз в reload_interval секунд"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(), name='game-catalog')
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"Ошибка загрузки каталога игр: {e}")
+            await asyncio.sleep(self.reload_interval)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'games': len(self),
+            'trigrams': self.index.trigram_count,
+            'loaded_at': self.loaded_at,
+            'last_reload_duration': self.last_reload_duration
+        }
+
+
+# Общий каталог процесса
+game_catalog = GameCatalog()
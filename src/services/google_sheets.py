@@ -2,39 +2,113 @@
 Модуль для работы с Google Sheets
 """
 
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import asyncio
 from datetime import datetime
-from typing import List, Any, Optional
+from typing import TYPE_CHECKING, Dict, Iterator, List, Any, Optional, Set, Tuple
 import logging
-from config import GOOGLE_CREDENTIALS_FILE, GOOGLE_SHEET_ID
+import threading
+import time
+from config import GOOGLE_CREDENTIALS_FILE, GOOGLE_SHEET_ID, SHEETS_BATCH_SIZE, SHEETS_FLUSH_INTERVAL
+from metrics import registry
+from services.executor import IntegrationExecutor, integration_executor
+
+# gspread и google-auth импортируются при первом обращении к таблице:
+# вместе они добавляют к запуску бота около 0.4 с
+if TYPE_CHECKING:
+    import gspread
 
 logger = logging.getLogger(__name__)
 
+WRITE_DURATION = registry.histogram(
+    'sheets_write_duration_seconds', 'Время пакетной записи строк в Google Sheets', ('sheet',)
+)
+WRITE_ROWS = registry.counter('sheets_write_rows_total', 'Строк записано в Google Sheets', ('sheet',))
+WRITE_FAILURES = registry.counter('sheets_write_failures_total', 'Неудачные пакетные записи в Google Sheets', ('sheet',))
+
+
+# Заголовки листов
+FREE_SALE_HEADERS = [
+    'Название услуги', 
+    'Логин клиента',
+    'Комментарий',
+    'Сумма (₽)',
+    'Менеджер',
+    "Номер заказа",
+    'Дата и время',
+]
+
+PRODUCT_SALE_HEADERS = [
+    'Название игры',
+    'Консоль',
+    'Позиция',
+    'Логин PS',
+    'Комментарий',
+    'Сумма (₽)',
+    'Менеджер',
+    "Номер заказа",
+    'Дата и время',
+]
+
+FREE_SALE_SHEET = 'Свободные продажи'
+PRODUCT_SALE_SHEET = 'Продажи товаров'
+
+SHEET_HEADERS = {
+    FREE_SALE_SHEET: FREE_SALE_HEADERS,
+    PRODUCT_SALE_SHEET: PRODUCT_SALE_HEADERS
+}
+
 
 class GoogleSheetsService:
-    """Класс для работы с Google Sheets"""
+    """
+    Класс для работы с Google Sheets.
+    Клиент авторизуется один раз на процесс учетными данными сервисного
+    аккаунта google-auth: gspread работает через AuthorizedSession, которая сама
+    обновляет истекший токен, а отказ в обновлении приходит как RefreshError. Листы кэшируются
+    по названию и сбрасываются только при ошибках.
+    """
     
     def __init__(self):
         self.credentials_file = GOOGLE_CREDENTIALS_FILE
         self.sheet_id = GOOGLE_SHEET_ID
         self.client = None
         self.spreadsheet = None
+        self._worksheets: Dict[str, 'gspread.Worksheet'] = {}
+        self._lock = threading.Lock()
         
+    def prewarm(self) -> bool:
+        """
+        Загрузка библиотек Google и авторизация заранее, в фоне после запуска бота,
+        чтобы первая запись оплаченной продажи не ждала их
+        """
+        return self._authenticate()
+    
     def _authenticate(self) -> bool:
         """
-        Аутентификация в Google Sheets API
+        Аутентификация в Google Sheets API (выполняется один раз)
         """
+        if self.spreadsheet is not None:
+            return True
+        
+        with self._lock:
+            if self.spreadsheet is not None:
+                return True
+            return self._connect()
+    
+    def _connect(self) -> bool:
+        """Авторизация клиента и открытие таблицы"""
+        import gspread
+        from google.oauth2.service_account import Credentials
+        
         try:
             # Определяем области доступа
             scope = [
-                'https://spreadsheets.google.com/feeds',
+                'https://www.googleapis.com/auth/spreadsheets',
                 'https://www.googleapis.com/auth/drive'
             ]
             
             # Загружаем учетные данные
-            credentials = ServiceAccountCredentials.from_json_keyfile_name(
-                self.credentials_file, scope
+            credentials = Credentials.from_service_account_file(
+                self.credentials_file, scopes=scope
             )
             
             # Авторизуемся
@@ -56,14 +130,21 @@ class GoogleSheetsService:
             logger.error(f"Ошибка аутентификации Google Sheets: {e}")
             return False
     
-    def _get_or_create_worksheet(self, title: str, headers: List[str]) -> Optional[gspread.Worksheet]:
+    def _get_or_create_worksheet(self, title: str, headers: List[str]) -> Optional['gspread.Worksheet']:
         """
-        Получить или создать лист в таблице
+        Получить или создать лист в таблице (с кэшированием по названию)
         """
+        worksheet = self._worksheets.get(title)
+        if worksheet is not None:
+            return worksheet
+        
+        import gspread
+        
         try:
             # Пытаемся найти существующий лист
             try:
                 worksheet = self.spreadsheet.worksheet(title)
+                self._worksheets[title] = worksheet
                 return worksheet
             except gspread.WorksheetNotFound:
                 # Создаем новый лист
@@ -75,12 +156,137 @@ class GoogleSheetsService:
                 # Добавляем заголовки
                 worksheet.append_row(headers)
                 logger.info(f"Создан новый лист: {title}")
+                self._worksheets[title] = worksheet
                 return worksheet
                 
         except Exception as e:
             logger.error(f"Ошибка при работе с листом {title}: {e}")
             return None
     
+    def _invalidate(self, title: str, error: Exception):
+        """
+        Сброс кэша после ошибки: лист перечитывается при следующей записи,
+        а при ошибках доступа к таблице клиент авторизуется заново
+        """
+        from google.auth.exceptions import RefreshError
+        
+        self._worksheets.pop(title, None)
+        
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+        if isinstance(error, RefreshError) or status in (401, 403, 404):
+            with self._lock:
+                self.client = None
+                self.spreadsheet = None
+                self._worksheets.clear()
+    
+    def _append_rows(self, title: str, headers: List[str], rows: List[List[Any]]) -> bool:
+        """
+        Добавление строк в лист. При закэшированном листе - ровно один запрос к API
+        """
+        # Аутентификация
+        if not self._authenticate():
+            return False
+        
+        # Получаем или создаем лист
+        worksheet = self._get_or_create_worksheet(title, headers)
+        if not worksheet:
+            logger.error("Не удалось получить worksheet")
+            return False
+        
+        try:
+            worksheet.append_rows(rows)
+            return True
+        except Exception as e:
+            self._invalidate(title, e)
+            raise
+    
+    def order_exists(self, title: str, order_id: str, column: int) -> bool:
+        """
+        Проверка, записан ли заказ в лист (поиск по одной колонке)
+        """
+        if not self._authenticate():
+            raise RuntimeError("Нет доступа к Google Sheets")
+        
+        worksheet = self._get_or_create_worksheet(title, SHEET_HEADERS.get(title, []))
+        if not worksheet:
+            raise RuntimeError(f"Лист {title} недоступен")
+        
+        try:
+            return worksheet.find(order_id, in_column=column) is not None
+        except Exception as e:
+            self._invalidate(title, e)
+            raise
+    
+    def order_ids(self, title: str) -> Set[str]:
+        """
+        Номера заказов, записанных в лист (последняя колонка строки продажи)
+        """
+        column = len(SHEET_HEADERS[title]) - 1
+        return {
+            str(row[column]).strip() for _, row in self.iter_rows(title)
+            if len(row) > column and str(row[column]).strip()
+        }
+    
+    def iter_rows(self, title: str, page_size: int = 500) -> Iterator[Tuple[int, List[Any]]]:
+        """
+        Построчное чтение листа страницами по page_size строк (без заголовка).
+        Возвращает пары (номер строки в листе, значения).
+        """
+        import gspread
+        
+        if not self._authenticate():
+            raise RuntimeError("Нет доступа к Google Sheets")
+        
+        try:
+            worksheet = self._worksheets.get(title) or self.spreadsheet.worksheet(title)
+            self._worksheets[title] = worksheet
+        except gspread.WorksheetNotFound:
+            return
+        
+        start = 2
+        while True:
+            end = start + page_size - 1
+            page = worksheet.get(f"A{start}:Z{end}")
+            if not page:
+                return
+            for offset, row in enumerate(page):
+                if any(str(value).strip() for value in row):
+                    yield start + offset, row
+            if len(page) < page_size:
+                return
+            start = end + 1
+    
+    @staticmethod
+    def free_sale_row(service_name: str, client_login: str, comment: str, amount: float,
+                      timestamp: datetime, user_telegram_login: str, order_id: str) -> List[Any]:
+        """Строка листа свободных продаж"""
+        return [
+            str(service_name),  # Явно преобразуем в строку
+            str(client_login),  # Явно преобразуем в строку
+            str(comment),       # Явно преобразуем в строку
+            float(amount),       # Явно преобразуем в число
+            str(user_telegram_login),
+            timestamp.strftime('%d.%m.%Y %H:%M:%S'),
+            str(order_id),
+        ]
+    
+    @staticmethod
+    def product_sale_row(game_name: str, console: str, position: str, ps_login: str,
+                         comment: str, amount: float, timestamp: datetime,
+                         user_telegram_login: str, order_id: str) -> List[Any]:
+        """Строка листа продаж товаров"""
+        return [
+            game_name,
+            console,
+            position,
+            ps_login,
+            comment,
+            amount,
+            user_telegram_login,
+            timestamp.strftime('%d.%m.%Y %H:%M:%S'),
+            order_id,
+        ]
+    
     def add_free_sale_record(self, service_name: str, client_login: str, 
                            comment: str, amount: float, timestamp: datetime, user_telegram_login: str, order_id: str) -> bool:
         """
@@ -90,43 +296,18 @@ class GoogleSheetsService:
             # Добавляем отладочную информацию
             logger.info(f"Начинаем запись: service_name='{service_name}', client_login='{client_login}', comment='{comment}', amount={amount}")
             
-            # Аутентификация
-            if not self._authenticate():
-                return False
-            
-            # Заголовки для листа свободных продаж
-            headers = [
-                'Название услуги', 
-                'Логин клиента',
-                'Комментарий',
-                'Сумма (₽)',
-                'Менеджер',
-                "Номер заказа",
-                'Дата и время',
-            ]
-            
-            # Получаем или создаем лист
-            worksheet = self._get_or_create_worksheet('Свободные продажи', headers)
-            if not worksheet:
-                logger.error("Не удалось получить worksheet")
-                return False
-            
             # Подготавливаем данные для записи
-            row_data = [
-                str(service_name),  # Явно преобразуем в строку
-                str(client_login),  # Явно преобразуем в строку
-                str(comment),       # Явно преобразуем в строку
-                float(amount),       # Явно преобразуем в число
-                str(user_telegram_login),
-                timestamp.strftime('%d.%m.%Y %H:%M:%S'),
-                str(order_id),
-            ]
+            row_data = self.free_sale_row(
+                service_name, client_login, comment, amount,
+                timestamp, user_telegram_login, order_id
+            )
             
             # Добавляем отладочную информацию о данных
             logger.info(f"Данные для записи: {row_data}")
             
             # Добавляем строку
-            worksheet.append_row(row_data)
+            if not self._append_rows(FREE_SALE_SHEET, FREE_SALE_HEADERS, [row_data]):
+                return False
             
             logger.info(f"Записана свободная продажа: {service_name}, {amount} ₽")
             return True
@@ -144,43 +325,15 @@ class GoogleSheetsService:
         Добавление записи о продаже товара
         """
         try:
-            # Аутентификация
-            if not self._authenticate():
-                return False
-            
-            # Заголовки для листа продаж товаров
-            headers = [
-                'Название игры',
-                'Консоль',
-                'Позиция',
-                'Логин PS',
-                'Комментарий',
-                'Сумма (₽)',
-                'Менеджер',
-                "Номер заказа",
-                'Дата и время',
-            ]
-            
-            # Получаем или создаем лист
-            worksheet = self._get_or_create_worksheet('Продажи товаров', headers)
-            if not worksheet:
-                return False
-            
             # Подготавливаем данные для записи
-            row_data = [
-                game_name,
-                console,
-                position,
-                ps_login,
-                comment,
-                amount,
-                user_telegram_login,
-                timestamp.strftime('%d.%m.%Y %H:%M:%S'),
-                order_id,
-            ]
+            row_data = self.product_sale_row(
+                game_name, console, position, ps_login, comment, amount,
+                timestamp, user_telegram_login, order_id
+            )
             
             # Добавляем строку
-            worksheet.append_row(row_data)
+            if not self._append_rows(PRODUCT_SALE_SHEET, PRODUCT_SALE_HEADERS, [row_data]):
+                return False
             
             logger.info(f"Записана продажа товара: {game_name}, {console}, {amount} ₽")
             return True
@@ -191,8 +344,11 @@ class GoogleSheetsService:
     
     def get_sales_summary(self, date_from: datetime = None) -> dict:
         """
-        Получение сводки по продажам (дополнительный метод)
+        Получение сводки по продажам полным чтением листов.
+        Для оперативной сводки без обращения к API используйте SalesLedger
         """
+        import gspread
+        
         try:
             if not self._authenticate():
                 return {}
@@ -206,7 +362,8 @@ class GoogleSheetsService:
             
             # Анализируем свободные продажи
             try:
-                free_sales_sheet = self.spreadsheet.worksheet('Свободные продажи')
+                free_sales_sheet = self._worksheets.get(FREE_SALE_SHEET) or self.spreadsheet.worksheet(FREE_SALE_SHEET)
+                self._worksheets[FREE_SALE_SHEET] = free_sales_sheet
                 free_sales_data = free_sales_sheet.get_all_records()
                 
                 for row in free_sales_data:
@@ -218,7 +375,8 @@ class GoogleSheetsService:
             
             # Анализируем продажи товаров
             try:
-                product_sales_sheet = self.spreadsheet.worksheet('Продажи товаров')
+                product_sales_sheet = self._worksheets.get(PRODUCT_SALE_SHEET) or self.spreadsheet.worksheet(PRODUCT_SALE_SHEET)
+                self._worksheets[PRODUCT_SALE_SHEET] = product_sales_sheet
                 product_sales_data = product_sales_sheet.get_all_records()
                 
                 for row in product_sales_data:
@@ -232,4 +390,113 @@ class GoogleSheetsService:
             
         except Exception as e:
             logger.error(f"Ошибка получения сводки: {e}")
-            return {} 
\ No newline at end of file
+            return {}
+
+
+class SheetsWriteQueue:
+    """
+    Отложенная пакетная запись в Google Sheets.
+    Строки копятся по листам и записываются одним append_rows, когда набирается
+    max_batch строк или проходит flush_interval секунд с первой строки в пакете.
+    Вызывающий получает результат только после фактической записи своей строки.
+    """
+    
+    def __init__(self, service: GoogleSheetsService,
+                 max_batch: int = SHEETS_BATCH_SIZE,
+                 flush_interval: float = SHEETS_FLUSH_INTERVAL,
+                 executor: IntegrationExecutor = integration_executor):
+        self.service = service
+        self.executor = executor
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._buffers: Dict[str, List[Tuple[List[Any], asyncio.Future]]] = {}
+        self._headers: Dict[str, List[str]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._flushes: set = set()
+        self._closed = False
+    
+    def enqueue(self, title: str, headers: List[str], row: List[Any]) -> asyncio.Future:
+        """
+        Поставить строку в очередь записи. Future завершается True после записи
+        в таблицу или False при ошибке записи
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if self._closed:
+            future.set_result(False)
+            return future
+        
+        buffer = self._buffers.setdefault(title, [])
+        self._headers[title] = headers
+        buffer.append((row, future))
+        
+        if len(buffer) >= self.max_batch:
+            self._start_flush(title)
+        elif title not in self._timers:
+            self._timers[title] = loop.call_later(self.flush_interval, self._start_flush, title)
+        return future
+    
+    async def add_free_sale_record(self, **kwargs) -> bool:
+        """Асинхронный аналог GoogleSheetsService.add_free_sale_record"""
+        row = self.service.free_sale_row(**kwargs)
+        return await self.enqueue(FREE_SALE_SHEET, FREE_SALE_HEADERS, row)
+    
+    async def add_product_sale_record(self, **kwargs) -> bool:
+        """Асинхронный аналог GoogleSheetsService.add_product_sale_record"""
+        row = self.service.product_sale_row(**kwargs)
+        return await self.enqueue(PRODUCT_SALE_SHEET, PRODUCT_SALE_HEADERS, row)
+    
+    @property
+    def pending_rows(self) -> int:
+        return sum(len(buffer) for buffer in self._buffers.values())
+    
+    def _start_flush(self, title: str):
+        task = asyncio.create_task(self.flush(title))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+    
+    async def flush(self, title: str):
+        """Записать накопленные строки листа одним запросом"""
+        timer = self._timers.pop(title, None)
+        if timer is not None:
+            timer.cancel()
+        
+        # Записи в один лист идут строго по очереди, чтобы сохранить порядок строк
+        lock = self._locks.setdefault(title, asyncio.Lock())
+        async with lock:
+            batch = self._buffers.pop(title, [])
+            if not batch:
+                return
+            
+            rows = [row for row, _ in batch]
+            started = time.perf_counter()
+            try:
+                success = await self.executor.run(
+                    'sheets', self.service._append_rows, title, self._headers[title], rows
+                )
+            except Exception as e:
+                logger.error(f"Ошибка пакетной записи в лист {title}: {e}")
+                success = False
+            WRITE_DURATION.observe(time.perf_counter() - started, title)
+            
+            if success:
+                WRITE_ROWS.inc(title, amount=len(rows))
+                logger.info(f"Записано строк в лист {title}: {len(rows)}")
+            else:
+                WRITE_FAILURES.inc(title)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(success)
+    
+    async def close(self):
+        """Записать все накопленные строки перед остановкой бота"""
+        self._closed = True
+        await asyncio.gather(*(self.flush(title) for title in list(self._buffers)))
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+
+# Общий сервис для всего процесса (один авторизованный клиент)
+sheets_service = GoogleSheetsService()
+sheets_write_queue = SheetsWriteQueue(sheets_service)
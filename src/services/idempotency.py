@@ -0,0 +1,76 @@
+"""
+Идемпотентные вызовы: одновременные запросы с одним ключом выполняются один раз
+"""
+
+import asyncio
+import functools
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from metrics import registry
+
+DUPLICATES = registry.counter(
+    'idempotent_duplicates_total', 'Повторные запросы, получившие результат первого вызова', ('name',)
+)
+
+
+class IdempotentCalls:
+    """
+    Однократное выполнение по ключу. Пока вызов выполняется, повторные
+    запросы с тем же ключом получают его же задачу; результат завершенного
+    вызова хранится ttl секунд. Исключения и результаты, для которых
+    cache_result возвращает False, не запоминаются: после ошибки вызов
+    с тем же ключом выполняется заново.
+    """
+
+    def __init__(self, name: str, ttl: float, cache_result: Callable[[Any], bool] = lambda result: True):
+        self.name = name
+        self.ttl = ttl
+        self.cache_result = cache_result
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        # Ключ -> (время устаревания по monotonic, результат); порядок вставки совпадает с порядком устаревания
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._results)
+
+    def start(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[asyncio.Future, bool]:
+        """
+        Future с результатом по ключу и признак того, что вызов factory
+        запущен этим обращением (False - результат первого вызова)
+        """
+        self._expire()
+        cached = self._results.get(key)
+        if cached is not None:
+            DUPLICATES.inc(self.name)
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(cached[1])
+            return future, False
+        pending = self._pending.get(key)
+        if pending is not None:
+            DUPLICATES.inc(self.name)
+            return pending, False
+
+        # Задача регистрируется до первого await: второе обращение ее уже увидит
+        task = asyncio.ensure_future(factory())
+        self._pending[key] = task
+        task.add_done_callback(functools.partial(self._finish, key))
+        return task, True
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Результат вызова по ключу; отмена ожидающего не отменяет общий вызов"""
+        future, started = self.start(key, factory)
+        return await asyncio.shield(future), started
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        self._pending.pop(key, None)
+        if not task.cancelled() and task.exception() is None and self.cache_result(task.result()):
+            self._results[key] = (time.monotonic() + self.ttl, task.result())
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._results:
+            key, (expires_at, _) = next(iter(self._results.items()))
+            if expires_at > now:
+                break
+            del self._results[key]
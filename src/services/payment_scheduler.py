@@ -0,0 +1,311 @@
+"""
+Единый планировщик проверок статуса для всех ожидающих платежей
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
+
+from config import PAYMENT_POLL_CONCURRENCY, PAYMENT_TRACKING_WINDOW
+from models import FreeSaleData, OurProductData, PendingPayment
+from services.payment_store import PaymentStore
+from services.payment_tracker import PaymentTracker, FINAL_STATUSES
+from services.polling_policy import EXPIRY_GRACE, PollingPolicy, create_polling_policy, parse_ctime
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentScheduler:
+    """
+    Очередь ожидающих платежей, упорядоченная по времени следующей проверки.
+    Один рабочий цикл забирает созревшие платежи из кучи и проверяет их
+    с ограниченным параллелизмом. Время проверок задает policy; срок
+    отслеживания - tracking_window от создания платежа (по ctime из ответа
+    Antilopay), в этот момент выполняется последняя проверка.
+    """
+
+    def __init__(self, tracker: PaymentTracker,
+                 store: Optional[PaymentStore] = None,
+                 policy: Optional[PollingPolicy] = None,
+                 tracking_window: float = PAYMENT_TRACKING_WINDOW,
+                 max_concurrency: int = PAYMENT_POLL_CONCURRENCY):
+        self.tracker = tracker
+        self.store = store
+        self.policy = policy or create_polling_policy()
+        self.tracking_window = tracking_window
+        self.max_concurrency = max_concurrency
+        self._ctime_warned = False
+
+        # Куча (время проверки, порядковый номер, order_id); устаревшие записи
+        # не удаляются из кучи, а пропускаются по несовпадению номера
+        self._heap: List[Tuple[float, int, str]] = []
+        self._entries: Dict[str, int] = {}
+        self._pending: Dict[str, PendingPayment] = {}
+        self._seq = itertools.count()
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+        self.last_poll_lag = 0.0
+        self.max_poll_lag = 0.0
+
+    def register(self, order_id: str, payment_id: str,
+                 sale_data: Union[FreeSaleData, OurProductData], chat_id: int,
+                 payment_display: str, user_telegram_login: Optional[str]) -> PendingPayment:
+        """Поставить платеж на отслеживание"""
+        now = time.time()
+        pending = PendingPayment(
+            order_id=order_id,
+            payment_id=payment_id,
+            sale_data=sale_data,
+            chat_id=chat_id,
+            payment_display=payment_display,
+            user_telegram_login=user_telegram_login,
+            deadline=now + self.tracking_window + EXPIRY_GRACE,
+            created_at=now
+        )
+        self._persist('add', pending)
+        self._pending[order_id] = pending
+        self._schedule(pending, min(self.policy.first_check(pending, now), pending.deadline))
+
+        logger.info(f"Начато отслеживание платежа {payment_id} (Order: {order_id})")
+        return pending
+
+    def restore(self) -> int:
+        """
+        Восстановить отслеживание незавершенных платежей из хранилища
+        (вызывается при старте бота). Платежи с истекшим сроком проверяются
+        один раз сразу после запуска.
+        """
+        if self.store is None:
+            return 0
+
+        now = time.time()
+        restored = 0
+        for pending in self.store.load_pending():
+            if pending.order_id in self._pending:
+                continue
+            self._pending[pending.order_id] = pending
+            self._schedule(pending, min(self.policy.first_check(pending, now), max(now, pending.deadline)))
+            restored += 1
+
+        if restored:
+            logger.info(f"Восстановлено отслеживание платежей: {restored}")
+        return restored
+
+    def cancel(self, order_id: str) -> bool:
+        """Снять платеж с отслеживания. Возвращает False, если платеж не найден"""
+        pending = self._pending.get(order_id)
+        if pending is None or not self._claim(pending, 'CANCELLED'):
+            return False
+
+        logger.info(f"Отслеживание платежа {pending.payment_id} (Order: {order_id}) отменено")
+        return True
+
+    def resolve(self, order_id: str, status_result: Dict[str, Any]) -> bool:
+        """
+        Завершить отслеживание по внешнему уведомлению о финальном статусе.
+        Возвращает False, если платеж не отслеживается или статус не финальный.
+        """
+        pending = self._pending.get(order_id)
+        if pending is None or status_result.get("status") not in FINAL_STATUSES:
+            return False
+        if not self._claim(pending, status_result["status"]):
+            return False
+
+        self._spawn(self._finish(pending, status_result))
+        return True
+
+    def list_pending(self) -> List[PendingPayment]:
+        """Ожидающие платежи в порядке ближайшей проверки"""
+        return sorted(self._pending.values(), key=lambda p: p.next_check_at)
+
+    def get(self, order_id: str) -> Optional[PendingPayment]:
+        return self._pending.get(order_id)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние очереди: глубина, проверки в работе и отставание от расписания"""
+        return {
+            'queue_depth': self.queue_depth,
+            'in_flight': len(self._in_flight),
+            'policy': self.policy.name,
+            'last_poll_lag': self.last_poll_lag,
+            'max_poll_lag': self.max_poll_lag
+        }
+
+    def start(self):
+        """Запуск рабочего цикла (в работающем event loop)"""
+        if self._worker is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._worker = asyncio.create_task(self._run(), name='payment-scheduler')
+        logger.info("Планировщик платежей запущен")
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Остановка рабочего цикла. Начатые проверки и обработка результатов
+        получают timeout секунд на завершение, затем отменяются.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+        if self._in_flight:
+            _, still_running = await asyncio.wait(list(self._in_flight), timeout=timeout)
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*still_running, return_exceptions=True)
+
+        logger.info(f"Планировщик платежей остановлен, в очереди: {self.queue_depth}")
+
+    def _persist(self, method: str, *args):
+        """Запись в хранилище; ошибка записи не должна ломать отслеживание"""
+        if self.store is None:
+            return
+        try:
+            getattr(self.store, method)(*args)
+        except Exception as e:
+            logger.error(f"Ошибка записи в хранилище платежей: {e}")
+
+    def _claim(self, pending: PendingPayment, status: str) -> bool:
+        """
+        Снять платеж с отслеживания перед обработкой финального статуса.
+        Только первый из источников (опрос или уведомление) получает True.
+        """
+        if self._pending.get(pending.order_id) is not pending:
+            return False
+        del self._pending[pending.order_id]
+        self._entries.pop(pending.order_id, None)
+        self._persist('set_status', pending.order_id, status)
+        return True
+
+    def _spawn(self, coro):
+        """
+        Обработка результата отдельной задачей: сообщение менеджеру и запись
+        в таблицу (ожидание пакета) не занимают слот проверок статуса
+        """
+        task = asyncio.create_task(coro)
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _finish(self, pending: PendingPayment, status_result: Dict[str, Any]):
+        try:
+            await self.tracker.handle_final_status(pending, status_result)
+        except Exception as e:
+            logger.error(f"Ошибка обработки платежа {pending.payment_id}: {e}")
+
+    async def _expire(self, pending: PendingPayment):
+        try:
+            await self.tracker.handle_timeout(pending)
+        except Exception as e:
+            logger.error(f"Ошибка обработки платежа {pending.payment_id}: {e}")
+
+    def _align_deadline(self, pending: PendingPayment, ctime: Any):
+        """Срок отслеживания от времени создания платежа у Antilopay (ctime)"""
+        created = parse_ctime(ctime)
+        if created is None:
+            return
+        deadline = created + self.tracking_window + EXPIRY_GRACE
+        if abs(deadline - pending.deadline) < 1:
+            return
+        if abs(created - pending.created_at) > self.tracking_window:
+            # Скорее всего ctime в другом часовом поясе (ANTILOPAY_CTIME_UTC_OFFSET)
+            if not self._ctime_warned:
+                logger.warning(f"ctime {ctime} платежа {pending.payment_id} далеко от времени создания, "
+                               f"срок отслеживания не изменен")
+                self._ctime_warned = True
+            return
+        pending.deadline = deadline
+        self._persist('update_deadline', pending.order_id, deadline)
+
+    def _schedule(self, pending: PendingPayment, when: float):
+        seq = next(self._seq)
+        pending.next_check_at = when
+        self._entries[pending.order_id] = seq
+        heapq.heappush(self._heap, (when, seq, pending.order_id))
+
+        # Будим рабочий цикл, если новая проверка раньше текущего ожидания
+        if self._wakeup is not None and self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def _pop_due(self, now: float) -> List[PendingPayment]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, seq, order_id = heapq.heappop(self._heap)
+            if self._entries.get(order_id) != seq:
+                continue
+            del self._entries[order_id]
+
+            lag = now - when
+            self.last_poll_lag = lag
+            self.max_poll_lag = max(self.max_poll_lag, lag)
+            due.append(self._pending[order_id])
+        return due
+
+    async def _run(self):
+        while True:
+            # Отбрасываем устаревшие записи на вершине кучи
+            while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+                heapq.heappop(self._heap)
+
+            timeout = None
+            if self._heap:
+                timeout = max(0.0, self._heap[0][0] - time.time())
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+            for pending in self._pop_due(time.time()):
+                # Ограничиваем число одновременных проверок
+                await self._semaphore.acquire()
+                task = asyncio.create_task(self._poll(pending))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+
+    async def _poll(self, pending: PendingPayment):
+        try:
+            pending.attempts += 1
+            try:
+                status_result = await self.tracker.fetch_status(pending)
+            except Exception as e:
+                logger.error(f"Ошибка при проверке статуса платежа {pending.payment_id}: {e}")
+                status_result = None
+
+            status = status_result.get("status") if status_result else None
+            if status in FINAL_STATUSES:
+                if self._claim(pending, status):
+                    self._spawn(self._finish(pending, status_result))
+                return
+
+            # Платеж могли отменить или завершить уведомлением, пока шла проверка
+            if self._pending.get(pending.order_id) is not pending:
+                return
+
+            if status_result:
+                self._align_deadline(pending, status_result.get("ctime"))
+            now = time.time()
+            if now >= pending.deadline:
+                # Срок оплаты истек
+                if self._claim(pending, 'TIMEOUT'):
+                    self._spawn(self._expire(pending))
+            else:
+                self._persist('update_attempts', pending.order_id, pending.attempts)
+                self._schedule(pending, min(self.policy.next_check(pending, now, status), pending.deadline))
+        except Exception as e:
+            logger.error(f"Ошибка обработки платежа {pending.payment_id}: {e}")
+        finally:
+            self._semaphore.release()
@@ -0,0 +1,141 @@
+"""
+Локальное хранилище созданных платежей (SQLite)
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import DATABASE_FILE
+from models import PendingPayment, serialize_sale_data, deserialize_sale_data
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentStore:
+    """
+    Журнал созданных заказов для восстановления отслеживания после перезапуска.
+    Записи не удаляются: финальный статус сохраняется в колонке status.
+    """
+
+    def __init__(self, db_file: str = DATABASE_FILE):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        # WAL + synchronous=NORMAL: запись занимает десятки микросекунд
+        # и не требует fsync на каждую транзакцию
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS payments (
+                order_id TEXT PRIMARY KEY,
+                payment_id TEXT NOT NULL,
+                sale_type TEXT NOT NULL,
+                sale_data TEXT NOT NULL,
+                chat_id INTEGER NOT NULL,
+                payment_display TEXT,
+                user_telegram_login TEXT,
+                created_at REAL NOT NULL,
+                deadline REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'PENDING',
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_payments_status ON payments (status);
+            CREATE INDEX IF NOT EXISTS idx_payments_created_at ON payments (created_at);
+        """)
+
+    def add(self, pending: PendingPayment):
+        """Сохранить созданный заказ"""
+        sale_type, sale_data = serialize_sale_data(pending.sale_data)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO payments (order_id, payment_id, sale_type, sale_data, chat_id, "
+                "payment_display, user_telegram_login, created_at, deadline, attempts, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'PENDING', ?)",
+                (
+                    pending.order_id, pending.payment_id, sale_type,
+                    json.dumps(sale_data, ensure_ascii=False, separators=(',', ':')),
+                    pending.chat_id, pending.payment_display, pending.user_telegram_login,
+                    pending.created_at, pending.deadline, pending.attempts, time.time()
+                )
+            )
+
+    def update_attempts(self, order_id: str, attempts: int):
+        """Сохранить число выполненных проверок статуса"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE payments SET attempts = ?, updated_at = ? WHERE order_id = ?",
+                (attempts, time.time(), order_id)
+            )
+
+    def update_deadline(self, order_id: str, deadline: float):
+        """Сохранить уточненный срок отслеживания"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE payments SET deadline = ?, updated_at = ? WHERE order_id = ?",
+                (deadline, time.time(), order_id)
+            )
+
+    def set_status(self, order_id: str, status: str):
+        """Зафиксировать финальный статус заказа"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE payments SET status = ?, updated_at = ? WHERE order_id = ?",
+                (status, time.time(), order_id)
+            )
+
+    def load_pending(self) -> List[PendingPayment]:
+        """Заказы, отслеживание которых не было завершено"""
+        return [pending for pending, _ in self._load("status = 'PENDING'", ())]
+
+    def list_orders(self, created_from: float, created_to: float) -> List[Tuple[PendingPayment, str]]:
+        """Заказы, созданные в промежутке [created_from, created_to), с текущим статусом"""
+        return self._load("created_at >= ? AND created_at < ?", (created_from, created_to))
+
+    def _load(self, where: str, params: tuple) -> List[Tuple[PendingPayment, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT order_id, payment_id, sale_type, sale_data, chat_id, payment_display, "
+                "user_telegram_login, created_at, deadline, attempts, status "
+                f"FROM payments WHERE {where} ORDER BY created_at",
+                params
+            ).fetchall()
+
+        result = []
+        for row in rows:
+            try:
+                result.append((PendingPayment(
+                    order_id=row[0],
+                    payment_id=row[1],
+                    sale_data=deserialize_sale_data(row[2], json.loads(row[3])),
+                    chat_id=row[4],
+                    payment_display=row[5],
+                    user_telegram_login=row[6],
+                    created_at=row[7],
+                    deadline=row[8],
+                    attempts=row[9]
+                ), row[10]))
+            except Exception as e:
+                logger.error(f"Не удалось восстановить заказ {row[0]}: {e}")
+        return result
+
+    def get_status(self, order_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM payments WHERE order_id = ?", (order_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Число заказов по статусам"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM payments GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -2,76 +2,73 @@
 Сервис для асинхронного отслеживания статуса платежей
 """
 
-import asyncio
 import logging
-from typing import Dict, Any, Union
+from typing import Dict, Any, Optional, Union
 from aiogram import Bot
 
-from services.antilopay import AntilopayAPI
-from services.google_sheets import GoogleSheetsService
-from models import FreeSaleData, OurProductData
+from services.antilopay import antilopay_api
+from services.sales_ledger import SalesLedger
+from services.sales_outbox import SalesOutbox
+from services.telegram_outbound import background_priority
+from models import FreeSaleData, OurProductData, PendingPayment
 from keyboards import get_back_to_main_after_sale_keyboard
 
 logger = logging.getLogger(__name__)
 
+# Статусы, после которых отслеживание платежа завершается
+FINAL_STATUSES = ("SUCCESS", "FAIL", "CANCEL", "EXPIRED")
+
 
 class PaymentTracker:
-    """Класс для отслеживания статуса платежей"""
+    """
+    Проверка статуса платежей и обработка результата оплаты.
+    Расписание проверок ведет PaymentScheduler.
+    """
     
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, outbox: SalesOutbox, ledger: SalesLedger):
         self.bot = bot
-        self.antilopay = AntilopayAPI()
-        self.sheets_service = GoogleSheetsService()
+        self.antilopay = antilopay_api
+        self.outbox = outbox
+        self.ledger = ledger
     
-    async def track_payment(self, order_id: str, payment_id: str, 
-                          sale_data: Union[FreeSaleData, OurProductData], chat_id: int, 
-                          payment_display: str, user_telegram_login: str):
+    async def fetch_status(self, pending: PendingPayment) -> Optional[Dict[str, Any]]:
         """
-        Асинхронное отслеживание платежа в течение 10 минут
+        Однократный запрос статуса платежа. Возвращает None при ошибке запроса.
         """
-        logger.info(f"Начато отслеживание платежа {payment_id} (Order: {order_id})")
+        # Проверяем статус платежа
+        status_result = await self.antilopay.check_payment_status(pending.order_id)
         
-        # Проверяем статус каждые 30 секунд в течение 10 минут (20 попыток)
-        max_attempts = 20
-        check_interval = 30  # секунд
+        if not status_result.get("success"):
+            logger.warning(f"Ошибка проверки статуса платежа {pending.payment_id}: {status_result.get('error')}")
+            return None
         
-        for attempt in range(max_attempts):
-            try:
-                await asyncio.sleep(check_interval)
-                
-                # Проверяем статус платежа
-                status_result = self.antilopay.check_payment_status(order_id)
-                
-                if not status_result.get("success"):
-                    logger.warning(f"Ошибка проверки статуса платежа {payment_id}: {status_result.get('error')}")
-                    continue
-                
-                status = status_result.get("status")
-
-                logger.info(f"Статус платежа {payment_id}: {status} (попытка {attempt + 1}/{max_attempts})")
-                
-                if status == "SUCCESS":
-                    # Платеж успешно оплачен
-                    await self._handle_successful_payment(
-                        order_id, payment_id, sale_data, chat_id, 
-                        payment_display, status_result, user_telegram_login
-                    )
-                    return
-                
-                elif status in ["FAIL", "CANCEL", "EXPIRED"]:
-                    # Платеж не удался
-                    await self._handle_failed_payment(
-                        order_id, payment_id, chat_id, status
-                    )
-                    return
-                
-                # Если статус PENDING - продолжаем ожидание
-                
-            except Exception as e:
-                logger.error(f"Ошибка при проверке статуса платежа {payment_id}: {e}")
+        logger.info(f"Статус платежа {pending.payment_id}: {status_result.get('status')} (попытка {pending.attempts})")
+        return status_result
+    
+    async def handle_final_status(self, pending: PendingPayment, status_result: Dict[str, Any]):
+        """
+        Обработка финального статуса платежа (из проверки статуса или уведомления)
+        """
+        status = status_result.get("status")
         
-        # Время ожидания истекло
-        await self._handle_timeout_payment(order_id, payment_id, chat_id)
+        # Уведомления об оплате уступают очередь ответам в мастерах продаж
+        with background_priority():
+            if status == "SUCCESS":
+                # Платеж успешно оплачен
+                await self._handle_successful_payment(
+                    pending.order_id, pending.payment_id, pending.sale_data, pending.chat_id,
+                    pending.payment_display, status_result, pending.user_telegram_login
+                )
+            else:
+                # Платеж не удался
+                await self._handle_failed_payment(
+                    pending.order_id, pending.payment_id, pending.chat_id, status
+                )
+    
+    async def handle_timeout(self, pending: PendingPayment):
+        """Время ожидания оплаты истекло"""
+        with background_priority():
+            await self._handle_timeout_payment(pending.order_id, pending.payment_id, pending.chat_id)
     
     async def _handle_successful_payment(self, order_id: str, payment_id: str,
                                        sale_data: Union[FreeSaleData, OurProductData], chat_id: int,
@@ -79,31 +76,10 @@ class PaymentTracker:
         """Обработка успешного платежа"""
         try:
             amount_received = status_result.get("amount", sale_data.amount)
-            # Определяем тип данных и записываем в соответствующую таблицу
+            sheets_success = await self.record_sale(order_id, sale_data, status_result, user_telegram_login)
             if isinstance(sale_data, FreeSaleData):
-                sheets_success = self.sheets_service.add_free_sale_record(
-                    service_name=sale_data.service_name,
-                    client_login=sale_data.client_login,
-                    comment=sale_data.comment,
-                    amount=amount_received,
-                    timestamp=sale_data.created_at,
-                    user_telegram_login=user_telegram_login,
-                    order_id=order_id
-                )
                 product_info = f"📝 <b>Название услуги:</b> {sale_data.service_name}\n\n👤 <b>Логин клиента:</b> {sale_data.client_login}"
-                
             elif isinstance(sale_data, OurProductData):
-                sheets_success = self.sheets_service.add_product_sale_record(
-                    game_name=sale_data.game_name,
-                    console=sale_data.console,
-                    position=sale_data.position,
-                    ps_login=sale_data.ps_login,
-                    comment=sale_data.comment,
-                    amount=sale_data.amount,
-                    timestamp=sale_data.created_at,
-                    user_telegram_login=user_telegram_login,
-                    order_id=order_id
-                )
                 product_info = (
                     f"🎮 <b>Название игры:</b> {sale_data.game_name}\n\n"
                     f"🧩 <b>Консоль:</b> {sale_data.console}\n\n"
@@ -112,7 +88,6 @@ class PaymentTracker:
                     f"💬 <b>Комментарий:</b> {sale_data.comment}\n"
                 )
 
-            
             # Получаем дополнительную информацию об оплате
             pay_method = status_result.get("pay_method", "")
             pay_data = status_result.get("pay_data", "")
@@ -134,7 +109,7 @@ class PaymentTracker:
                 success_message += f"\n💳 <b>Метод:</b> {pay_method} ({pay_data})\n"
             
             success_message += (
-                f"━━━━━━━━━━━━━━━━\n{'☑️ Данные записаны в таблицу.' if sheets_success else '⚠️ Ошибка записи в таблицу.'}\n\n"
+                f"━━━━━━━━━━━━━━━━\n{'☑️ Данные записаны в таблицу.' if sheets_success else '⚠️ Ошибка записи в таблицу. Запись будет повторена автоматически.'}\n\n"
                 "📊 Заказ сохранен в системе."
             )
             
@@ -165,6 +140,52 @@ class PaymentTracker:
                 parse_mode="HTML"
             )
     
+    async def record_sale(self, order_id: str, sale_data: Union[FreeSaleData, OurProductData],
+                          status_result: Dict[str, Any], user_telegram_login: str) -> bool:
+        """
+        Запись оплаченной продажи в таблицу (через журнал дозаписи) и в журнал продаж.
+        Возвращает True, если строка сразу попала в таблицу.
+        """
+        # Определяем тип данных и записываем в соответствующую таблицу
+        if isinstance(sale_data, FreeSaleData):
+            amount_received = status_result.get("amount", sale_data.amount)
+            sheets_success = await self.outbox.add_free_sale_record(
+                service_name=sale_data.service_name,
+                client_login=sale_data.client_login,
+                comment=sale_data.comment,
+                amount=amount_received,
+                timestamp=sale_data.created_at,
+                user_telegram_login=user_telegram_login,
+                order_id=order_id
+            )
+            self._record_ledger(order_id, 'free_sale', amount_received, sale_data, user_telegram_login)
+            return sheets_success
+        
+        sheets_success = await self.outbox.add_product_sale_record(
+            game_name=sale_data.game_name,
+            console=sale_data.console,
+            position=sale_data.position,
+            ps_login=sale_data.ps_login,
+            comment=sale_data.comment,
+            amount=sale_data.amount,
+            timestamp=sale_data.created_at,
+            user_telegram_login=user_telegram_login,
+            order_id=order_id
+        )
+        self._record_ledger(order_id, 'our_product', sale_data.amount, sale_data, user_telegram_login,
+                            console=sale_data.console, position=sale_data.position)
+        return sheets_success
+    
+    def _record_ledger(self, order_id: str, sale_type: str, amount: float,
+                       sale_data: Union[FreeSaleData, OurProductData], user_telegram_login: str,
+                       console: str = '', position: str = ''):
+        """Учет продажи в локальном журнале для сводок"""
+        try:
+            self.ledger.record(order_id, sale_type, float(amount), sale_data.created_at,
+                               user_telegram_login, console, position)
+        except Exception as e:
+            logger.error(f"Ошибка учета продажи {order_id} в журнале: {e}")
+    
     async def _handle_failed_payment(self, order_id: str, payment_id: str,
                                    chat_id: int, status: str):
         """Обработка неудачного платежа"""
@@ -0,0 +1,125 @@
+"""
+Политики опроса статуса платежа: когда выполнять следующую проверку
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from config import (
+    ANTILOPAY_CTIME_UTC_OFFSET,
+    PAYMENT_CHECK_INTERVAL,
+    PAYMENT_POLL_POLICY,
+    PAYMENT_POLL_DENSE_INTERVAL,
+    PAYMENT_POLL_DENSE_WINDOW,
+    PAYMENT_POLL_SPARSE_INTERVAL,
+    PAYMENT_POLL_MAX_INTERVAL
+)
+from models import PendingPayment
+
+# Запас после окончания срока оплаты для последней проверки: Antilopay меняет статус не мгновенно
+EXPIRY_GRACE = 5.0
+
+
+def parse_ctime(value: Any, utc_offset_hours: float = ANTILOPAY_CTIME_UTC_OFFSET) -> Optional[float]:
+    """
+    Время создания платежа из ответа Antilopay в unix time: число секунд
+    (или миллисекунд) либо строка даты; дата без часового пояса считается
+    в поясе UTC+utc_offset_hours. None, если разобрать не удалось
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)) or str(value).replace('.', '', 1).isdigit():
+        timestamp = float(value)
+        return timestamp / 1000 if timestamp > 1e12 else timestamp
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone(timedelta(hours=utc_offset_hours)))
+    return parsed.timestamp()
+
+
+class PollingPolicy:
+    """
+    Расписание проверок одного платежа. Планировщик вызывает first_check при
+    постановке на отслеживание (и после перезапуска), next_check - после
+    каждой нефинальной проверки (status None - запрос не удался). Проверка
+    позже pending.deadline не назначается: последняя выполняется в срок окончания оплаты
+    """
+
+    name = 'base'
+
+    def first_check(self, pending: PendingPayment, now: float) -> float:
+        raise NotImplementedError
+
+    def next_check(self, pending: PendingPayment, now: float, status: Optional[str]) -> float:
+        raise NotImplementedError
+
+
+class FixedIntervalPolicy(PollingPolicy):
+    """Проверка через равные промежутки"""
+
+    name = 'fixed'
+
+    def __init__(self, interval: float = PAYMENT_CHECK_INTERVAL):
+        self.interval = interval
+
+    def first_check(self, pending: PendingPayment, now: float) -> float:
+        return now + self.interval
+
+    def next_check(self, pending: PendingPayment, now: float, status: Optional[str]) -> float:
+        return now + self.interval
+
+
+class AdaptivePollingPolicy(PollingPolicy):
+    """
+    Каждые dense_interval секунд в первые dense_window секунд после создания
+    (клиент только что получил ссылку и чаще всего платит сразу), затем
+    с интервала sparse_interval, который растет в backoff раз после каждого
+    ответа PENDING подряд, но не больше max_interval. Ошибка запроса или
+    другой статус возвращают интервал к sparse_interval
+    """
+
+    name = 'adaptive'
+
+    def __init__(self, dense_interval: float = PAYMENT_POLL_DENSE_INTERVAL,
+                 dense_window: float = PAYMENT_POLL_DENSE_WINDOW,
+                 sparse_interval: float = PAYMENT_POLL_SPARSE_INTERVAL,
+                 max_interval: float = PAYMENT_POLL_MAX_INTERVAL,
+                 backoff: float = 2.0):
+        self.dense_interval = dense_interval
+        self.dense_window = dense_window
+        self.sparse_interval = sparse_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+
+    def _dense(self, pending: PendingPayment, now: float) -> bool:
+        return now - pending.created_at < self.dense_window
+
+    def first_check(self, pending: PendingPayment, now: float) -> float:
+        return now + (self.dense_interval if self._dense(pending, now) else self.sparse_interval)
+
+    def next_check(self, pending: PendingPayment, now: float, status: Optional[str]) -> float:
+        if self._dense(pending, now):
+            return now + self.dense_interval
+        if status != 'PENDING':
+            pending.backoff_step = 0
+            return now + self.sparse_interval
+        interval = min(self.max_interval, self.sparse_interval * self.backoff ** pending.backoff_step)
+        pending.backoff_step += 1
+        return now + interval
+
+
+POLICIES = {
+    FixedIntervalPolicy.name: FixedIntervalPolicy,
+    AdaptivePollingPolicy.name: AdaptivePollingPolicy
+}
+
+
+def create_polling_policy(name: str = PAYMENT_POLL_POLICY) -> PollingPolicy:
+    """Политика опроса по настройке PAYMENT_POLL_POLICY: adaptive или fixed"""
+    policy = POLICIES.get(name)
+    if policy is None:
+        raise ValueError(f"Неизвестная политика опроса платежей: {name}")
+    return policy()
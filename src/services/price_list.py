@@ -0,0 +1,146 @@
+"""
+Прайс-лист: цена по игре, консоли и позиции для подсказки суммы
+"""
+
+import asyncio
+import csv
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import PRICE_LIST_FILE, PRICE_LIST_SHEET, PRICE_LIST_TTL
+from models import validate_amount
+from services.executor import IntegrationExecutor, integration_executor
+from services.game_catalog import normalize
+from services.google_sheets import GoogleSheetsService, sheets_service
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд повторить загрузку после ошибки (не дожидаясь ttl)
+RETRY_INTERVAL = 60
+
+PriceKey = Tuple[str, str, str]
+
+
+class PriceList:
+    """
+    Цены в памяти по ключу (игра, консоль, позиция). Поиск цены не обращается
+    к источникам: если данные старше ttl, обновление запускается в фоне,
+    а до его завершения используются прежние цены.
+    """
+
+    def __init__(self, file_path: str = PRICE_LIST_FILE, sheet_title: str = PRICE_LIST_SHEET,
+                 ttl: float = PRICE_LIST_TTL,
+                 executor: IntegrationExecutor = integration_executor,
+                 service: GoogleSheetsService = sheets_service):
+        self.file_path = file_path
+        self.sheet_title = sheet_title
+        self.ttl = ttl
+        self.executor = executor
+        self.service = service
+        self._prices: Dict[PriceKey, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Время (monotonic), после которого данные считаются устаревшими
+        self._expires_at = 0.0
+        self.loaded_at = 0.0
+        self.skipped_rows = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.sheet_title)
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    @staticmethod
+    def _key(game: str, console: str, position: str) -> PriceKey:
+        return normalize(game), console.strip().casefold(), position.strip().casefold()
+
+    def price(self, game: Optional[str], console: Optional[str], position: Optional[str]) -> Optional[float]:
+        """Цена из текущих данных или None; устаревшие данные обновляются в фоне"""
+        if not self.enabled:
+            return None
+        self.refresh()
+        if not (game and console and position):
+            return None
+        return self._prices.get(self._key(game, console, position))
+
+    def refresh(self, force: bool = False) -> Optional[asyncio.Task]:
+        """Запустить фоновое обновление, если данные устарели (или force); не ждет его"""
+        if self._task is not None and not self._task.done():
+            return self._task
+        if not force and time.monotonic() < self._expires_at:
+            return None
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        self._task = loop.create_task(self._refresh(), name='price-list')
+        return self._task
+
+    async def _refresh(self):
+        try:
+            await self.reload()
+        except Exception as e:
+            self.last_error = str(e)
+            self._expires_at = time.monotonic() + min(self.ttl, RETRY_INTERVAL)
+            logger.error(f"Ошибка загрузки прайс-листа: {e}")
+
+    async def reload(self) -> int:
+        """Перечитать источники и заменить цены целиком; возвращает число цен"""
+        rows: List[Sequence] = []
+        if self.file_path:
+            rows.extend(await self.executor.run('sheets', self._read_file))
+        if self.sheet_title:
+            rows.extend(await self.executor.run('sheets', self._read_sheet))
+
+        prices, skipped = self._index(rows)
+        self._prices = prices
+        self.skipped_rows = skipped
+        self.last_error = None
+        self.loaded_at = time.time()
+        self._expires_at = time.monotonic() + self.ttl
+        logger.info(f"Прайс-лист загружен: {len(prices)} цен, пропущено строк: {skipped}")
+        return len(prices)
+
+    def _index(self, rows: Iterable[Sequence]) -> Tuple[Dict[PriceKey, float], int]:
+        """Строки (игра, консоль, позиция, цена) -> цены; строки с ошибками (и заголовок) пропускаются"""
+        prices: Dict[PriceKey, float] = {}
+        skipped = 0
+        for row in rows:
+            if len(row) < 4 or not all(str(cell).strip() for cell in row[:4]):
+                skipped += 1
+                continue
+            game, console, position, value = (str(cell) for cell in row[:4])
+            try:
+                amount = validate_amount(value.replace(' ', '').replace('\xa0', ''))
+            except ValueError:
+                skipped += 1
+                continue
+            prices[self._key(game, console, position)] = amount
+        return prices, skipped
+
+    def _read_file(self) -> List[List[str]]:
+        """Строки CSV-файла (разделитель ; , или табуляция; # - комментарий)"""
+        with open(self.file_path, encoding='utf-8-sig', newline='') as f:
+            lines = [line for line in f if line.strip() and not line.startswith('#')]
+        if not lines:
+            return []
+        # ";" - разделитель Excel в русской локали (цены с запятой: 1500,50)
+        delimiter = next((char for char in ';\t' if char in lines[0]), ',')
+        return list(csv.reader(lines, delimiter=delimiter))
+
+    def _read_sheet(self) -> List[List[str]]:
+        """Строки листа sheet_title (без заголовка)"""
+        return [row for _, row in self.service.iter_rows(self.sheet_title)]
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Общий прайс-лист процесса
+price_list = PriceList()
@@ -0,0 +1,330 @@
+"""
+Сверка статусов заказов с Antilopay.
+
+Заказы, созданные за последние часы и уже не отслеживаемые планировщиком,
+перепроверяются в Antilopay с ограничением частоты запросов. Оплата, пришедшая
+после окончания отслеживания, обрабатывается как обычная успешная оплата,
+недостающие строки оплаченных продаж дописываются в таблицу, а расхождения
+отправляются отчетом в чат менеджеров.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from aiogram import Bot
+
+from config import (
+    ADMIN_IDS,
+    MANAGER_CHAT_ID,
+    RECONCILE_CONCURRENCY,
+    RECONCILE_INTERVAL,
+    RECONCILE_RATE,
+    RECONCILE_WINDOW_HOURS
+)
+from metrics import registry
+from models import FreeSaleData, PendingPayment
+from services.antilopay import AntilopayAPI, antilopay_api
+from services.google_sheets import FREE_SALE_SHEET, PRODUCT_SALE_SHEET
+from services.payment_scheduler import PaymentScheduler
+from services.payment_store import PaymentStore
+from services.payment_tracker import FINAL_STATUSES
+from services.sales_outbox import SalesOutbox
+from services.telegram_outbound import TokenBucket, background_priority
+
+logger = logging.getLogger(__name__)
+
+# Ответ Antilopay при превышении лимита запросов: пауза и повтор
+RATE_LIMIT_CODE = 429
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BASE_DELAY = 2.0  # секунд, удваивается с каждым повтором
+# Сколько номеров заказов каждого вида выводится в отчете
+REPORT_LIMIT = 10
+
+RECONCILED = registry.counter(
+    'reconcile_orders_total', 'Заказы, перепроверенные сверкой с Antilopay, по результату', ('result',)
+)
+
+
+@dataclass
+class ReconcileReport:
+    """Итог сверки заказов за окно window_hours часов"""
+    window_hours: float
+    total: int = 0
+    checked: int = 0
+    # Еще отслеживаются планировщиком (проверит он сам)
+    skipped: int = 0
+    # Локальный статус исправлен на финальный неуспешный из Antilopay
+    corrected: int = 0
+    sheets_available: bool = True
+    # Оплачены после окончания отслеживания: продажа обработана сейчас
+    late_success: List[str] = field(default_factory=list)
+    # Оплачены, но строки в таблице не было: запись повторена
+    restored: List[str] = field(default_factory=list)
+    # Оплачены, нет в журнале записи, а таблица недоступна: не записаны, чтобы не задвоить
+    unverified: List[str] = field(default_factory=list)
+    # Оплачены по локальной базе, но не в Antilopay
+    mismatched: List[str] = field(default_factory=list)
+    # Статус получить не удалось
+    unchecked: List[str] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def discrepancies(self) -> int:
+        return (len(self.late_success) + len(self.restored) + len(self.unverified)
+                + len(self.mismatched) + len(self.unchecked))
+
+    def format(self) -> str:
+        lines = [
+            "🔎 <b>Сверка заказов с Antilopay</b>",
+            "━━━━━━━━━━━━━━━━",
+            f"🕰 <b>За {self.window_hours:g} ч:</b> проверено {self.checked} из {self.total} "
+            f"за {self.duration:.0f} с",
+            f"⏳ <b>Еще отслеживаются:</b> {self.skipped}",
+            f"🔧 <b>Исправлен статус неоплаченных:</b> {self.corrected}",
+        ]
+        if not self.sheets_available:
+            lines.append("⚠️ Таблица недоступна, наличие строк проверено только по журналу записи")
+
+        for title, order_ids in (
+            ("💙 Оплачены после окончания отслеживания (продажа записана)", self.late_success),
+            ("📝 Оплачены, но не было в таблице (запись повторена)", self.restored),
+            ("❓ Оплачены, запись в таблицу не проверена", self.unverified),
+            ("⚠️ Оплачены по базе бота, но не в Antilopay", self.mismatched),
+            ("❌ Не удалось проверить", self.unchecked),
+        ):
+            if not order_ids:
+                continue
+            lines.append(f"\n<b>{title}:</b> {len(order_ids)}")
+            lines.extend(f"• <code>{order_id}</code>" for order_id in order_ids[:REPORT_LIMIT])
+            if len(order_ids) > REPORT_LIMIT:
+                lines.append(f"… и еще {len(order_ids) - REPORT_LIMIT}")
+
+        if not self.discrepancies:
+            lines.append("\n✅ Расхождений нет")
+        return "\n".join(lines)
+
+
+class Reconciler:
+    """
+    Перепроверка статусов заказов за окно window_hours часов. Запросы к Antilopay
+    выполняются concurrency обработчиками не чаще rate в секунду; при ответе 429
+    все обработчики ждут паузу. Периодическая сверка - раз в interval секунд
+    (0 - только по команде).
+    """
+
+    def __init__(self, scheduler: PaymentScheduler, store: PaymentStore, outbox: SalesOutbox, bot: Bot,
+                 antilopay: AntilopayAPI = antilopay_api,
+                 interval: float = RECONCILE_INTERVAL,
+                 window_hours: float = RECONCILE_WINDOW_HOURS,
+                 concurrency: int = RECONCILE_CONCURRENCY,
+                 rate: float = RECONCILE_RATE):
+        self.scheduler = scheduler
+        self.tracker = scheduler.tracker
+        self.store = store
+        self.outbox = outbox
+        self.bot = bot
+        self.antilopay = antilopay
+        self.interval = interval
+        self.window_hours = window_hours
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self._bucket = TokenBucket(rate, self.concurrency)
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._manual: Optional[asyncio.Task] = None
+        self.last_report: Optional[ReconcileReport] = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked() or (self._manual is not None and not self._manual.done())
+
+    async def run(self, window_hours: Optional[float] = None) -> ReconcileReport:
+        """Одна сверка; одновременно выполняется не больше одной"""
+        async with self._lock:
+            report = await self._reconcile(window_hours or self.window_hours)
+        self.last_report = report
+        return report
+
+    def launch(self, chat_id: int, window_hours: Optional[float] = None) -> bool:
+        """
+        Сверка в фоне с отчетом в chat_id (команда /reconcile). Возвращает False,
+        если сверка уже выполняется.
+        """
+        if self.running:
+            return False
+        self._manual = asyncio.create_task(self._run_and_report([chat_id], window_hours), name='reconcile')
+        return True
+
+    def start(self):
+        """Периодическая сверка с отчетом о расхождениях в чат менеджеров"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name='reconciler')
+
+    async def stop(self):
+        tasks = [task for task in (self._task, self._manual) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = self._manual = None
+
+    async def _run(self):
+        while True:
+            # Первая сверка - через interval после запуска, когда планировщик уже восстановил очередь
+            await asyncio.sleep(self.interval)
+            await self._run_and_report(self._report_chats(), only_discrepancies=True)
+
+    async def _run_and_report(self, chat_ids: list, window_hours: Optional[float] = None,
+                              only_discrepancies: bool = False):
+        try:
+            report = await self.run(window_hours)
+        except Exception as e:
+            logger.error(f"Ошибка сверки заказов: {e}")
+            return
+        if only_discrepancies and not report.discrepancies:
+            return
+
+        # Отчет уступает очередь ответам в мастерах продаж
+        with background_priority():
+            for chat_id in chat_ids:
+                try:
+                    await self.bot.send_message(chat_id=chat_id, text=report.format(), parse_mode="HTML")
+                except Exception as e:
+                    logger.error(f"Не удалось отправить отчет сверки в чат {chat_id}: {e}")
+
+    @staticmethod
+    def _report_chats() -> list:
+        return [MANAGER_CHAT_ID] if MANAGER_CHAT_ID else list(ADMIN_IDS)
+
+    async def _reconcile(self, window_hours: float) -> ReconcileReport:
+        started = time.perf_counter()
+        now = time.time()
+        report = ReconcileReport(window_hours=window_hours)
+
+        orders = []
+        for pending, status in self.store.list_orders(now - window_hours * 3600, now):
+            report.total += 1
+            if self.scheduler.get(pending.order_id) is not None:
+                report.skipped += 1
+            else:
+                orders.append((pending, status))
+
+        if orders:
+            # Наличие строк проверяется по одному чтению каждого листа, а не поиском на каждый заказ
+            outbox_statuses = self.outbox.statuses([pending.order_id for pending, _ in orders])
+            sheet_ids = await self._sheet_order_ids()
+            report.sheets_available = sheet_ids is not None
+
+            # Общий итератор: каждый обработчик берет следующий заказ
+            queue = iter(orders)
+            await asyncio.gather(*(
+                self._worker(queue, report, outbox_statuses, sheet_ids)
+                for _ in range(min(self.concurrency, len(orders)))
+            ))
+
+        report.duration = time.perf_counter() - started
+        logger.info(
+            f"Сверка за {window_hours:g} ч: проверено {report.checked} из {report.total}, "
+            f"расхождений {report.discrepancies}, исправлено статусов {report.corrected}"
+        )
+        return report
+
+    async def _sheet_order_ids(self) -> Optional[Dict[str, Set[str]]]:
+        """Номера заказов в листах продаж; None, если таблица недоступна"""
+        try:
+            return {
+                sheet: await self.outbox.executor.run('sheets', self.outbox.service.order_ids, sheet)
+                for sheet in (FREE_SALE_SHEET, PRODUCT_SALE_SHEET)
+            }
+        except Exception as e:
+            logger.error(f"Сверка: не удалось прочитать таблицу продаж: {e}")
+            return None
+
+    async def _worker(self, queue, report: ReconcileReport, outbox_statuses: Dict[str, str],
+                      sheet_ids: Optional[Dict[str, Set[str]]]):
+        for pending, local_status in queue:
+            try:
+                result = await self._check(pending.order_id)
+                if not result.get("success"):
+                    report.unchecked.append(pending.order_id)
+                    RECONCILED.inc('unchecked')
+                    continue
+                report.checked += 1
+                outcome = await self._apply(pending, local_status, result, report, outbox_statuses, sheet_ids)
+                RECONCILED.inc(outcome)
+            except Exception as e:
+                logger.error(f"Сверка заказа {pending.order_id}: {e}")
+                report.unchecked.append(pending.order_id)
+                RECONCILED.inc('unchecked')
+
+    async def _check(self, order_id: str) -> dict:
+        """Запрос статуса в пределах лимита; при ответе 429 - пауза для всех обработчиков и повтор"""
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await self._acquire()
+            result = await self.antilopay.check_payment_status(order_id)
+            if result.get("success") or result.get("code") != RATE_LIMIT_CODE:
+                return result
+            delay = RATE_LIMIT_BASE_DELAY * 2 ** attempt
+            logger.warning(f"Сверка: лимит запросов Antilopay, пауза {delay:.0f} с")
+            self._bucket.pause(delay)
+        return result
+
+    async def _acquire(self):
+        # Между проверкой и взятием токена нет await, поэтому токен не достанется двоим
+        while (delay := self._bucket.delay()) > 0:
+            await asyncio.sleep(delay)
+        self._bucket.take()
+
+    async def _apply(self, pending: PendingPayment, local_status: str, result: dict, report: ReconcileReport,
+                     outbox_statuses: Dict[str, str], sheet_ids: Optional[Dict[str, Set[str]]]) -> str:
+        """Сравнение статусов заказа; возвращает вид результата для метрики"""
+        order_id = pending.order_id
+        remote_status = result.get("status")
+
+        if remote_status == "SUCCESS" and local_status != "SUCCESS":
+            # Оплачен после таймаута или отмены отслеживания: обычная обработка оплаты
+            self.store.set_status(order_id, "SUCCESS")
+            await self.tracker.handle_final_status(pending, result)
+            report.late_success.append(order_id)
+            return 'late_success'
+
+        if remote_status == "SUCCESS":
+            return await self._ensure_recorded(pending, result, report, outbox_statuses, sheet_ids)
+
+        if local_status == "SUCCESS":
+            report.mismatched.append(f"{order_id} ({remote_status})")
+            return 'mismatch'
+
+        if remote_status in FINAL_STATUSES and local_status != remote_status:
+            self.store.set_status(order_id, remote_status)
+            report.corrected += 1
+            return 'corrected'
+        return 'ok'
+
+    async def _ensure_recorded(self, pending: PendingPayment, result: dict, report: ReconcileReport,
+                               outbox_statuses: Dict[str, str], sheet_ids: Optional[Dict[str, Set[str]]]) -> str:
+        """Оплаченная продажа должна быть в таблице (или ждать дозаписи в журнале)"""
+        order_id = pending.order_id
+        outbox_status = outbox_statuses.get(order_id)
+        if outbox_status == 'PENDING':
+            # Дозапись уже запланирована
+            return 'ok'
+
+        sheet = FREE_SALE_SHEET if isinstance(pending.sale_data, FreeSaleData) else PRODUCT_SALE_SHEET
+        if sheet_ids is None:
+            if outbox_status is None:
+                report.unverified.append(order_id)
+                return 'unverified'
+            return 'ok'
+        if order_id in sheet_ids[sheet]:
+            return 'ok'
+
+        if outbox_status == 'DELIVERED':
+            # Строка была записана, но из листа пропала
+            self.outbox.requeue(order_id)
+        else:
+            await self.tracker.record_sale(order_id, pending.sale_data, result, pending.user_telegram_login)
+        report.restored.append(order_id)
+        return 'restored'
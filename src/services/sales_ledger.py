@@ -0,0 +1,186 @@
+"""
+Локальный журнал оплаченных продаж с накопительными итогами
+"""
+
+import logging
+import sqlite3
+import threading
+from datetime import datetime, date
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import DATABASE_FILE
+from services.google_sheets import GoogleSheetsService, FREE_SALE_SHEET, PRODUCT_SALE_SHEET
+
+logger = logging.getLogger(__name__)
+
+# Измерения, по которым ведутся итоги
+GROUP_FIELDS = ('day', 'sale_type', 'manager', 'console', 'position')
+
+# Порядок колонок в строках листов (как их формирует GoogleSheetsService.*_row)
+FREE_SALE_COLUMNS = {'amount': 3, 'manager': 4, 'timestamp': 5, 'order_id': 6}
+PRODUCT_SALE_COLUMNS = {'console': 1, 'position': 2, 'amount': 5, 'manager': 6, 'timestamp': 7, 'order_id': 8}
+
+
+def _parse_amount(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    cleaned = str(value).replace('₽', '').replace('\xa0', '').replace(' ', '').replace(',', '.')
+    return float(cleaned) if cleaned else 0.0
+
+
+class SalesLedger:
+    """
+    Журнал продаж в SQLite. Вместе с каждой продажей в той же транзакции
+    увеличиваются итоги по дню, типу продажи, менеджеру, консоли и позиции,
+    поэтому сводка не требует чтения таблицы и пересчета строк.
+    """
+
+    def __init__(self, db_file: str = DATABASE_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ledger_sales (
+                order_id TEXT PRIMARY KEY,
+                day TEXT NOT NULL,
+                sale_type TEXT NOT NULL,
+                manager TEXT NOT NULL,
+                console TEXT NOT NULL,
+                position TEXT NOT NULL,
+                amount REAL NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS ledger_totals (
+                day TEXT NOT NULL,
+                sale_type TEXT NOT NULL,
+                manager TEXT NOT NULL,
+                console TEXT NOT NULL,
+                position TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                amount REAL NOT NULL,
+                PRIMARY KEY (day, sale_type, manager, console, position)
+            );
+        """)
+
+    def record(self, order_id: str, sale_type: str, amount: float, timestamp: datetime,
+               manager: Optional[str] = None, console: str = '', position: str = '') -> bool:
+        """
+        Учесть продажу. Повторная запись того же order_id игнорируется.
+        Возвращает True, если продажа добавлена.
+        """
+        with self._lock:
+            return self._record(order_id, sale_type, amount, timestamp, manager, console, position)
+
+    def _record(self, order_id, sale_type, amount, timestamp, manager, console, position) -> bool:
+        key = (timestamp.date().isoformat(), sale_type, str(manager or ''), console or '', position or '')
+        self._conn.execute("BEGIN")
+        try:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO ledger_sales "
+                "(order_id, day, sale_type, manager, console, position, amount, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (order_id, *key, float(amount), timestamp.timestamp())
+            ).rowcount
+            if inserted:
+                self._conn.execute(
+                    "INSERT INTO ledger_totals (day, sale_type, manager, console, position, count, amount) "
+                    "VALUES (?, ?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT (day, sale_type, manager, console, position) "
+                    "DO UPDATE SET count = count + 1, amount = amount + excluded.amount",
+                    (*key, float(amount))
+                )
+            self._conn.execute("COMMIT")
+            return bool(inserted)
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def summary(self, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                group_by: Iterable[str] = ('sale_type',)) -> List[Dict[str, Any]]:
+        """
+        Итоги за период с группировкой по любым из GROUP_FIELDS.
+        Читает только строки итогов, число которых растет с числом дней, а не продаж.
+        """
+        group_by = [field for field in group_by if field in GROUP_FIELDS]
+        conditions, params = [], []
+        if date_from:
+            conditions.append("day >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            conditions.append("day <= ?")
+            params.append(date_to.isoformat())
+
+        columns = ", ".join(group_by)
+        query = (
+            f"SELECT {columns + ', ' if columns else ''}SUM(count), SUM(amount) FROM ledger_totals"
+            f"{' WHERE ' + ' AND '.join(conditions) if conditions else ''}"
+            f"{' GROUP BY ' + columns + ' ORDER BY ' + columns if columns else ''}"
+        )
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        result = []
+        for row in rows:
+            item = dict(zip(group_by, row))
+            item['count'] = row[-2] or 0
+            item['amount'] = row[-1] or 0.0
+            result.append(item)
+        return result
+
+    def get_sales_summary(self, date_from: Optional[datetime] = None) -> dict:
+        """
+        Сводка в формате GoogleSheetsService.get_sales_summary, но без обращения к API
+        """
+        summary = {
+            'free_sales_count': 0,
+            'free_sales_amount': 0.0,
+            'product_sales_count': 0,
+            'product_sales_amount': 0.0
+        }
+        day_from = date_from.date() if isinstance(date_from, datetime) else date_from
+        for item in self.summary(date_from=day_from):
+            prefix = 'free_sales' if item['sale_type'] == 'free_sale' else 'product_sales'
+            summary[f'{prefix}_count'] += item['count']
+            summary[f'{prefix}_amount'] += item['amount']
+        return summary
+
+    def backfill(self, service: GoogleSheetsService, page_size: int = 500) -> Dict[str, int]:
+        """
+        Перенос уже записанных в таблицу продаж в журнал.
+        Строки читаются страницами по page_size; уже учтенные заказы пропускаются,
+        поэтому перенос можно безопасно повторять.
+        """
+        result = {}
+        for title, sale_type, columns in (
+            (FREE_SALE_SHEET, 'free_sale', FREE_SALE_COLUMNS),
+            (PRODUCT_SALE_SHEET, 'our_product', PRODUCT_SALE_COLUMNS),
+        ):
+            added = 0
+            for row_number, row in service.iter_rows(title, page_size=page_size):
+                try:
+                    added += self._backfill_row(title, sale_type, columns, row_number, row)
+                except (ValueError, IndexError) as e:
+                    logger.warning(f"Строка {row_number} листа {title} пропущена: {e}")
+            result[title] = added
+            logger.info(f"Перенесено продаж из листа {title}: {added}")
+        return result
+
+    def _backfill_row(self, title: str, sale_type: str, columns: Dict[str, int],
+                      row_number: int, row: List[Any]) -> bool:
+        def cell(name: str) -> str:
+            index = columns.get(name)
+            return row[index] if index is not None and index < len(row) else ''
+
+        timestamp = datetime.strptime(str(cell('timestamp')), '%d.%m.%Y %H:%M:%S')
+        # Строки, внесенные вручную без номера заказа, учитываются по номеру строки
+        order_id = str(cell('order_id')) or f"{title}:{row_number}"
+        with self._lock:
+            return self._record(
+                order_id, sale_type, _parse_amount(cell('amount')), timestamp,
+                cell('manager'), cell('console'), cell('position')
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,252 @@
+"""
+Локальный журнал оплаченных продаж для гарантированной записи в Google Sheets
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import (
+    DATABASE_FILE,
+    OUTBOX_RETRY_BASE_DELAY,
+    OUTBOX_RETRY_MAX_DELAY,
+    OUTBOX_POLL_INTERVAL
+)
+from services.executor import IntegrationExecutor, integration_executor
+from services.google_sheets import (
+    GoogleSheetsService,
+    SheetsWriteQueue,
+    SHEET_HEADERS,
+    FREE_SALE_SHEET,
+    PRODUCT_SALE_SHEET,
+    sheets_service,
+    sheets_write_queue
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SalesOutbox:
+    """
+    Каждая оплаченная продажа сначала сохраняется в SQLite (ключ - order_id),
+    затем отправляется в таблицу. Неудачные записи повторяет фоновый процесс
+    с экспоненциальной задержкой. Перед повторной попыткой строка ищется
+    в листе по номеру заказа, поэтому одна продажа не попадет в таблицу дважды.
+    """
+
+    def __init__(self, db_file: str = DATABASE_FILE,
+                 service: GoogleSheetsService = sheets_service,
+                 queue: SheetsWriteQueue = sheets_write_queue,
+                 executor: IntegrationExecutor = integration_executor):
+        self.service = service
+        self.queue = queue
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sales_outbox (
+                order_id TEXT PRIMARY KEY,
+                sheet TEXT NOT NULL,
+                row_data TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'PENDING',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                delivered_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sales_outbox_due ON sales_outbox (status, next_attempt_at);
+        """)
+        # Записи, которые выполняются прямо сейчас: повторный вызов ждет их результат
+        self._in_progress: Dict[str, asyncio.Task] = {}
+        self._worker: Optional[asyncio.Task] = None
+
+    async def add_free_sale_record(self, **kwargs) -> bool:
+        """Сохранить свободную продажу и записать ее в таблицу"""
+        row = self.service.free_sale_row(**kwargs)
+        return await self.submit(str(kwargs['order_id']), FREE_SALE_SHEET, row)
+
+    async def add_product_sale_record(self, **kwargs) -> bool:
+        """Сохранить продажу товара и записать ее в таблицу"""
+        row = self.service.product_sale_row(**kwargs)
+        return await self.submit(str(kwargs['order_id']), PRODUCT_SALE_SHEET, row)
+
+    async def submit(self, order_id: str, sheet: str, row: List[Any]) -> bool:
+        """
+        Сохранить продажу в журнале и сразу попытаться записать в таблицу.
+        Возвращает True, если строка записана в таблицу.
+        """
+        now = time.time()
+        with self._lock:
+            # Повторная продажа с тем же order_id игнорируется
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sales_outbox (order_id, sheet, row_data, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (order_id, sheet, json.dumps(row, ensure_ascii=False), now + OUTBOX_RETRY_BASE_DELAY, now)
+            )
+            status = self._conn.execute(
+                "SELECT status FROM sales_outbox WHERE order_id = ?", (order_id,)
+            ).fetchone()[0]
+
+        if status == 'DELIVERED':
+            logger.info(f"Заказ {order_id} уже записан в таблицу")
+            return True
+        return await self._deliver(order_id, sheet, row, check_existing=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Размер очереди на запись и самая старая незаписанная продажа"""
+        with self._lock:
+            pending, oldest = self._conn.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM sales_outbox WHERE status = 'PENDING'"
+            ).fetchone()
+            delivered = self._conn.execute(
+                "SELECT COUNT(*) FROM sales_outbox WHERE status = 'DELIVERED'"
+            ).fetchone()[0]
+        return {
+            'pending': pending,
+            'delivered': delivered,
+            'oldest_pending_age': time.time() - oldest if oldest else 0.0
+        }
+
+    def list_pending(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Незаписанные продажи, начиная с самых старых"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT order_id, sheet, attempts, next_attempt_at, last_error, created_at "
+                "FROM sales_outbox WHERE status = 'PENDING' ORDER BY created_at LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {
+                'order_id': row[0],
+                'sheet': row[1],
+                'attempts': row[2],
+                'next_attempt_at': row[3],
+                'last_error': row[4],
+                'created_at': row[5]
+            }
+            for row in rows
+        ]
+
+    def statuses(self, order_ids: List[str]) -> Dict[str, str]:
+        """Статусы записи (PENDING/DELIVERED) для заказов из order_ids, известных журналу"""
+        result: Dict[str, str] = {}
+        with self._lock:
+            # Параметры SQLite ограничены, поэтому запрашиваем частями
+            for start in range(0, len(order_ids), 500):
+                chunk = order_ids[start:start + 500]
+                result.update(self._conn.execute(
+                    f"SELECT order_id, status FROM sales_outbox WHERE order_id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+        return result
+
+    def requeue(self, order_id: str) -> bool:
+        """
+        Повторить запись продажи, отмеченной записанной (строки нет в листе).
+        Фоновый процесс перед записью еще раз ищет строку по номеру заказа
+        """
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE sales_outbox SET status = 'PENDING', next_attempt_at = ?, delivered_at = NULL "
+                "WHERE order_id = ? AND status = 'DELIVERED'",
+                (time.time(), order_id)
+            ).rowcount
+        return bool(updated)
+
+    def start(self):
+        """Запуск фоновой дозаписи"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run(), name='sales-outbox')
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        # Незавершенные записи остаются PENDING и проверяются по листу после запуска
+        deliveries = list(self._in_progress.values())
+        for delivery in deliveries:
+            delivery.cancel()
+        await asyncio.gather(*deliveries, return_exceptions=True)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    async def _deliver(self, order_id: str, sheet: str, row: List[Any], check_existing: bool) -> bool:
+        """Запись продажи в таблицу; если она уже выполняется, ждем ее результат"""
+        delivery = self._in_progress.get(order_id)
+        if delivery is None:
+            delivery = self._in_progress[order_id] = asyncio.create_task(
+                self._write(order_id, sheet, row, check_existing), name=f'outbox-{order_id}'
+            )
+            delivery.add_done_callback(lambda _: self._in_progress.pop(order_id, None))
+        # Отмена одного из ожидающих не отменяет запись для остальных
+        return await asyncio.shield(delivery)
+
+    async def _write(self, order_id: str, sheet: str, row: List[Any], check_existing: bool) -> bool:
+        error = None
+        try:
+            # При повторе проверяем, не дошла ли строка в прошлый раз
+            if check_existing and await self.executor.run(
+                'sheets', self.service.order_exists, sheet, order_id, row.index(order_id) + 1
+            ):
+                logger.info(f"Заказ {order_id} уже есть в листе {sheet}, повтор не нужен")
+                success = True
+            else:
+                success = await self.queue.enqueue(sheet, SHEET_HEADERS[sheet], row)
+        except Exception as e:
+            error = str(e)
+            success = False
+
+        if success:
+            self._mark_delivered(order_id)
+        else:
+            self._mark_failed(order_id, error or 'Ошибка записи в таблицу')
+        return success
+
+    def _mark_delivered(self, order_id: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sales_outbox SET status = 'DELIVERED', delivered_at = ? WHERE order_id = ?",
+                (time.time(), order_id)
+            )
+
+    def _mark_failed(self, order_id: str, error: str):
+        with self._lock:
+            attempts = self._conn.execute(
+                "SELECT attempts FROM sales_outbox WHERE order_id = ?", (order_id,)
+            ).fetchone()[0] + 1
+            delay = min(OUTBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_DELAY)
+            self._conn.execute(
+                "UPDATE sales_outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE order_id = ?",
+                (attempts, time.time() + delay, error, order_id)
+            )
+        logger.warning(f"Продажа {order_id} не записана в таблицу (попытка {attempts}), повтор через {delay:.0f} с")
+
+    def _due(self, limit: int = 50) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT order_id, sheet, row_data FROM sales_outbox "
+                "WHERE status = 'PENDING' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (time.time(), limit)
+            ).fetchall()
+
+    async def _run(self):
+        while True:
+            try:
+                # Повторы одного прохода уходят в таблицу общим пакетом
+                await asyncio.gather(*(
+                    self._deliver(order_id, sheet, json.loads(row_data), check_existing=True)
+                    for order_id, sheet, row_data in self._due()
+                ))
+            except Exception as e:
+                logger.error(f"Ошибка фоновой дозаписи продаж: {e}")
+            await asyncio.sleep(OUTBOX_POLL_INTERVAL)
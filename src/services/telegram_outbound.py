@@ -0,0 +1,179 @@
+"""
+Планировщик исходящих запросов к Telegram с учетом ограничений на частоту
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import DeleteMessage, Response, SendChatAction, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from config import (
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_CHAT_BURST,
+    TELEGRAM_RETRY_AFTER_ATTEMPTS
+)
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: меньше - раньше
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar('telegram_outbound_priority',
+                                                               default=PRIORITY_INTERACTIVE)
+
+# Запросы, которые не расходуют лимит на отправку сообщений
+UNTHROTTLED_METHODS = (DeleteMessage, SendChatAction)
+
+
+@contextmanager
+def background_priority():
+    """Запросы внутри блока пропускают вперед ответы в мастерах продаж"""
+    token = _priority.set(PRIORITY_BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # До этого момента запросы не отправляются (ответ RetryAfter)
+        self.paused_until = 0.0
+        # Запросы в один чат уходят в порядке поступления
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Через сколько секунд будет доступен токен"""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(self.paused_until - now, 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    @property
+    def idle(self) -> bool:
+        return not self.lock.locked() and self.delay() == 0 and self.tokens >= self.capacity
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: все запросы к Telegram проходят через общее ведро
+    токенов и ведро своего чата. Ожидающие общего лимита запросы отправляются
+    по приоритету: ответы в мастерах продаж раньше фоновых уведомлений.
+    При ответе RetryAfter на паузу ставятся и чат, и общее ведро: по ответу
+    нельзя понять, какой лимит превышен, а остальные запросы бота только
+    продлили бы ограничение. После паузы запрос повторяется.
+    """
+
+    def __init__(self, global_rate: float = TELEGRAM_GLOBAL_RATE, chat_rate: float = TELEGRAM_CHAT_RATE,
+                 chat_burst: int = TELEGRAM_CHAT_BURST, retry_attempts: int = TELEGRAM_RETRY_AFTER_ATTEMPTS):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.retry_attempts = retry_attempts
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        # Очередь ожидающих общего лимита: (приоритет, порядок, future)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        self.retry_after_count = 0
+
+    def setup(self, bot: Bot):
+        """Подключение к сессии бота"""
+        bot.session.middleware(self)
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType], bot: Bot,
+                       method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None or isinstance(method, UNTHROTTLED_METHODS):
+            return await make_request(bot, method)
+
+        priority = _priority.get()
+        for attempt in range(self.retry_attempts + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after_count += 1
+                if attempt >= self.retry_attempts:
+                    raise
+                logger.warning(f"Telegram просит подождать {e.retry_after} с ({type(method).__name__}, "
+                               f"чат {chat_id}), попытка {attempt + 1}")
+                self._chat_bucket(chat_id).pause(e.retry_after)
+                self._global.pause(e.retry_after)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'waiting': len(self._waiters),
+            'chats': len(self._chats),
+            'retry_after': self.retry_after_count
+        }
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= 1000:
+                # Забываем чаты, которые давно ничего не отправляли
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _acquire(self, chat_id, priority: int):
+        bucket = self._chat_bucket(chat_id)
+        async with bucket.lock:
+            while (delay := bucket.delay()) > 0:
+                await asyncio.sleep(delay)
+            bucket.take()
+
+        if not self._waiters and self._global.delay() == 0:
+            self._global.take()
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump(), name='telegram-outbound')
+        await future
+
+    async def _run_pump(self):
+        """Раздача общего лимита ожидающим запросам в порядке приоритета"""
+        while self._waiters:
+            delay = self._global.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._global.take()
+            future.set_result(None)
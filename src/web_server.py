@@ -0,0 +1,42 @@
+import logging
+import secrets
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import WEB_SERVER_HOST, WEB_SERVER_PORT, TELEGRAM_WEBHOOK_PATH, TELEGRAM_WEBHOOK_SECRET
+
+
+async def start_web_server(app: web.Application, host: str = WEB_SERVER_HOST,
+                           port: int = WEB_SERVER_PORT) -> web.AppRunner:
+    """Запуск встроенного HTTP-сервера в текущем event loop"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"HTTP-сервер запущен на {host}:{port}")
+    return runner
+
+
+def setup_telegram_webhook(app: web.Application, dispatcher: Dispatcher, bot: Bot,
+                           path: str = TELEGRAM_WEBHOOK_PATH,
+                           secret_token: str = TELEGRAM_WEBHOOK_SECRET) -> str:
+    """
+    Прием обновлений Telegram на общем HTTP-сервере.
+    Telegram сразу получает ответ 200, обновление обрабатывается в фоне.
+    Запросы без верного X-Telegram-Bot-Api-Secret-Token отклоняются.
+    Возвращает секрет, который нужно передать в setWebhook.
+    """
+    if not secret_token:
+        # Без заданного секрета генерируем свой на каждый запуск
+        secret_token = secrets.token_urlsafe(32)
+        logging.warning("TELEGRAM_WEBHOOK_SECRET не задан, используется случайный секрет")
+
+    SimpleRequestHandler(
+        dispatcher=dispatcher,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=secret_token
+    ).register(app, path=path)
+    # Запуск и остановка диспетчера вместе с приложением
+    setup_application(app, dispatcher, bot=bot)
+    return secret_token
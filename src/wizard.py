@@ -0,0 +1,540 @@
+"""
+Декларативные мастера продаж.
+
+Шаги, проверки ввода, подсказки и переходы назад описываются данными (Step),
+а SaleWizard создает по ним роутер aiogram. На каждом шаге данные FSM
+читаются один раз и записываются вместе с новым состоянием одной записью,
+а удаление сообщения пользователя выполняется одновременно с редактированием
+сообщения бота. Введенные пользователем значения экранируются для HTML.
+"""
+
+import asyncio
+import contextlib
+import html
+import logging
+import traceback
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
+
+from keyboards import (
+    get_amount_keyboard,
+    get_back_to_main_after_sale_keyboard,
+    get_back_to_main_keyboard,
+    get_confirmation_keyboard,
+    get_final_confirmation_keyboard,
+    get_payment_method_keyboard,
+    get_suggestion_keyboard
+)
+from config import PAYMENT_IDEMPOTENCY_TTL
+from models import validate_amount
+from services.antilopay import antilopay_api
+from services.idempotency import IdempotentCalls
+from services.payment_scheduler import PaymentScheduler
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "━━━━━━━━━━━━━━━━"
+
+# Коды способов оплаты Antilopay и их названия для сообщений
+PAYMENT_METHODS = {
+    "CARD_RU": "💳 Банковская карта",
+    "SBER_PAY": "🟢 SberPay",
+    "SBP": "⚡ СБП"
+}
+
+MAIN_MENU_TEXT = (
+    "🧑🏿‍🦽‍➡️ <b>Hello PS Store x Antilopay</b>\n\n"
+    "Выберите тип продажи:"
+)
+
+SUGGESTIONS_PROMPT = (
+    "🔎 <b>Похожие варианты</b>\n\n"
+    "Выберите вариант из списка или оставьте введенный:"
+)
+# Ключ данных FSM с вариантами, предложенными на текущем шаге (введенный текст первым)
+SUGGESTIONS_KEY = "_suggestions"
+
+# Ключ данных FSM с идентификатором сессии мастера (ключ однократного создания платежа)
+SESSION_KEY = "session_id"
+
+# Создание платежа по ключу (пользователь, сессия мастера): повторные нажатия
+# "Получить ссылку" не создают второй заказ и второе отслеживание
+payment_requests = IdempotentCalls(
+    'payment', PAYMENT_IDEMPOTENCY_TTL,
+    # Неудачная попытка не запоминается: после ошибки API менеджер может повторить
+    cache_result=lambda result: bool(result and result.get("success"))
+)
+
+# Экраны после шагов ввода, на которые ведут кнопки back_to_<экран>
+CONFIRMATION = "confirmation"
+PAYMENT_METHOD = "payment_method"
+
+Keyboard = Callable[[Dict[str, Any]], InlineKeyboardMarkup]
+
+
+async def _save_step(state: FSMContext, next_state: State, data: Dict[str, Any]):
+    """Новое состояние и данные мастера одной записью, если хранилище это умеет"""
+    set_state_and_data = getattr(state.storage, 'set_state_and_data', None)
+    if set_state_and_data is not None:
+        await set_state_and_data(state.key, next_state, data)
+    else:
+        await state.set_state(next_state)
+        await state.set_data(data)
+
+
+@dataclass(frozen=True)
+class Step:
+    """
+    Шаг мастера. name - ключ в данных FSM и суффикс кнопки back_to_<name>.
+    Шаг с choice_prefix ждет нажатия кнопки с таким префиксом callback_data,
+    остальные шаги ждут текстовое сообщение
+    """
+    name: str
+    state: State
+    prompt: str
+    keyboard: Keyboard
+    choice_prefix: Optional[str] = None
+    # Преобразование ввода; ValueError показывает error_prompt ({error} - текст ошибки)
+    parse: Optional[Callable[[str], Any]] = None
+    error_prompt: Optional[str] = None
+    # Подсказка при возврате к шагу кнопкой "Изменить" на экране подтверждения
+    edit_prompt: Optional[str] = None
+    # Варианты для введенного текста (например, из каталога игр); точное совпадение
+    # заменяет ввод каноническим написанием, иначе варианты предлагаются кнопками
+    suggest: Optional[Callable[[str], List[str]]] = None
+    inline_search: bool = False
+    # Значение по данным предыдущих шагов (например, цена из прайс-листа); клавиатура
+    # шага показывает его кнопкой preset_<значение>, ввод текста по-прежнему принимается
+    preset: Optional[Callable[[Dict[str, Any]], Optional[Any]]] = None
+
+
+def amount_step(state: State, back_callback: str,
+                preset: Optional[Callable[[Dict[str, Any]], Optional[float]]] = None) -> Step:
+    """Общий для всех мастеров шаг ввода суммы; preset - подсказка цены"""
+    return Step(
+        name="amount",
+        state=state,
+        prompt="💰 <b>Сумма</b>\n\nВведите сумму:",
+        keyboard=lambda data: get_amount_keyboard(back_callback, preset(data) if preset else None),
+        parse=validate_amount,
+        error_prompt=(
+            "❌ <b>Ошибка:</b> {error}\n\n"
+            "💰 Введите корректную сумму (например: 1000 или 1500.50):"
+        ),
+        edit_prompt="💰 <b>Редактирование данных</b>\n\nВведите сумму:",
+        preset=preset
+    )
+
+
+class SaleWizard:
+    """
+    Мастер продажи: шаги ввода, подтверждение, выбор способа оплаты
+    и создание платежа. Данные продажи собираются в FSM под именами шагов
+    и передаются в model вместе с user_id и username.
+
+    states должен содержать confirmation, payment_method_selection
+    и final_confirmation; сумма всегда вводится на шаге "amount".
+    """
+
+    def __init__(self, name: str, states: Type[StatesGroup], steps: Sequence[Step],
+                 summary: Sequence[Tuple[str, str]], model: type, product_field: str, client_field: str,
+                 menu_after_error: bool = False):
+        self.name = name
+        self.states = states
+        self.steps = list(steps)
+        self.summary = list(summary)
+        self.model = model
+        self.product_field = product_field
+        self.client_field = client_field
+        self.menu_after_error = menu_after_error
+        self._steps: Dict[str, Step] = {step.name: step for step in self.steps}
+        self._by_state: Dict[str, Step] = {step.state.state: step for step in self.steps}
+        self._next: Dict[str, Optional[Step]] = {
+            step.name: following for step, following in zip(self.steps, self.steps[1:] + [None])
+        }
+        self.router = Router(name=name)
+        self._register()
+
+    def _register(self):
+        callbacks = self.router.callback_query
+        callbacks.register(self.start, F.data == self.name)
+        self.router.message.register(
+            self.on_input, StateFilter(*[step.state for step in self.steps if step.choice_prefix is None])
+        )
+        for step in self.steps:
+            if step.choice_prefix is not None:
+                callbacks.register(self.on_choice, F.data.startswith(step.choice_prefix), StateFilter(step.state))
+        suggest_states = [step.state for step in self.steps if step.suggest is not None]
+        if suggest_states:
+            callbacks.register(self.on_suggestion, F.data.startswith("suggest_"), StateFilter(*suggest_states))
+        preset_states = [step.state for step in self.steps if step.preset is not None]
+        if preset_states:
+            callbacks.register(self.on_preset, F.data.startswith("preset_"), StateFilter(*preset_states))
+        back_targets = [*self._steps, CONFIRMATION, PAYMENT_METHOD]
+        callbacks.register(
+            self.on_back, F.data.in_({f"back_to_{target}" for target in back_targets}), StateFilter(self.states)
+        )
+        callbacks.register(self.on_confirm, F.data == "confirm", StateFilter(self.states.confirmation))
+        callbacks.register(self.on_edit, F.data == "edit", StateFilter(self.states.confirmation))
+        callbacks.register(
+            self.on_payment_method, F.data.startswith("payment_"), StateFilter(self.states.payment_method_selection)
+        )
+        callbacks.register(
+            self.create_payment, F.data == "get_payment_link", StateFilter(self.states.final_confirmation)
+        )
+
+    # Тексты экранов
+
+    def _summary(self, data: Dict[str, Any], *extra: str) -> str:
+        lines = [f"{label} {html.escape(str(data[key]))}" for key, label in self.summary]
+        lines.append(f"💰 <b>Сумма:</b> {data['amount']:.2f} ₽")
+        lines.extend(extra)
+        return "\n\n".join(lines)
+
+    def _screen(self, target: str, data: Dict[str, Any]) -> Tuple[State, str, InlineKeyboardMarkup]:
+        """Состояние, текст и клавиатура шага или экрана target"""
+        if target == CONFIRMATION:
+            text = f"✅ <b>Проверьте данные:</b>\n{SEPARATOR}\n{self._summary(data)}\n"
+            return self.states.confirmation, text, get_confirmation_keyboard()
+        if target == PAYMENT_METHOD:
+            text = (
+                f"✅ <b>Данные подтверждены!</b>\n{SEPARATOR}\n{self._summary(data)}\n"
+                f"{SEPARATOR}\n"
+                "💲 <b>Выберите способ оплаты:</b>"
+            )
+            return self.states.payment_method_selection, text, get_payment_method_keyboard()
+        step = self._steps[target]
+        return step.state, step.prompt, step.keyboard(data)
+
+    def _after(self, step: Step, data: Dict[str, Any]) -> Tuple[State, str, InlineKeyboardMarkup]:
+        following = self._next[step.name]
+        return self._screen(following.name if following else CONFIRMATION, data)
+
+    # Обработчики
+
+    async def start(self, callback: CallbackQuery, state: FSMContext):
+        """Начало мастера из главного меню"""
+        first = self.steps[0]
+        # Сохраняем message_id для последующего редактирования
+        await _save_step(state, first.state, {'bot_message_id': callback.message.message_id, SESSION_KEY: str(uuid.uuid4())})
+        await self._edit(callback, first.prompt, first.keyboard({}))
+
+    async def on_input(self, message: Message, state: FSMContext, raw_state: Optional[str]):
+        """Текстовый ввод на шаге мастера"""
+        step = self._by_state[raw_state]
+        data = await state.get_data()
+        try:
+            value = step.parse(message.text or "") if step.parse else message.text
+        except ValueError as e:
+            # Остаемся на шаге: ни состояние, ни данные не меняются
+            error_prompt = step.error_prompt.format(error=html.escape(str(e)))
+            if await self._replace(message, data, error_prompt, step.keyboard(data)):
+                await state.set_data(data)
+            return
+
+        data.pop(SUGGESTIONS_KEY, None)
+        if step.suggest is not None and value:
+            options = step.suggest(value)
+            typed = ' '.join(value.split()).casefold()
+            exact = next((option for option in options if option.casefold() == typed), None)
+            if exact is not None:
+                value = exact
+            elif options:
+                # Остаемся на шаге и предлагаем варианты кнопками
+                data[SUGGESTIONS_KEY] = [value, *options]
+                markup = get_suggestion_keyboard(options, value, step.inline_search)
+                await self._replace(message, data, SUGGESTIONS_PROMPT, markup)
+                await state.set_data(data)
+                return
+
+        data[step.name] = value
+        next_state, text, markup = self._after(step, data)
+        await _save_step(state, next_state, data)
+        if await self._replace(message, data, text, markup):
+            await state.set_data(data)
+
+    async def on_choice(self, callback: CallbackQuery, state: FSMContext, raw_state: Optional[str]):
+        """Выбор кнопкой на шаге мастера"""
+        step = self._by_state[raw_state]
+        value = callback.data[len(step.choice_prefix):]
+        data = await state.get_data()
+        data[step.name] = step.parse(value) if step.parse else value
+        next_state, text, markup = self._after(step, data)
+        await _save_step(state, next_state, data)
+        await self._edit(callback, text, markup)
+
+    async def on_suggestion(self, callback: CallbackQuery, state: FSMContext, raw_state: Optional[str]):
+        """Выбор предложенного варианта (suggest_0 - оставить введенный текст)"""
+        step = self._by_state[raw_state]
+        data = await state.get_data()
+        options = data.pop(SUGGESTIONS_KEY, None) or []
+        index = int(callback.data[len("suggest_"):]) if callback.data[len("suggest_"):].isdigit() else -1
+        if not 0 <= index < len(options):
+            await callback.answer("Варианты устарели, введите значение еще раз")
+            return
+
+        data[step.name] = options[index]
+        next_state, text, markup = self._after(step, data)
+        await _save_step(state, next_state, data)
+        await self._edit(callback, text, markup)
+
+    async def on_preset(self, callback: CallbackQuery, state: FSMContext, raw_state: Optional[str]):
+        """Нажатие кнопки с предложенным значением: как ввод этого значения текстом"""
+        step = self._by_state[raw_state]
+        raw_value = callback.data[len("preset_"):]
+        try:
+            value = step.parse(raw_value) if step.parse else raw_value
+        except ValueError:
+            await callback.answer("Значение устарело, введите его вручную")
+            return
+
+        data = await state.get_data()
+        data[step.name] = value
+        next_state, text, markup = self._after(step, data)
+        await _save_step(state, next_state, data)
+        await self._edit(callback, text, markup)
+
+    async def on_back(self, callback: CallbackQuery, state: FSMContext):
+        """Возврат к шагу или экрану по кнопке back_to_<цель>"""
+        data = await state.get_data()
+        next_state, text, markup = self._screen(callback.data[len("back_to_"):], data)
+        await state.set_state(next_state)
+        await self._edit(callback, text, markup)
+
+    async def on_confirm(self, callback: CallbackQuery, state: FSMContext):
+        """Подтверждение данных и переход к выбору способа оплаты"""
+        data = await state.get_data()
+        try:
+            data['amount'] = float(data['amount'])
+        except (ValueError, KeyError):
+            await callback.message.edit_text(
+                "❌ Ошибка в данных. Начните заново.",
+                reply_markup=get_back_to_main_keyboard()
+            )
+            await state.clear()
+            return
+
+        next_state, text, markup = self._screen(PAYMENT_METHOD, data)
+        await state.set_state(next_state)
+        await self._edit(callback, text, markup)
+
+    async def on_edit(self, callback: CallbackQuery, state: FSMContext):
+        """Возврат к последнему шагу (сумме) для исправления данных"""
+        step = self.steps[-1]
+        data = await state.get_data()
+        await state.set_state(step.state)
+        await self._edit(callback, step.edit_prompt or step.prompt, step.keyboard(data))
+
+    async def on_payment_method(self, callback: CallbackQuery, state: FSMContext):
+        """Выбор способа оплаты и переход к финальному подтверждению"""
+        payment_method = callback.data.replace("payment_", "")
+        data = await state.get_data()
+        data['payment_method'] = payment_method
+        await _save_step(state, self.states.final_confirmation, data)
+
+        payment_display = PAYMENT_METHODS.get(payment_method, payment_method)
+        text = (
+            f"💲 <b>Способ оплаты подтвержден!</b>\n{SEPARATOR}\n"
+            f"{self._summary(data, f'💲 <b>Способ оплаты:</b> {payment_display}')}\n"
+            f"{SEPARATOR}\n"
+            "🔗 <b>Получите ссылку на оплату</b>"
+        )
+        await self._edit(callback, text, get_final_confirmation_keyboard())
+
+    async def create_payment(self, callback: CallbackQuery, state: FSMContext,
+                             payment_scheduler: PaymentScheduler):
+        """Создание платежа и получение ссылки на оплату"""
+        data = await state.get_data()
+
+        try:
+            sale_data = self.model(
+                **{step.name: data[step.name] for step in self.steps},
+                user_id=callback.from_user.id,
+                username=callback.from_user.username
+            )
+
+            # Запрос к Antilopay уходит до первого await: одновременное второе
+            # нажатие уже видит его и не создает второй платеж
+            payment_method = data.get('payment_method')
+            payment, created = payment_requests.start(
+                self._payment_key(callback, data),
+                lambda: antilopay_api.create_payment(
+                    amount=sale_data.amount,
+                    product_name=getattr(sale_data, self.product_field),
+                    client_login=getattr(sale_data, self.client_field),
+                    description="Продажа товара",
+                    prefer_methods=[payment_method] if payment_method else None
+                )
+            )
+            if not created:
+                await self._answer_duplicate(callback, payment)
+                return
+
+            # Показываем сообщение о создании платежа (заменяем текущее). Платеж уже
+            # создается: ошибка интерфейса (устаревшее нажатие, то же сообщение)
+            # не должна помешать поставить его на отслеживание
+            with contextlib.suppress(TelegramBadRequest):
+                await asyncio.gather(
+                    callback.message.edit_text(
+                        "⏳ <b>Создание платежа...</b>\n\nПожалуйста, подождите.",
+                        parse_mode="HTML"
+                    ).emit(callback.bot),
+                    callback.answer().emit(callback.bot)
+                )
+
+            payment_result = await asyncio.shield(payment)
+
+            if payment_result and payment_result.get("success"):
+                payment_url = payment_result.get("payment_url")
+                payment_id = payment_result.get("payment_id")
+                order_id = payment_result.get("order_id")
+                payment_display = PAYMENT_METHODS.get(payment_method, payment_method)
+
+                # Ставим платеж в очередь отслеживания до сообщений: их ошибка не должна оставить
+                # созданный платеж без отслеживания
+                payment_scheduler.register(
+                    order_id=order_id,
+                    payment_id=payment_id,
+                    sale_data=sale_data,
+                    chat_id=callback.message.chat.id,
+                    payment_display=payment_display,
+                    user_telegram_login=callback.from_user.username
+                )
+
+                success_text = (
+                    f"✅ <b>Платеж успешно создан!</b>\n{SEPARATOR}\n"
+                    + self._summary(
+                        data,
+                        f"💲 <b>Способ оплаты:</b> {payment_display}",
+                        f"🆔 <b>Номер заказа:</b> <code>{order_id}</code>",
+                        f"🆔 <b>Идентификатор платежа:</b> <code>{payment_id}</code>"
+                    )
+                    + f"\n{SEPARATOR}\n"
+                    f"🔗 <b>Ссылка на оплату:</b>\n{payment_url}\n\n"
+                    "📤 Ссылка готова для отправки клиенту\n\n"
+                    "⏳ Оплату необходимо произвести в течение 10 минут"
+                )
+
+                # Удаляем сообщение "Создание платежа..." и создаем НОВОЕ сообщение об успехе
+                await self._delete(callback.message)
+                await callback.bot.send_message(
+                    chat_id=callback.message.chat.id,
+                    text=success_text,
+                    reply_markup=get_back_to_main_after_sale_keyboard(),
+                    parse_mode="HTML",
+                    disable_web_page_preview=True
+                )
+
+
+                logger.info(f"Создан платеж {payment_id} (Order: {order_id}, {self.name}) "
+                            f"на сумму {sale_data.amount} ₽ для пользователя {sale_data.user_id}")
+            else:
+                error_message = payment_result.get("error", "Неизвестная ошибка") if payment_result else "Нет ответа от API"
+                error_text = (
+                    "❌ <b>Ошибка создания платежа</b>\n\n"
+                    f"💰 <b>Сумма:</b> {sale_data.amount:.2f} ₽\n"
+                    f"❗ <b>Ошибка:</b> {html.escape(str(error_message))}\n\n"
+                    "Обратитесь к администратору или попробуйте позже."
+                )
+                await self._delete(callback.message)
+                await self._send_error(callback, error_text)
+                logger.error(f"Ошибка создания платежа ({self.name}): {error_message}")
+
+            await state.clear()
+
+        except Exception as e:
+            await self._delete(callback.message)
+
+            logger.error(f"Критическая ошибка создания платежа ({self.name}): {e}")
+            logger.error(f"Полная ошибка: {traceback.format_exc()}")
+
+            error_text = (
+                "❌ <b>Критическая ошибка</b>\n\n"
+                f"💰 <b>Сумма:</b> {data.get('amount', 0):.2f} ₽\n"
+                "❗ Произошла системная ошибка.\n\n"
+                "Обратитесь к администратору."
+            )
+            await self._send_error(callback, error_text)
+            await state.clear()
+
+    @staticmethod
+    def _payment_key(callback: CallbackQuery, data: Dict[str, Any]) -> Tuple:
+        # Сессии, начатые до появления session_id, различаются по сообщению мастера
+        return callback.from_user.id, data.get(SESSION_KEY) or data.get('bot_message_id')
+
+    @staticmethod
+    async def _answer_duplicate(callback: CallbackQuery, payment: asyncio.Future):
+        """Ответ на повторное нажатие: платеж этой сессии уже создается или создан"""
+        result = payment.result() if payment.done() and not payment.cancelled() and not payment.exception() else None
+        if result and result.get("success"):
+            await callback.answer(f"✅ Платеж уже создан, заказ {result.get('order_id')}", show_alert=True)
+        else:
+            await callback.answer("⏳ Ссылка на оплату уже создается")
+        logger.info(f"Повторное создание платежа пользователем {callback.from_user.id} пропущено")
+
+    # Отправка сообщений
+
+    async def _edit(self, callback: CallbackQuery, text: str, markup: InlineKeyboardMarkup):
+        """Редактирование сообщения бота одновременно с ответом на нажатие кнопки"""
+        await asyncio.gather(
+            callback.message.edit_text(text, reply_markup=markup, parse_mode="HTML").emit(callback.bot),
+            callback.answer().emit(callback.bot)
+        )
+
+    async def _replace(self, message: Message, data: Dict[str, Any],
+                       text: str, markup: InlineKeyboardMarkup) -> bool:
+        """
+        Удаление сообщения пользователя и редактирование сообщения бота
+        одним шагом; если редактировать нечего, отправляется новое сообщение.
+        Возвращает True, если bot_message_id в data изменился и данные нужно записать
+        """
+        deleted, edited = await asyncio.gather(
+            message.delete().emit(message.bot),
+            message.bot.edit_message_text(
+                text=text,
+                chat_id=message.chat.id,
+                message_id=data.get('bot_message_id'),
+                reply_markup=markup,
+                parse_mode="HTML"
+            ),
+            return_exceptions=True
+        )
+        if isinstance(deleted, Exception):
+            logger.warning(f"Не удалось удалить сообщение {message.message_id} в чате {message.chat.id}: {deleted}")
+        if not isinstance(edited, Exception) or "message is not modified" in str(edited):
+            return False
+        # Если не удалось отредактировать, отправляем новое
+        sent_message = await message.answer(text, reply_markup=markup, parse_mode="HTML")
+        if sent_message.message_id == data.get('bot_message_id'):
+            return False
+        data['bot_message_id'] = sent_message.message_id
+        return True
+
+    @staticmethod
+    async def _delete(message: Message):
+        try:
+            await message.delete()
+        except Exception:
+            pass
+
+    async def _send_error(self, callback: CallbackQuery, error_text: str):
+        await callback.bot.send_message(
+            chat_id=callback.message.chat.id,
+            text=error_text,
+            reply_markup=get_back_to_main_after_sale_keyboard(),
+            parse_mode="HTML"
+        )
+        if self.menu_after_error:
+            await callback.message.answer(
+                MAIN_MENU_TEXT,
+                reply_markup=get_back_to_main_keyboard(),
+                parse_mode="HTML"
+            )